@@ -16,23 +16,71 @@ simulated portfolio + tax profile features.
 
 - We compute a "true" after-tax return with a simple formula + noise.
 - Then we train a LinearRegression model to approximate that mapping.
+
+The data and the fit are deterministic for given (n_samples, random_state),
+so the trained model is cached per process and pickled under
+`.cache/models/` with a fingerprint of those parameters, this module's
+training code and the sklearn version. `predict()` scores a DataFrame of
+portfolios (or `features_from_assumptions()` for the app's sliders)
+without retraining.
+
+`run_model_search()` (or `--search N`) compares Ridge, polynomial and
+gradient-boosting candidates against the linear fit under k-fold CV, in
+parallel across cores.
 """
 
-from typing import Dict, Any
+import hashlib
+import importlib.metadata
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import r2_score, mean_absolute_error
 
+# scikit-learn (and joblib) are imported inside the functions that fit or
+# score: importing it costs more than the rest of the app's imports together,
+# and most page loads never train.
+
+DEFAULT_MODEL_DIR = os.path.join(".cache", "models")
+DEFAULT_CHUNK_SIZE = 250_000
+
+FEATURE_COLS = [
+    "pre_tax_return",
+    "turnover",
+    "yield",
+    "ord_rate",
+    "ltcg_rate",
+    "niit",
+    "state_rate",
+    "tax_deferred",
+    "tax_exempt",
+    "taxable_share",
+    "effective_tax_rate",
+]
+
+
+def _effective_tax_rate(
+    turnover, ord_rate, ltcg_rate, niit, state_rate, taxable_share, cap_gains_share
+):
+    # Base effective tax rate on the taxable portion
+    rate_income = ord_rate + niit + state_rate
+    rate_gains = ltcg_rate + niit + state_rate
+    blended_rate = cap_gains_share * rate_gains + (1.0 - cap_gains_share) * rate_income
+
+    # Turnover amplifies how much of pre-tax return is realized in the current year
+    realization_factor = np.clip(0.3 + 0.7 * turnover, 0.0, 2.0)
+
+    return np.clip(taxable_share * blended_rate * realization_factor, 0.0, 0.80)
 
-def _simulate_after_tax_data(
-    n_samples: int = 2000,
-    random_state: int = 42,
-) -> pd.DataFrame:
-    rng = np.random.default_rng(random_state)
 
+def _generate_columns(rng: np.random.Generator, n_samples: int) -> Dict[str, np.ndarray]:
     # Core portfolio characteristics
     # Pre-tax total return between roughly -30% and +30%
     pre_tax_return = np.clip(rng.normal(loc=0.07, scale=0.10, size=n_samples), -0.30, 0.30)
@@ -61,37 +109,338 @@ def _simulate_after_tax_data(
     # Mix of income vs capital gains
     cap_gains_share = np.clip(0.5 + 0.3 * (rng.random(n_samples) - 0.5), 0.0, 1.0)
 
-    # Base effective tax rate on the taxable portion
-    rate_income = ord_rate + niit + state_rate
-    rate_gains = ltcg_rate + niit + state_rate
-    blended_rate = cap_gains_share * rate_gains + (1.0 - cap_gains_share) * rate_income
-
-    # Turnover amplifies how much of pre-tax return is realized in the current year
-    realization_factor = np.clip(0.3 + 0.7 * turnover, 0.0, 2.0)
-
-    effective_tax_rate = np.clip(taxable_share * blended_rate * realization_factor, 0.0, 0.80)
+    effective_tax_rate = _effective_tax_rate(
+        turnover, ord_rate, ltcg_rate, niit, state_rate, taxable_share, cap_gains_share
+    )
 
     # "True" after-tax return with a tiny bit of noise
     noise = rng.normal(loc=0.0, scale=0.005, size=n_samples)
     after_tax_return = pre_tax_return * (1.0 - effective_tax_rate) + noise
 
-    df = pd.DataFrame(
+    return {
+        "pre_tax_return": pre_tax_return,
+        "turnover": turnover,
+        "yield": yield_pct,
+        "ord_rate": ord_rate,
+        "ltcg_rate": ltcg_rate,
+        "niit": niit,
+        "state_rate": state_rate,
+        "tax_deferred": tax_deferred,
+        "tax_exempt": tax_exempt,
+        "taxable_share": taxable_share,
+        "effective_tax_rate": effective_tax_rate,
+        "after_tax_return": after_tax_return,
+    }
+
+
+def _simulate_after_tax_data(
+    n_samples: int = 2000,
+    random_state: int = 42,
+) -> pd.DataFrame:
+    rng = np.random.default_rng(random_state)
+    return pd.DataFrame(_generate_columns(rng, n_samples))
+
+
+def iter_after_tax_chunks(
+    n_samples: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    random_state: int = 42,
+    dtype=np.float64,
+    test_size: float = 0.2,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Yield (X, y, is_test) chunks of at most `chunk_size` rows, n_samples in total.
+
+    Chunk i is drawn from its own seed (random_state, i), so every chunk is
+    reproducible on its own: a second pass regenerates the same rows without
+    keeping any of them. X has FEATURE_COLS as columns; X and y are `dtype`
+    (float32 halves the footprint). `is_test` marks the held-out rows.
+    Only one chunk is alive at a time, so memory does not grow with n_samples.
+    """
+    for i, start in enumerate(range(0, n_samples, chunk_size)):
+        n = min(chunk_size, n_samples - start)
+        rng = np.random.default_rng(np.random.SeedSequence(random_state, spawn_key=(i,)))
+        cols = _generate_columns(rng, n)
+        X = np.empty((n, len(FEATURE_COLS)), dtype=dtype)
+        for j, c in enumerate(FEATURE_COLS):
+            X[:, j] = cols[c]
+        y = cols["after_tax_return"].astype(dtype, copy=False)
+        is_test = rng.random(n) < test_size
+        yield X, y, is_test
+
+
+class StreamingLinearRegression:
+    """
+    Ordinary least squares from running sufficient statistics.
+
+    `partial_fit` merges each chunk's mean and centered cross-products
+    (Chan et al.'s pairwise update, accumulated in float64), so fitting
+    1e8 rows needs only O(n_features^2) memory. The solution is the same
+    minimum-norm least squares fit LinearRegression gives on all rows.
+    """
+
+    def __init__(self):
+        self.n_samples_seen_ = 0
+        self._mean: Optional[np.ndarray] = None
+        self._comoment: Optional[np.ndarray] = None
+        self.coef_: Optional[np.ndarray] = None
+        self.intercept_ = 0.0
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray) -> "StreamingLinearRegression":
+        Z = np.column_stack([np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+        n_b = Z.shape[0]
+        if n_b == 0:
+            return self
+        mean_b = Z.mean(axis=0)
+        Zc = Z - mean_b
+        comoment_b = Zc.T @ Zc
+        if self._mean is None:
+            self._mean, self._comoment = mean_b, comoment_b
+        else:
+            n_a = self.n_samples_seen_
+            n = n_a + n_b
+            delta = mean_b - self._mean
+            self._mean = self._mean + delta * (n_b / n)
+            self._comoment = self._comoment + comoment_b + np.outer(delta, delta) * (n_a * n_b / n)
+        self.n_samples_seen_ += n_b
+        self._solve()
+        return self
+
+    def _solve(self) -> None:
+        k = self._mean.shape[0] - 1
+        cxx, cxy = self._comoment[:k, :k], self._comoment[:k, k]
+        self.coef_ = np.linalg.lstsq(cxx, cxy, rcond=None)[0]
+        self.intercept_ = float(self._mean[k] - self._mean[:k] @ self.coef_)
+
+    def predict(self, X) -> np.ndarray:
+        if self.coef_ is None:
+            raise ValueError("StreamingLinearRegression is not fitted yet")
+        X = np.asarray(X)
+        return X @ self.coef_.astype(X.dtype, copy=False) + X.dtype.type(self.intercept_)
+
+
+def run_streaming_regression(
+    n_samples: int = 10_000_000,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    random_state: int = 42,
+    dtype=np.float64,
+    test_size: float = 0.2,
+) -> Dict[str, Any]:
+    """
+    Out-of-core version of the demo for stress tests at any n_samples.
+
+    Pass 1 streams the chunks into StreamingLinearRegression (train rows only);
+    pass 2 regenerates the same chunks and scores the test rows, accumulating
+    R^2 and MAE as running sums. Peak memory is one chunk.
+    """
+    model = StreamingLinearRegression()
+    for X, y, is_test in iter_after_tax_chunks(n_samples, chunk_size, random_state, dtype, test_size):
+        model.partial_fit(X[~is_test], y[~is_test])
+
+    n_test, abs_err, sse, y_sum, y_sq = 0, 0.0, 0.0, 0.0, 0.0
+    for X, y, is_test in iter_after_tax_chunks(n_samples, chunk_size, random_state, dtype, test_size):
+        yt = y[is_test].astype(np.float64)
+        err = yt - model.predict(X[is_test]).astype(np.float64)
+        n_test += yt.shape[0]
+        abs_err += float(np.abs(err).sum())
+        sse += float(err @ err)
+        y_sum += float(yt.sum())
+        y_sq += float(yt @ yt)
+    sst = y_sq - y_sum * y_sum / n_test if n_test else 0.0
+
+    return {
+        "model": model,
+        "n_samples": int(n_samples),
+        "n_features": len(FEATURE_COLS),
+        "train_size": int(model.n_samples_seen_),
+        "test_size": int(n_test),
+        "test_r2": float(1.0 - sse / sst) if sst > 0 else float("nan"),
+        "test_mae": abs_err / n_test if n_test else float("nan"),
+        "chunk_size": int(chunk_size),
+        "dtype": np.dtype(dtype).name,
+    }
+
+
+@contextmanager
+def _stage(stages: Optional[Dict[str, float]], name: str):
+    """Add the block's wall time (seconds) to stages[name] when timing is on."""
+    if stages is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+
+
+def _train(
+    n_samples: int, random_state: int, stages: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import train_test_split
+
+    # Same rows as _simulate_after_tax_data, split so each stage can be timed
+    with _stage(stages, "simulate"):
+        cols = _generate_columns(np.random.default_rng(random_state), n_samples)
+    with _stage(stages, "dataframe"):
+        df = pd.DataFrame(cols)
+        X = df[FEATURE_COLS]
+        y = df["after_tax_return"]
+
+    with _stage(stages, "split"):
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=random_state
+        )
+
+    with _stage(stages, "fit"):
+        model = LinearRegression()
+        model.fit(X_train, y_train)
+
+    with _stage(stages, "predict"):
+        y_pred = model.predict(X_test)
+    with _stage(stages, "metrics"):
+        r2 = r2_score(y_test, y_pred)
+        mae = mean_absolute_error(y_test, y_pred)
+
+    # Build a small sample table for display
+    with _stage(stages, "sample"):
+        sample = X_test.copy()
+        sample["true_after_tax_return"] = y_test
+        sample["pred_after_tax_return"] = y_pred
+        sample = sample.head(10).reset_index(drop=True)
+
+    return {
+        "model": model,
+        "n_samples": int(df.shape[0]),
+        "n_features": int(X.shape[1]),
+        "test_size": int(X_test.shape[0]),
+        "test_r2": float(r2),
+        "test_mae": float(mae),
+        "sample_df": sample,
+    }
+
+
+def model_fingerprint(n_samples: int, random_state: int) -> str:
+    """Changes whenever the generation parameters, the training code or sklearn do."""
+    code = "".join(
+        inspect.getsource(fn)
+        for fn in (_effective_tax_rate, _generate_columns, _train)
+    )
+    blob = json.dumps(
         {
-            "pre_tax_return": pre_tax_return,
-            "turnover": turnover,
-            "yield": yield_pct,
-            "ord_rate": ord_rate,
-            "ltcg_rate": ltcg_rate,
-            "niit": niit,
-            "state_rate": state_rate,
-            "tax_deferred": tax_deferred,
-            "tax_exempt": tax_exempt,
-            "taxable_share": taxable_share,
-            "effective_tax_rate": effective_tax_rate,
-            "after_tax_return": after_tax_return,
-        }
+            "n_samples": n_samples,
+            "random_state": random_state,
+            "features": FEATURE_COLS,
+            "code": code,
+            "sklearn": importlib.metadata.version("scikit-learn"),
+        },
+        sort_keys=True,
     )
-    return df
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+_MODELS: Dict[Tuple[int, int], Dict[str, Any]] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def is_model_loaded(n_samples: int = 2000, random_state: int = 42) -> bool:
+    """True once get_trained_model has the model in this process (scoring is then instant)."""
+    return (n_samples, random_state) in _MODELS
+
+
+def _load_model(path: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as f:
+            trained = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(trained, dict) or trained.get("fingerprint") != fingerprint:
+        return None
+    return trained
+
+
+def _save_model(path: str, trained: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(trained, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def get_trained_model(
+    n_samples: int = 2000,
+    random_state: int = 42,
+    model_dir: Optional[str] = DEFAULT_MODEL_DIR,
+) -> Dict[str, Any]:
+    """
+    The trained model + metrics for these parameters: from this process's
+    cache, else from `model_dir` if the fingerprint matches, else trained
+    (and saved). `source` says which: "memory", "disk" or "trained".
+    """
+    key = (n_samples, random_state)
+    with _MODELS_LOCK:
+        trained = _MODELS.get(key)
+        if trained is not None:
+            return {**trained, "source": "memory"}
+
+        fingerprint = model_fingerprint(n_samples, random_state)
+        path = os.path.join(model_dir, f"after_tax_{fingerprint[:16]}.pkl") if model_dir else None
+        trained = _load_model(path, fingerprint) if path else None
+        source = "disk"
+        if trained is None:
+            trained = {**_train(n_samples, random_state), "fingerprint": fingerprint}
+            source = "trained"
+            if path:
+                _save_model(path, trained)
+        _MODELS[key] = trained
+        return {**trained, "source": source}
+
+
+def features_from_assumptions(
+    assumptions: Dict[str, Any], pre_tax_return: float = 0.07
+) -> pd.DataFrame:
+    """
+    One feature row for the app's slider assumptions (percent values).
+    The capital-gains share of the return is taken at its training mean (0.5).
+    """
+    sheltered = min((assumptions["tax_deferred"] + assumptions["tax_exempt"]) / 100.0, 1.0)
+    row = {
+        "pre_tax_return": pre_tax_return,
+        "turnover": assumptions["turnover"] / 100.0,
+        "yield": assumptions["yield"] / 100.0,
+        "ord_rate": assumptions["ord_rate"] / 100.0,
+        "ltcg_rate": assumptions["ltcg_rate"] / 100.0,
+        "niit": assumptions["niit"] / 100.0,
+        "state_rate": assumptions["state_rate"] / 100.0,
+        "tax_deferred": assumptions["tax_deferred"] / 100.0,
+        "tax_exempt": assumptions["tax_exempt"] / 100.0,
+        "taxable_share": 1.0 - sheltered,
+    }
+    row["effective_tax_rate"] = float(
+        _effective_tax_rate(
+            row["turnover"], row["ord_rate"], row["ltcg_rate"], row["niit"],
+            row["state_rate"], row["taxable_share"], 0.5,
+        )
+    )
+    return pd.DataFrame([row], columns=FEATURE_COLS)
+
+
+def predict(
+    X: pd.DataFrame,
+    n_samples: int = 2000,
+    random_state: int = 42,
+) -> np.ndarray:
+    """
+    Predicted after-tax return for each row of X (a DataFrame with FEATURE_COLS),
+    scored in one call by the cached model.
+    """
+    missing = [c for c in FEATURE_COLS if c not in X.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+    model = get_trained_model(n_samples=n_samples, random_state=random_state)["model"]
+    return model.predict(X[FEATURE_COLS])
 
 
 def run_after_tax_regression(
@@ -100,7 +449,8 @@ def run_after_tax_regression(
 ) -> Dict[str, Any]:
     """
     Simulate an after-tax dataset, train a linear regression model,
-    and return metrics + a small sample of predictions.
+    and return metrics + a small sample of predictions. The trained model
+    is reused (see get_trained_model), so repeat calls do not retrain.
 
     Returns a dict with:
         - n_samples
@@ -109,57 +459,166 @@ def run_after_tax_regression(
         - test_r2
         - test_mae
         - sample_df: pandas DataFrame with a few example rows
+        - source: "memory", "disk" or "trained"
     """
-    df = _simulate_after_tax_data(n_samples=n_samples, random_state=random_state)
-
-    feature_cols = [
-        "pre_tax_return",
-        "turnover",
-        "yield",
-        "ord_rate",
-        "ltcg_rate",
-        "niit",
-        "state_rate",
-        "tax_deferred",
-        "tax_exempt",
-        "taxable_share",
-        "effective_tax_rate",
-    ]
-    X = df[feature_cols]
-    y = df["after_tax_return"]
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=random_state
-    )
+    trained = get_trained_model(n_samples=n_samples, random_state=random_state)
+    out = {k: v for k, v in trained.items() if k not in ("model", "fingerprint")}
+    out["sample_df"] = out["sample_df"].copy()  # the cached copy stays untouched
+    return out
 
-    model = LinearRegression()
-    model.fit(X_train, y_train)
 
-    y_pred = model.predict(X_test)
-    r2 = r2_score(y_test, y_pred)
-    mae = mean_absolute_error(y_test, y_pred)
 
-    # Build a small sample table for display
-    sample = X_test.copy()
-    sample["true_after_tax_return"] = y_test
-    sample["pred_after_tax_return"] = y_pred
-    sample = sample.head(10).reset_index(drop=True)
+# ===== Model selection =====
+def _candidates(random_state: int) -> Dict[str, Any]:
+    """Unfitted estimators compared by run_model_search (name -> estimator)."""
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.linear_model import LinearRegression, Ridge
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
 
     return {
-        "n_samples": int(df.shape[0]),
-        "n_features": int(X.shape[1]),
-        "test_size": int(X_test.shape[0]),
-        "test_r2": float(r2),
-        "test_mae": float(mae),
-        "sample_df": sample,
+        "linear": LinearRegression(),
+        "ridge": make_pipeline(StandardScaler(), Ridge(alpha=1e-3)),
+        "poly2_ridge": make_pipeline(
+            PolynomialFeatures(degree=2, include_bias=False), StandardScaler(), Ridge(alpha=1e-3)
+        ),
+        "gbm": HistGradientBoostingRegressor(max_iter=200, random_state=random_state),
     }
 
 
-if __name__ == "__main__":
-    results = run_after_tax_regression()
-    print(
-        f"After-tax regression demo: R^2 = {results['test_r2']:.3f}, "
-        f"MAE = {results['test_mae']:.4f}"
+def _fit_fold(
+    name: str, estimator, X: np.ndarray, y: np.ndarray, folds: int, fold: int, random_state: int
+) -> Dict[str, Any]:
+    """Fit one candidate on one CV fold. X and y arrive as read-only memmaps."""
+    from sklearn.base import clone
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import KFold
+
+    train_idx, test_idx = list(KFold(folds, shuffle=True, random_state=random_state).split(X))[fold]
+    t0 = time.perf_counter()
+    model = clone(estimator).fit(X[train_idx], y[train_idx])
+    fit_s = time.perf_counter() - t0
+    y_pred = model.predict(X[test_idx])
+    return {
+        "candidate": name,
+        "fold": fold,
+        "r2": float(r2_score(y[test_idx], y_pred)),
+        "mae": float(mean_absolute_error(y[test_idx], y_pred)),
+        "fit_s": fit_s,
+        "task_s": time.perf_counter() - t0,
+    }
+
+
+def run_model_search(
+    n_samples: int = 100_000,
+    random_state: int = 42,
+    folds: int = 5,
+    n_jobs: Optional[int] = None,
+    candidates: Optional[Tuple[str, ...]] = None,
+) -> Dict[str, Any]:
+    """
+    k-fold CV of the candidate models (see _candidates) on the simulated data.
+
+    The (candidate x fold) tasks run in parallel on joblib's process backend.
+    The dataset is generated once and saved as .npy files that the workers
+    open as memory maps, so each task gets a reference to the file rather
+    than a pickled copy of the data. `n_jobs` defaults to every core.
+
+    Returns {"results": DataFrame (one row per candidate: mean/std R^2 and MAE,
+    summed fit and task seconds), "best": name with the highest mean R^2,
+    "folds": per-task rows, "wall_s", "task_s" (serial-equivalent seconds),
+    "n_jobs", "n_samples"}.
+    """
+    from joblib import Parallel, delayed
+
+    all_candidates = _candidates(random_state)
+    names = list(candidates or all_candidates)
+    unknown = [c for c in names if c not in all_candidates]
+    if unknown:
+        raise ValueError(f"Unknown candidates {unknown}; expected some of {list(all_candidates)}")
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    cols = _generate_columns(np.random.default_rng(random_state), n_samples)
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="after_tax_search_", ignore_cleanup_errors=True) as tmp:
+        x_path, y_path = os.path.join(tmp, "X.npy"), os.path.join(tmp, "y.npy")
+        np.save(x_path, np.column_stack([cols[c] for c in FEATURE_COLS]))
+        np.save(y_path, cols["after_tax_return"])
+        del cols
+        X, y = np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+        rows = Parallel(n_jobs=n_jobs, backend="loky")(
+            delayed(_fit_fold)(name, all_candidates[name], X, y, folds, fold, random_state)
+            for name in names
+            for fold in range(folds)
+        )
+        del X, y
+    wall_s = time.perf_counter() - t0
+
+    per_fold = pd.DataFrame(rows)
+    results = (
+        per_fold.groupby("candidate", sort=False)
+        .agg(
+            r2_mean=("r2", "mean"),
+            r2_std=("r2", "std"),
+            mae_mean=("mae", "mean"),
+            mae_std=("mae", "std"),
+            fit_s=("fit_s", "sum"),
+            task_s=("task_s", "sum"),
+        )
+        .sort_values("r2_mean", ascending=False)
     )
-    print()
-    print(results["sample_df"])
+    return {
+        "results": results,
+        "best": str(results.index[0]),
+        "folds": per_fold,
+        "wall_s": wall_s,
+        "task_s": float(per_fold["task_s"].sum()),
+        "n_jobs": int(n_jobs),
+        "n_samples": int(n_samples),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="After-tax regression demo")
+    parser.add_argument("--stream", type=float, default=None, metavar="N",
+                        help="train out-of-core on N samples (e.g. 1e8) instead of the 2000-row demo")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--float32", action="store_true", help="generate chunks as float32")
+    parser.add_argument("--search", type=float, default=None, metavar="N",
+                        help="cross-validate the candidate models on N samples and report the best")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    if args.search:
+        search = run_model_search(n_samples=int(args.search), folds=args.folds, n_jobs=args.jobs)
+        print(
+            f"Model search on {search['n_samples']:,} rows, {args.folds}-fold CV, "
+            f"{search['n_jobs']} jobs: {search['wall_s']:.2f}s wall, "
+            f"{search['task_s']:.2f}s of tasks"
+        )
+        print()
+        print(search["results"].round(6))
+        print()
+        print(f"Best: {search['best']}")
+    elif args.stream:
+        results = run_streaming_regression(
+            n_samples=int(args.stream),
+            chunk_size=args.chunk_size,
+            dtype=np.float32 if args.float32 else np.float64,
+        )
+        print(
+            f"Streaming regression on {results['n_samples']:,} rows "
+            f"({results['chunk_size']:,}-row {results['dtype']} chunks): "
+            f"R^2 = {results['test_r2']:.3f}, MAE = {results['test_mae']:.4f}"
+        )
+    else:
+        results = run_after_tax_regression()
+        print(
+            f"After-tax regression demo: R^2 = {results['test_r2']:.3f}, "
+            f"MAE = {results['test_mae']:.4f}"
+        )
+        print()
+        print(results["sample_df"])
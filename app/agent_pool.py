@@ -0,0 +1,289 @@
+# app/agent_pool.py
+"""
+Process-wide pool of persona agents.
+
+Building a TinyPerson (load_specification + the persona default patching in
+simulation.build_agent) is paid once per distinct agent spec. Right after
+the first build the pool snapshots the agent's fresh state; every later
+lease restores that snapshot into an idle agent instead of constructing a
+new one. With `run_state` ({agent class name: attribute names}), only
+those attributes, the ones a conversation changes (memory, mental state,
+buffers), are snapshotted and restored: containers are copied, their items
+shared. Otherwise the agent's complete state is deep-copied. The first
+agent built of each class is checked against its list: a class with no
+list, or one missing a listed attribute (a backend version that renamed
+it), gets a RuntimeWarning and complete-state restores instead.
+
+Restoring only pays if it is cheaper than building. The pool times both
+(a pooled lease includes finding the spec's entry), and once `MIN_SAMPLES`
+restores have cost at least as much as a build on average, it stops
+pooling and builds every lease. Specs are hashed once per spec object
+(the persona registry hands out the same one every rerun). An agent whose snapshot fails is handed out unpooled (and not kept
+on release); a snapshot that fails to restore is dropped, so the next lease
+rebuilds and snapshots again.
+
+The pool is bounded: at most `max_entries` specs (least recently leased
+dropped first) and `max_idle` idle agents per spec. Agents it lets go are
+passed to `on_evict`, so a process streaming thousands of one-off personas
+(a batch population) holds only the most recent ones.
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_IDLE = 2
+# Restores timed before the pool compares them with builds
+MIN_SAMPLES = 3
+
+
+def _fresh(value: Any) -> Any:
+    """A copy a run can mutate without touching `value`: lists, dicts and plain objects copied, items shared."""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return {k: _fresh(v) for k, v in value.items()}
+    if isinstance(value, (str, bytes, int, float, bool, tuple, type(None))):
+        return value
+    if hasattr(value, "__dict__"):
+        obj = copy.copy(value)
+        obj.__dict__.update({k: _fresh(v) for k, v in vars(value).items()})
+        return obj
+    return copy.copy(value)
+
+def _snapshot(agent, fields: Optional[Sequence[str]] = None) -> Any:
+    if fields is not None:
+        return {f: _fresh(getattr(agent, f)) for f in fields}
+    if hasattr(agent, "encode_complete_state"):
+        return agent.encode_complete_state()
+    return copy.deepcopy(agent.__dict__)
+
+def _restore(agent, state, fields: Optional[Sequence[str]] = None) -> None:
+    if fields is not None:
+        for f, v in state.items():
+            setattr(agent, f, _fresh(v))
+    elif hasattr(agent, "decode_complete_state"):
+        agent.decode_complete_state(copy.deepcopy(state))
+    else:
+        agent.__dict__.update(copy.deepcopy(state))
+
+
+class _Entry:
+    __slots__ = ("snapshot", "fields", "idle", "leased")
+
+    def __init__(self):
+        self.snapshot: Any = None
+        self.fields: Optional[Tuple[str, ...]] = None  # what the snapshot holds; None = complete state
+        self.idle: List[Any] = []
+        self.leased = 0
+
+
+class AgentPool:
+    def __init__(
+        self,
+        factory: Callable[[Dict[str, Any]], Any],
+        on_restore: Optional[Callable[[Any], None]] = None,
+        on_evict: Optional[Callable[[Any], None]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_idle: int = DEFAULT_MAX_IDLE,
+        run_state: Optional[Dict[str, Sequence[str]]] = None,
+    ):
+        self.factory = factory
+        self.run_state = {cls: tuple(fields) for cls, fields in run_state.items()} if run_state is not None else None
+        # agent class name -> the run-state fields checked against its first built agent (None = complete state)
+        self._fields: Dict[str, Optional[Tuple[str, ...]]] = {}
+        self.on_restore = on_restore
+        self.on_evict = on_evict
+        self.max_entries = max_entries
+        self.max_idle = max_idle
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # least recently leased first
+        self._leases: Dict[int, str] = {}  # id(leased agent) -> its entry key
+        # (id(spec), scope) -> (spec, key); the spec is held so its id is not reused
+        self._keys: "OrderedDict[Tuple[int, str], Tuple[Dict[str, Any], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.reuses = 0
+        self.restore_failures = 0
+        self.snapshot_failures = 0
+        self.evictions = 0
+        self.build_seconds = 0.0
+        self.restore_seconds = 0.0
+
+    @staticmethod
+    def key(agent_spec: Dict[str, Any], scope: str = "") -> str:
+        blob = json.dumps({"spec": agent_spec, "scope": scope}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _key_for(self, agent_spec: Dict[str, Any], scope: str) -> str:
+        memo = (id(agent_spec), scope)
+        with self._lock:
+            hit = self._keys.get(memo)
+            if hit is not None and hit[0] is agent_spec:
+                self._keys.move_to_end(memo)
+                return hit[1]
+        k = self.key(agent_spec, scope)
+        with self._lock:
+            self._keys[memo] = (agent_spec, k)
+            while len(self._keys) > 2 * self.max_entries:
+                self._keys.popitem(last=False)
+        return k
+
+    def _pays_off(self) -> bool:
+        if self.reuses < MIN_SAMPLES or not self.builds:
+            return True
+        return self.restore_seconds / self.reuses < self.build_seconds / self.builds
+
+    def pays_off(self) -> bool:
+        """False once restoring has been measured to cost at least as much as building."""
+        with self._lock:
+            return self._pays_off()
+
+    def _fields_for(self, agent) -> Optional[Tuple[str, ...]]:
+        """The run-state attributes to snapshot for this agent's class, or None for its complete state."""
+        if self.run_state is None:
+            return None
+        cls = type(agent).__name__
+        with self._lock:
+            if cls in self._fields:
+                return self._fields[cls]
+        fields = self.run_state.get(cls)
+        missing = [f for f in fields or () if not hasattr(agent, f)]
+        if fields is None or missing:
+            problem = "no run state listed" if fields is None else f"no attribute(s) {', '.join(missing)}"
+            warnings.warn(f"Agent pool: {cls} has {problem}; restoring its complete state instead",
+                          RuntimeWarning, stacklevel=3)
+            fields = None
+        with self._lock:
+            self._fields.setdefault(cls, fields)
+            return self._fields[cls]
+
+    def _build(self, agent_spec: Dict[str, Any]):
+        t0 = time.perf_counter()
+        agent = self.factory(agent_spec)
+        with self._lock:
+            self.builds += 1
+            self.build_seconds += time.perf_counter() - t0
+        return agent
+
+    def acquire(self, agent_spec: Dict[str, Any], scope: str = ""):
+        """Hand out an agent in its freshly-built state (built once, restored afterwards)."""
+        if not self.pays_off():
+            return self._build(agent_spec)  # unpooled: release lets it go
+        t0 = time.perf_counter()
+        k = self._key_for(agent_spec, scope)
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is None:
+                entry = self._entries[k] = _Entry()
+            self._entries.move_to_end(k)
+            agent = entry.idle.pop() if entry.idle else None
+            entry.leased += 1
+            snapshot, fields = entry.snapshot, entry.fields
+            dropped = self._trim()
+        self._evict(dropped)
+
+        if agent is not None and snapshot is not None:
+            try:
+                _restore(agent, snapshot, fields)
+                if self.on_restore:
+                    self.on_restore(agent)
+            except Exception:
+                agent = None
+                with self._lock:
+                    self.restore_failures += 1
+                    # Retrying the same snapshot would fail again; rebuild and re-snapshot instead
+                    if entry.snapshot is snapshot:
+                        entry.snapshot = None
+                    snapshot = None
+            else:
+                with self._lock:
+                    self.reuses += 1
+                    self.restore_seconds += time.perf_counter() - t0
+                    self._leases[id(agent)] = k
+                return agent
+
+        # Nothing idle (first use, or this spec is already leased): build a new one
+        try:
+            agent = self._build(agent_spec)
+        except Exception:
+            with self._lock:
+                entry.leased -= 1
+            raise
+        state = None
+        if snapshot is None:
+            try:
+                fields = self._fields_for(agent)
+                state = _snapshot(agent, fields)
+            except Exception:
+                # Still a freshly built agent; it just cannot be pooled
+                with self._lock:
+                    self.snapshot_failures += 1
+        with self._lock:
+            if entry.snapshot is None and state is not None:
+                entry.snapshot, entry.fields = state, fields
+            self._leases[id(agent)] = k
+        return agent
+
+    def release(self, agent_spec: Dict[str, Any], agent, scope: str = "") -> None:
+        # The lease remembers its key (no second hash of the spec); unpooled agents have none
+        with self._lock:
+            k = self._leases.pop(id(agent), None)
+            entry = self._entries.get(k) if k is not None else None
+            if entry is not None:
+                entry.leased = max(0, entry.leased - 1)
+            # An agent with nothing to restore it from, or beyond the idle cap, is not reused
+            keep = entry is not None and entry.snapshot is not None and len(entry.idle) < self.max_idle
+            if keep:
+                entry.idle.append(agent)
+        if not keep:
+            self._evict([agent])
+
+    def _trim(self) -> List[Any]:
+        """Drop least recently leased specs over max_entries (not ones still leased); returns their idle agents."""
+        dropped: List[Any] = []
+        over = len(self._entries) - self.max_entries
+        for k in list(self._entries):
+            if over <= 0:
+                break
+            if self._entries[k].leased:
+                continue
+            dropped.extend(self._entries.pop(k).idle)
+            over -= 1
+        return dropped
+
+    def _evict(self, agents: List[Any]) -> None:
+        if not agents:
+            return
+        with self._lock:
+            self.evictions += len(agents)
+        if self.on_evict:
+            for agent in agents:
+                self.on_evict(agent)
+
+    def clear(self) -> None:
+        with self._lock:
+            dropped = [a for e in self._entries.values() for a in e.idle]
+            self._entries.clear()
+        self._evict(dropped)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "personas": len(self._entries),
+                "idle_agents": sum(len(e.idle) for e in self._entries.values()),
+                "leased_agents": sum(e.leased for e in self._entries.values()),
+                "builds": self.builds,
+                "reuses": self.reuses,
+                "restore_failures": self.restore_failures,
+                "snapshot_failures": self.snapshot_failures,
+                "evictions": self.evictions,
+                "avg_build_ms": 1000 * self.build_seconds / self.builds if self.builds else 0.0,
+                "avg_restore_ms": 1000 * self.restore_seconds / self.reuses if self.reuses else 0.0,
+                "pooling": self._pays_off(),
+                "complete_state": sorted(cls for cls, fields in self._fields.items() if fields is None),
+            }
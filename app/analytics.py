@@ -0,0 +1,182 @@
+# app/analytics.py
+"""
+Incremental analytics over every stored run.
+
+RunAnalytics keeps one row per run in the run store (persona, scenario,
+assumptions, ratings, tag counts, LLM calls, timings) in a pandas DataFrame.
+`refresh()` only reads runs that are new or have a new revision since the
+last look (the store index says which) and drops rows for runs that are
+gone; the table and the run -> revision manifest are pickled under
+`.cache/analytics/` so a restarted app does not re-read unchanged runs either.
+"""
+import os
+import pickle
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from replies import count_tags
+from run_store import RunStore
+
+TAGS = list(count_tags(""))
+TAG_COLUMNS = [f"tag_{t}" for t in TAGS]
+DEFAULT_STATE_PATH = os.path.join(".cache", "analytics", "runs.pkl")
+_STATE_VERSION = 2
+RATING_COLUMNS = ["clarity", "confidence", "likelihood"]
+
+
+def run_row(payload: Dict[str, Any], run_id: str, ratings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Flatten one run payload (see simulation.build_json_payload) into a table row."""
+    counts = dict.fromkeys(TAGS, 0)
+    for turn in payload.get("transcript", []):
+        if turn.get("speaker") != "User":
+            for k, v in count_tags(turn.get("text", "")).items():
+                counts[k] += v
+    perf = payload.get("perf") or {}
+    row = {
+        "run_id": run_id,
+        "timestamp": payload.get("timestamp"),
+        "persona": payload.get("persona"),
+        "scenario": payload.get("scenario"),
+        "turns": payload.get("turns"),
+        "llm_calls": (payload.get("llm_calls") or {}).get("total"),
+        "wall_ms": perf.get("wall_ms"),
+    }
+    row.update({f"tag_{k}": v for k, v in counts.items()})
+    row.update({k: (ratings or {}).get(k) for k in RATING_COLUMNS})
+    row.update(payload.get("assumptions") or {})
+    return row
+
+
+class RunAnalytics:
+    def __init__(self, store: RunStore, state_path: Optional[str] = DEFAULT_STATE_PATH):
+        self.store = store
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        # run_id -> revision that is in the table
+        self._manifest: Dict[str, int] = {}
+        self._table = pd.DataFrame(columns=["run_id"])
+        self.parsed = 0  # runs read by the last refresh()
+        self._load_state()
+
+    # ----- persistence -----
+    def _load_state(self) -> None:
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return
+        if state.get("version") == _STATE_VERSION and state.get("store") == os.path.abspath(self.store.root):
+            self._manifest = state["manifest"]
+            self._table = state["table"]
+
+    def _save_state(self) -> None:
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        state = {"version": _STATE_VERSION, "store": os.path.abspath(self.store.root),
+                 "manifest": self._manifest, "table": self._table}
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.state_path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.state_path)
+
+    # ----- ingestion -----
+    def refresh(self) -> pd.DataFrame:
+        """Ingest new runs and new revisions, forget runs that are gone, return the table."""
+        with self._lock:
+            entries = {e["run_id"]: e for e in self.store.entries()}
+            current = {rid: e["rev"] for rid, e in entries.items()}
+            stale = [rid for rid, rev in self._manifest.items() if current.get(rid) != rev]
+            fresh = [rid for rid, rev in current.items() if self._manifest.get(rid) != rev]
+            self.parsed = len(fresh)
+            if not stale and not fresh:
+                return self._table
+
+            rows: List[Dict[str, Any]] = []
+            for rid in fresh:
+                try:
+                    record = self.store.read(entries[rid])
+                except (OSError, ValueError, EOFError):
+                    current.pop(rid)  # segment rewritten meanwhile; look again next time
+                    continue
+                rows.append(run_row(record["payload"], rid, record.get("ratings")))
+
+            table = self._table
+            if stale and "run_id" in table:
+                table = table[~table["run_id"].isin(stale)]
+            if rows:
+                new = self._typed(pd.DataFrame(rows))
+                table = new if table.empty else pd.concat([table, new], ignore_index=True)
+            table = table.reset_index(drop=True)
+            for col in ("persona", "scenario"):
+                if col in table:
+                    # Categories differ between batches, so re-derive them over the whole table
+                    table[col] = table[col].astype("category")
+            self._table = table
+            self._manifest = current
+            self._save_state()
+            return self._table
+
+    @staticmethod
+    def _typed(df: pd.DataFrame) -> pd.DataFrame:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], format="%Y%m%d-%H%M%S", errors="coerce")
+        df[TAG_COLUMNS] = df[TAG_COLUMNS].astype("int32")
+        # Older runs lack ratings/perf: keep these numeric (NaN) so means still vectorize
+        for col in RATING_COLUMNS + ["turns", "llm_calls", "wall_ms"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        return df
+
+    @property
+    def table(self) -> pd.DataFrame:
+        return self._table
+
+    def clear(self) -> None:
+        with self._lock:
+            self._manifest = {}
+            self._table = pd.DataFrame(columns=["run_id"])
+            if self.state_path and os.path.exists(self.state_path):
+                os.remove(self.state_path)
+
+
+# ===== Aggregations (vectorized over the runs table) =====
+def filter_runs(df: pd.DataFrame, personas: Sequence[str] = (), scenarios: Sequence[str] = ()) -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    if personas:
+        mask &= df["persona"].isin(personas)
+    if scenarios:
+        mask &= df["scenario"].isin(scenarios)
+    return df[mask]
+
+def tag_totals(df: pd.DataFrame, by: Sequence[str] = ("persona",)) -> pd.DataFrame:
+    """Summed tag counts per group, with a run count."""
+    g = df.groupby(list(by), observed=True)
+    out = g[TAG_COLUMNS].sum()
+    out.columns = TAGS
+    out.insert(0, "runs", g.size())
+    return out
+
+def tag_share(df: pd.DataFrame, by: Sequence[str] = ("persona",)) -> pd.DataFrame:
+    """Each tag's share of the group's tagged mentions (rows sum to 1; all 0.0 for a group with no tags)."""
+    totals = tag_totals(df, by)[TAGS].astype(float)
+    sums = totals.sum(axis=1)
+    return totals.div(sums.where(sums > 0), axis=0).fillna(0.0)
+
+def dominant_tags(df: pd.DataFrame, by: Sequence[str] = ("persona",)) -> pd.DataFrame:
+    """Most frequent tag per group and its share (both NaN for a group with no tags)."""
+    share = tag_share(df, by)
+    tagged = share.sum(axis=1) > 0
+    return pd.DataFrame({"dominant_tag": share.idxmax(axis=1).where(tagged),
+                         "share": share.max(axis=1).where(tagged)})
+
+def runs_over_time(df: pd.DataFrame, freq: str = "D") -> pd.DataFrame:
+    """Runs and tag mentions per period."""
+    ts = df.dropna(subset=["timestamp"]).set_index("timestamp")
+    out = ts[TAG_COLUMNS].resample(freq).sum()
+    out.columns = TAGS
+    out.insert(0, "runs", ts["run_id"].resample(freq).count())
+    return out
@@ -1,221 +1,223 @@
 # app/app.py
+import csv
+import io
+import json
 import os
-import textwrap
 import warnings
+import numpy as np
 import streamlit as st
 from dotenv import load_dotenv
-import json as _json
 
-# Keep this import only — it's stable across TinyTroupe versions
-from tinytroupe.agent import TinyPerson
-import tinytroupe.control as control
-
-from utils import load_personas, assumption_summary, save_markdown, ts
-from after_tax_regression import run_after_tax_regression
+from persona_registry import get_persona_registry
+from replies import count_tags, merge_counts
+from turn_cache import get_turn_cache
+from simulation import (
+    SCENARIOS, DEFAULT_FEATURE_BRIEF, DEFAULT_RATINGS, backend_name, get_agent_pool, simulate,
+    simulate_many_events, save_run, update_ratings, record_markdown,
+)
+from run_store import get_run_store
+from transcript import Transcript
+from tax_grid import after_tax_grid, grid_table, selected_metrics
+from monte_carlo import simulate_wealth, wealth_percentiles
+from after_tax_regression import features_from_assumptions, is_model_loaded, predict, run_after_tax_regression
+from warmup import start_background_warm_up, warm_up_enabled
 
 # Quiet a noisy pydantic warning some users see
 warnings.filterwarnings("ignore", message=".*UnsupportedFieldAttributeWarning.*")
 
 # Helpers
-import re, json
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable
 
-def _safe_read(path: str, fallback: str) -> str:
+@st.cache_data(max_entries=8, show_spinner=False)
+def _read_cached(path: str, fallback: str, mtime_ns: int | None) -> str:
+    # mtime_ns is only part of the cache key: an edited file is read again
     try:
         with open(path, "r", encoding="utf-8") as f:
             return f.read()
     except Exception:
         return fallback
 
-@st.cache_data
-def _load_personas_cached(path: str) -> List[Dict[str, Any]]:
-    return load_personas(path)
-
-def _init_chat():
-    if "chat" not in st.session_state:
-        st.session_state.chat = []  # [{"role": "user"|"assistant", "name": str|None, "content": str}]
-
-def _push(role: str, content: str, name: str | None = None):
-    st.session_state.chat.append({"role": role, "name": name, "content": content})
+def _safe_read(path: str, fallback: str) -> str:
+    """File text, re-read only when the file changes."""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    return _read_cached(path, fallback, mtime_ns)
 
-def _render_chat():
-    for m in st.session_state.chat:
-        label = m["name"] if (m["name"] and m["role"] == "assistant") else ("You" if m["role"] == "user" else "System")
-        with st.chat_message("assistant" if m["role"]=="assistant" else "user"):
-            st.markdown(f"**{label}:** {m['content']}")
+def _render_message(m: Dict[str, Any]):
+    label = m["name"] if (m["name"] and m["role"] == "assistant") else ("You" if m["role"] == "user" else "System")
+    with st.chat_message("assistant" if m["role"]=="assistant" else "user"):
+        st.markdown(f"**{label}:** {m['content']}")
 
-_TAG_RE = re.compile(r"\b(usability|copy|trust|speed|a11y|discoverability)\b", flags=re.IGNORECASE)
+def _chat_streamer(box, status, persona_name: str):
+    """
+    on_message callback that renders each turn into `box` the moment it exists
+    (instead of after the whole conversation) and shows who we are waiting on.
+    Only the new turn is drawn; nothing is kept here (the run's Transcript has it).
+    """
+    def on_message(role: str, content: str, name: str | None = None):
+        m = {"role": role, "name": name, "content": content}
+        with box:
+            _render_message(m)
+        if role == "user":
+            status.caption(f"⏳ {persona_name} is responding…")
+        else:
+            status.empty()
+    return on_message
+
+def _render_perf(perf: Dict[str, Any]):
+    """Stage timings + totals from a run's PerfRecorder.to_dict()."""
+    totals = perf["totals"]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Wall time (s)", f"{perf['wall_ms'] / 1000:.2f}")
+    c2.metric("LLM calls", totals["llm_calls"])
+    c3.metric("Retries", totals["retries"])
+    c4.metric("Prompt tokens (est.)", totals["prompt_tokens"])
+    st.dataframe(
+        [{"stage": name, **agg} for name, agg in sorted(perf["stages"].items(), key=lambda kv: -kv[1]["total_ms"])],
+        width="stretch",
+    )
+    turns = [s for s in perf["spans"] if s["name"] == "turn"]
+    if turns:
+        st.caption("Milliseconds per assistant turn (cached turns are near 0)")
+        st.bar_chart({"turn_ms": [s["ms"] for s in turns]})
+
+# ===== Post-run results =====
+# The last Simulate click's runs live in st.session_state.result, so reruns
+# (slider moves, ratings, downloads) show them again instead of dropping them:
+#   {"kind": "single" | "group", "items": [{"run", "run_id", "ratings"}], "errors": {name: str}}
+# Ratings, downloads and transcript browsing are fragments: touching them
+# reruns only that fragment, never the page or a simulation.
+TAGS = ["usability", "copy", "trust", "speed", "a11y", "discoverability"]
+RATING_SLIDERS = [("clarity", "Clarity (1-5)"), ("confidence", "Confidence (1-5)"),
+                  ("likelihood", "Likelihood to Use (1-5)")]
+
+def _tag_counts(transcripts: Iterable[Transcript]) -> Dict[str, int]:
+    agg = {k: 0 for k in TAGS}
+    for transcript in transcripts:
+        for txt in transcript.assistant_texts():
+            agg = merge_counts(agg, count_tags(txt))
+    return agg
+
+def _render_tag_metrics(agg: Dict[str, int]):
+    cols = st.columns(len(agg))
+    for (k, v), c in zip(agg.items(), cols):
+        c.metric(k, v)
+
+def _tag_csv(agg: Dict[str, int]) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["tag", "count"])
+    for k, v in agg.items():
+        writer.writerow([k, v])
+    return buf.getvalue()
+
+@st.fragment
+def _transcript_view(run_id: str, transcript: Transcript):
+    """Transcript with a text filter (filtering reruns only this fragment)."""
+    query = st.text_input("Filter transcript", key=f"filter_{run_id}", placeholder="e.g. trust, tooltip").lower()
+    shown = 0
+    for m in transcript.messages():
+        if not query or query in m["content"].lower():
+            _render_message(m)
+            shown += 1
+    if query:
+        st.caption(f"{shown} of {len(transcript)} message(s)")
+
+@st.fragment
+def _ratings_and_downloads(item: Dict[str, Any], agg: Dict[str, int]):
+    """Ratings sliders + downloads; a changed rating is stored as a new revision of the run."""
+    run_id = item["run_id"]
+    st.download_button("Download tag counts (CSV)", data=_tag_csv(agg), file_name="tag_counts.csv",
+                       mime="text/csv", on_click="ignore", key=f"csv_{run_id}")
+    st.subheader("Quick Ratings (manual)")
+    ratings = {k: st.slider(label, 1, 5, item["ratings"][k], key=f"{k}_{run_id}") for k, label in RATING_SLIDERS}
+    if ratings != item["ratings"]:
+        rev = update_ratings(run_id, ratings)
+        item["ratings"] = ratings
+        st.caption(f"Ratings saved as revision {rev} of run {run_id}.")
+    record = get_run_store().get(run_id)
+    slug = item["run"]["persona"]["name"].replace(" ", "_").replace("/", "-")
+    d1, d2 = st.columns(2)
+    d1.download_button("Download Markdown", record_markdown(record), file_name=f"{slug}_{run_id}.md",
+                       mime="text/markdown", on_click="ignore", key=f"md_{run_id}")
+    d2.download_button("Download JSON", json.dumps(record["payload"], indent=2), file_name=f"{slug}_{run_id}.json",
+                       mime="application/json", on_click="ignore", key=f"json_{run_id}")
+
+def _render_run(item: Dict[str, Any]):
+    run, run_id = item["run"], item["run_id"]
+    st.caption(f"LLM calls this run: {run['llm_calls']} for {run['turns']} turn(s)")
+    if run["cache"]["enabled"]:
+        st.caption(f"Turn cache this run: {run['cache']['hits']} hit(s), {run['cache']['misses']} miss(es)")
+    with st.expander("Prompt tokens per turn", expanded=False):
+        st.caption(
+            f"Context mode: {run['context']['mode']}"
+            + (f" (window {run['context']['window']} turns)" if run['context']['window'] else "")
+            + " · estimated tokens in front of the model before each assistant turn (0 = served from cache)"
+        )
+        st.bar_chart({"prompt_tokens": run["context"]["prompt_tokens"]})
 
-def count_tags(text: str) -> Dict[str, int]:
-    counts = {k: 0 for k in ["usability", "copy", "trust", "speed", "a11y", "discoverability"]}
-    for m in _TAG_RE.findall(text or ""):
-        counts[m.lower()] += 1
-    return counts
+    st.subheader("Transcript")
+    _transcript_view(run_id, run["transcript"])
 
-def merge_counts(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
-    return {k: a.get(k, 0) + b.get(k, 0) for k in set(a) | set(b)}
+    # --- Analytics (Auto): counts of tags in assistant replies ---
+    st.subheader("Analytics (Auto)")
+    agg = _tag_counts([run["transcript"]])
+    _render_tag_metrics(agg)
 
-import re
+    st.info(f"Saved run {run_id} to the run store ({get_run_store().root}/)")
+    _ratings_and_downloads(item, agg)
 
-_META_PAT = re.compile(r'\b(TALK|DONE)\b', re.IGNORECASE)
-_ECHO_PAT = re.compile(r'^Evaluate the feature.*$', re.IGNORECASE)
+    with st.expander("Performance", expanded=False):
+        _render_perf(run["perf"].to_dict())
 
-def _strip_meta(text: str) -> str:
-    if not text:
-        return text
-    DROP_PREFIXES = (
-        "TALK", "DONE", "Evaluate the feature and assumptions",
-        "Feature evaluation for", "Assumptions regarding", "I feel a sense of urgency",
-        "Continue evaluating", "User experience considerations", "Focusing on ",
-        "Impatient with ", "Frustrated with ", "The feature's complexity and the need",
-    )
-    lines = []
-    for ln in text.splitlines():
-        s = ln.strip()
-        if not s:
-            continue
-        if any(s.startswith(p) for p in DROP_PREFIXES):
-            continue
-        # drop headings-y stuff
-        if s.lower().startswith(("feature evaluation", "assumptions", "outputs:")):
-            continue
-        lines.append(s)
-    return "\n".join(lines)
-
-
-def _dedupe_paragraphs(text: str) -> str:
-    if not text:
-        return text
-    parts = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
-    out, seen = [], set()
-    for p in parts:
-        if p not in seen:
-            out.append(p); seen.add(p)
-    return "\n\n".join(out)
-
-def _trim_lines(text: str, max_lines: int) -> str:
-    if not text:
-        return text
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    return "\n".join(lines[:max_lines])
-
-def _enforce_template_initial(text: str) -> str:
-    """
-    Keep exactly: 3 issue lines, 2 suggestion lines, 1 question line (in that order).
-    We detect by simple keywords; if missing, we take first non-empty lines.
-    """
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    issues, suggs, qs = [], [], []
-    for ln in lines:
-        low = ln.lower()
-        if len(issues) < 3 and ("issue" in low or any(t in low for t in ["usability","copy","trust","speed","a11y","discoverability"])):
-            issues.append(ln); continue
-        if len(suggs) < 2 and ("suggestion" in low or low.startswith(("try ", "consider ", "add ", "implement "))):
-            suggs.append(ln); continue
-        if not qs and ("?" in ln or low.startswith("follow-up") or low.startswith("question")):
-            qs = [ln]; continue
-    # fallback fills from remaining lines in order
-    rest = [ln for ln in lines if ln not in issues + suggs + qs]
-    while len(issues) < 3 and rest: issues.append(rest.pop(0))
-    while len(suggs) < 2 and rest: suggs.append(rest.pop(0))
-    if not qs and rest: qs = [rest.pop(0)]
-    ordered = issues + suggs + qs
-    return "\n".join(ordered[:6])
-
-def _enforce_template_followup(text: str) -> str:
-    """
-    Keep exactly: 1 issue, 1 suggestion, 1 question (3 lines).
-    """
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    issue = next((ln for ln in lines if ("issue" in ln.lower() or any(t in ln.lower() for t in ["usability","copy","trust","speed","a11y","discoverability"]))), None)
-    suggestion = next((ln for ln in lines if ("suggestion" in ln.lower() or ln.lower().startswith(("try ","consider ","add ","implement ")))), None)
-    question = next((ln for ln in lines if "?" in ln or ln.lower().startswith(("follow-up","question"))), None)
-    ordered = [x for x in [issue, suggestion, question] if x]
-    # Fallbacks if any are missing
-    rest = [ln for ln in lines if ln not in ordered]
-    while len(ordered) < 3 and rest:
-        ordered.append(rest.pop(0))
-    return "\n".join(ordered[:3])
-
-def _sanitize_reply(text: str, mode: str, prev_text: str | None = None) -> str:
-    # 1) strip meta/echo
-    text = _strip_meta(text)
-    # 2) collapse duplicated paragraphs
-    text = _dedupe_paragraphs(text)
-    # 3) drop exact previous reply
-    if prev_text and text.strip() == prev_text.strip():
-        text = text.splitlines()[0]
-    # 4) enforce template + line cap
-    if mode == "initial":
-        text = _enforce_template_initial(text)
-        text = _trim_lines(text, 6)
-    else:
-        text = _enforce_template_followup(text)
-        text = _trim_lines(text, 3)
-    return text.strip()
-
-
-# ===== Persona validation / normalization =====
-RECOMMENDED_FIELDS = ["occupation", "age", "gender", "location", "education"]
-
-def validate_persona(p: dict) -> dict:
-    """Return {'errors': [...], 'warnings': [...], 'normalized': dict}."""
-    errors, warnings = [], []
-    norm = dict(p)  # shallow copy
-
-    # Required
-    for k in ["name", "biography", "traits", "constraints", "device"]:
-        if k not in p:
-            errors.append(f"Missing required field: {k}")
-
-    # Types
-    if "traits" in p and not isinstance(p["traits"], list):
-        errors.append("traits must be a list of strings")
-    if "constraints" in p and not isinstance(p["constraints"], list):
-        errors.append("constraints must be a list of strings")
-
-    # Recommendations
-    for k in RECOMMENDED_FIELDS:
-        if k not in p:
-            warnings.append(f"Recommended field missing: {k}")
-
-    # Normalizations
-    norm.setdefault("occupation", "Product Manager")
-    norm.setdefault("age", 35)
-    norm.setdefault("gender", "unspecified")
-    norm.setdefault("location", "USA")
-    norm.setdefault("education", "Bachelor's")
-
-    # Ensure lists are clean
-    if isinstance(norm.get("traits"), list):
-        norm["traits"] = [str(t).strip() for t in norm["traits"] if str(t).strip()]
-    if isinstance(norm.get("constraints"), list):
-        norm["constraints"] = [str(c).strip() for c in norm["constraints"] if str(c).strip()]
-
-    return {"errors": errors, "warnings": warnings, "normalized": norm}
-
-def safe_tt_turn(tp, *, prefer_actions=True, force_talk=False):
-    try:
-        if force_talk:
-            return tp.listen_and_act(
-                "Respond now with a single TALK action whose content is plain text (no JSON)."
-            )
-        if prefer_actions:
-            return tp.act(return_actions=True)
-        return tp.act()
-    except Exception as e:
-        return {"error": repr(e)}
+def _render_result(result: Dict[str, Any]):
+    items = result["items"]
+    if result["kind"] == "single":
+        st.success("Simulation complete.")
+        _render_run(items[0])
+        return
+    st.success("All persona simulations complete.")
+    for name, err in result["errors"].items():
+        st.error(f"{name}: simulation failed: {err}")
+    st.subheader("Analytics (Auto) — all selected personas")
+    _render_tag_metrics(_tag_counts(i["run"]["transcript"] for i in items))
+    if items:
+        for tab, item in zip(st.tabs([i["run"]["persona"]["name"] for i in items]), items):
+            with tab:
+                _render_run(item)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _after_tax_grid(assumptions: Dict[str, Any]) -> Dict[str, Any]:
+    """after_tax_grid, so reruns that leave the sliders alone (ratings, downloads, tabs) reuse it."""
+    return after_tax_grid(assumptions)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _monte_carlo(assumptions: Dict[str, Any], n_paths: int):
+    """Percentile table + after-tax wealth histogram (the per-path arrays stay out of the cache)."""
+    result = simulate_wealth(assumptions, n_paths)
+    counts, edges = np.histogram(result["after_tax_wealth"], bins=40)
+    hist = {"after_tax_wealth": np.round((edges[:-1] + edges[1:]) / 2, 3), "paths": counts}
+    return wealth_percentiles(result), hist
+
+@st.cache_resource(show_spinner=False)
+def _background_warm_up():
+    """Once per server process: load TinyTroupe and the regression model off the render path."""
+    return start_background_warm_up()
 
 # 1) Load env + page setup
 load_dotenv()
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+if warm_up_enabled():
+    _background_warm_up()
 
 st.set_page_config(page_title="TinyTroupe Persona Simulator", layout="wide")
 st.title("TinyTroupe Persona Simulator — After-Tax Impact (Draft)")
 
-_init_chat()
-
-if not OPENAI_KEY:
+if backend_name() == "stub":
+    st.info("SIM_BACKEND=stub — replaying recorded replies offline (no LLM calls).")
+elif not OPENAI_KEY:
     st.warning("OPENAI_API_KEY not found. Create a .env in the project root and restart the app.")
     st.stop()
 
@@ -223,11 +225,11 @@ if not OPENAI_KEY:
 col1, col2 = st.columns([1, 2])
 
 with col1:
-    # Personas + schema health
-    raw_personas = _load_personas_cached("app/personas.json")
-    validated = [validate_persona(p) for p in raw_personas]
-    err_ct = sum(len(v["errors"]) for v in validated)
-    warn_ct = sum(len(v["warnings"]) for v in validated)
+    # Personas + schema health (validated once per version of the file, not per rerun)
+    roster = get_persona_registry("app/personas.json").snapshot()
+    err_ct, warn_ct = roster.error_count, roster.warning_count
+    if roster.load_error:
+        st.error(f"Persona file could not be read ({roster.load_error}); using the last good version.")
     if err_ct:
         st.error(f"Persona file: {err_ct} errors, {warn_ct} warnings")
     elif warn_ct:
@@ -235,16 +237,17 @@ with col1:
     else:
         st.caption("Persona file: ✅ schema OK")
     with st.expander("Persona schema diagnostics", expanded=False):
-        for i, v in enumerate(validated):
-            name = raw_personas[i].get("name", f"Persona {i+1}")
-            if v["errors"]:
-                st.write(f"❌ **{name}** errors: {v['errors']}")
-            if v["warnings"]:
-                st.write(f"⚠️ **{name}** warnings: {v['warnings']}")
-
-    personas = [v["normalized"] for v in validated]
-    persona_names = [p["name"] for p in personas]
+        if roster.diagnostics:
+            st.markdown(roster.diagnostics)
+
+    persona_names = roster.names
     persona = st.selectbox("Persona", persona_names)
+    group = st.multiselect(
+        "Simulate several personas together (optional)",
+        persona_names,
+        help="Pick two or more to run their conversations concurrently.",
+    )
+    max_parallel = st.slider("Max concurrent personas", 1, 6, 3)
 
     # Assumptions (these drive your scenario)
     st.subheader("Assumptions")
@@ -276,23 +279,29 @@ with col1:
     feature_spec = st.text_area(
         "Feature Brief (edit as needed)",
         height=220,
-        value=_safe_read(
-            "app/feature_presets.md",
-            "Feature: After-Tax Impact module. Show tax drag, harvest toggles, lot selection, reinvest on/off, turnover, yield."
-        ),
+        value=_safe_read("app/feature_presets.md", DEFAULT_FEATURE_BRIEF),
     )
 
-    scenario = st.selectbox(
-        "Scenario",
-        [
-            "First look (discovery + immediate reaction)",
-            "Guided task (compare Harvest ON vs OFF)",
-            "Week-later (annoyances & delighters)",
-        ],
+    scenario = st.selectbox("Scenario", SCENARIOS)
+    budget_mode = st.checkbox(
+        "Context budget mode",
+        value=False,
+        help="Send the system prompt once and keep only a rolling window of recent turns "
+             "plus a short summary of earlier issues, so long reviews stay cheap per turn.",
+    )
+    if budget_mode:
+        turns = st.slider("Conversation turns", 1, 50, 12)
+        context_window = st.slider("Turns kept in context", 1, 8, 3)
+    else:
+        turns = st.slider("Conversation turns", 1, 8, 4)
+        context_window = None
+    use_cache = st.checkbox(
+        "Use turn cache",
+        value=True,
+        help="Replay unchanged turns from the on-disk cache. Untick to force fresh LLM calls for this run.",
     )
-    turns = st.slider("Conversation turns", 1, 8, 4)
 
-# Build assumptions dict + summary
+# Build assumptions dict
 assumptions = {
     "us_eq": us_eq,
     "intl_eq": intl_eq,
@@ -314,469 +323,142 @@ assumptions = {
     "tax_deferred": tax_deferred,
     "tax_exempt": tax_exempt,
 }
-assumption_text = assumption_summary(assumptions)
-
-import hashlib
-
-def _clean_reply(raw: str, seen_hashes: set[str]) -> str:
-    if not isinstance(raw, str):
-        return ""
-
-    # Drop boilerplate lines and obvious meta noise
-    drop_prefixes = ("TALK", "DONE", "Evaluate the feature and assumptions", 
-                     "Feature evaluation for", "Assumptions regarding", 
-                     "I feel a sense of urgency")
-    lines = []
-    for ln in raw.splitlines():
-        s = ln.strip()
-        if not s:
-            continue
-        if any(s.startswith(p) for p in drop_prefixes):
-            continue
-        lines.append(s)
-
-    # Chunk by blank lines and dedupe semantically similar paragraphs
-    cleaned = []
-    buf = []
-    def flush():
-        if not buf:
-            return
-        paragraph = " ".join(buf).strip()
-        h = hashlib.md5(paragraph.lower().encode("utf-8")).hexdigest()
-        if h not in seen_hashes:
-            seen_hashes.add(h)
-            cleaned.append(paragraph)
-        buf.clear()
-
-    for s in lines:
-        if s == "":
-            flush()
-        else:
-            buf.append(s)
-    flush()
-
-    return "\n\n".join(cleaned).strip()
-
-def pick_text_from_actions(payload) -> str:
-    """
-    Extract plain text from a wide variety of TinyTroupe / LLM reply shapes.
-    Handles:
-    - {"action": {"type":"TALK","content":"..."}}
-    - {"actions": [ {"type":"TALK","content":"..."}, ... ]}
-    - {"type":"TALK","content":"..."}  (top-level)
-    - {"content": "..."} / {"text":"..."} / {"message":"..."}
-    - OpenAI-like {"choices":[{"message":{"content":"..."}}]}
-    - {"data": ...} / {"payload": ...} / {"result": ...} / {"output": ...}
-    - lists/tuples of any of the above
-    - arbitrary objects with .dict() / .model_dump() / __dict__
-    Returns a single newline-joined string.
-    """
-    texts = []
-
-    def maybe_add(s):
-        if isinstance(s, str):
-            s = s.strip()
-            if s:
-                texts.append(s)
-
-    def visit(obj):
-        if obj is None:
-            return
-
-        # String
-        if isinstance(obj, str):
-            maybe_add(obj)
-            return
-
-        # List/Tuple
-        if isinstance(obj, (list, tuple)):
-            for item in obj:
-                visit(item)
-            return
-
-        # Dict-like
-        if isinstance(obj, dict):
-            # OpenAI-like choices/message
-            ch = obj.get("choices")
-            if isinstance(ch, list) and ch:
-                for choice in ch:
-                    if isinstance(choice, dict):
-                        msg = choice.get("message")
-                        if isinstance(msg, dict):
-                            maybe_add(msg.get("content"))
-                # still traverse for any extra text
-                for choice in ch:
-                    visit(choice)
-
-            # common content keys
-            for k in ("content", "text", "message"):
-                maybe_add(obj.get(k))
-
-            # singular action
-            if "action" in obj:
-                a = obj["action"]
-                if isinstance(a, dict):
-                    t = str(a.get("type", "")).upper()
-                    c = a.get("content") or a.get("text") or a.get("message")
-                    if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
-                        maybe_add(c)
-                else:
-                    t = str(a).upper()
-                    if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
-                        c = obj.get("content") or obj.get("text") or obj.get("message")
-                        maybe_add(c)
-
-            # plural actions
-            if "actions" in obj and isinstance(obj["actions"], list):
-                for a in obj["actions"]:
-                    if isinstance(a, dict):
-                        t = str(a.get("type", "")).upper()
-                        if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
-                            c = a.get("content") or a.get("text") or a.get("message")
-                            maybe_add(c)
-                    visit(a)
-
-            # top-level type/content
-            if "type" in obj:
-                t = str(obj.get("type", "")).upper()
-                if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
-                    c = obj.get("content") or obj.get("text") or obj.get("message")
-                    maybe_add(c)
-
-            # nested containers
-            for k in ("data", "payload", "result", "output"):
-                if k in obj:
-                    visit(obj[k])
-
-            # catch-all dive
-            for v in obj.values():
-                visit(v)
-            return
-
-        # model_dump/dict/__dict__
-        for attr in ("model_dump", "dict"):
-            if hasattr(obj, attr) and callable(getattr(obj, attr)):
-                try:
-                    visit(getattr(obj, attr)())
-                    return
-                except Exception:
-                    pass
-
-        d = getattr(obj, "__dict__", None)
-        if isinstance(d, dict):
-            try:
-                visit({k: v for k, v in d.items() if not str(k).startswith("_")})
-                return
-            except Exception:
-                pass
-
-    visit(payload)
-    # join unique non-empty lines to reduce accidental duplicates
-    out = "\n".join([t for t in texts if t])
-    return out.strip()
-
-
 
 with col2:
+    # Recomputed when a slider changes: one vectorized pass over the whole grid,
+    # with the lot effects interpolated from tax_lots' precomputed table
+    st.subheader("After-Tax Impact")
+    grid = _after_tax_grid(assumptions)
+    metrics = selected_metrics(grid, assumptions)
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Pre-tax return", f"{metrics['pre_tax_return']:.2f}%")
+    m2.metric("After-tax return", f"{metrics['after_tax_return']:.2f}%")
+    m3.metric("Tax drag", f"{metrics['tax_drag']:.2f}%")
+    with st.expander("Scenario grid (harvest × lots × reinvest × horizon)", expanded=False):
+        st.caption("Annualized, before liquidation. Low/high: after-tax range over ordinary ±10, "
+                   "LTCG ±5 and state ±3 rate points.")
+        effects = grid["lot_effects"]
+        st.caption(f"Measured on simulated tax-lot ledgers at {turnover}% turnover: Specific ID "
+                   f"({effects['specific_id_method']}) realizes {effects['specific_id_gain_factor']:.0%} of FIFO's gains; harvesting captures "
+                   f"{effects['harvest_loss_rate']:.1%} of the risky sleeve in losses per year.")
+        st.dataframe(grid_table(grid, assumptions), width="stretch")
+    with st.expander(f"Monte Carlo ({horizon}y, selected toggles)", expanded=False):
+        n_paths = st.select_slider("Paths", options=[10_000, 100_000, 1_000_000], value=100_000)
+        if st.button("Run Monte Carlo"):
+            with st.spinner("Simulating paths..."):
+                pct, hist = _monte_carlo(assumptions, n_paths)
+            st.caption("Terminal wealth per $1 invested and annualized tax drag, across paths.")
+            st.dataframe(pct, width="stretch")
+            st.bar_chart(hist, x="after_tax_wealth", y="paths")
+
     st.subheader("Run Simulation")
 
-    if st.button("Simulate"):
+    simulate_clicked = st.button("Simulate")
+
+    if simulate_clicked and len(group) > 1:
+        # Multi-persona: conversations run concurrently; every turn renders in its
+        # persona's panel as soon as it arrives
+        st.session_state.pop("result", None)
+        group_personas = [roster.by_name[n] for n in persona_names if n in group]
+        # Live view while the conversations run; cleared once the results below take over
+        live = st.empty()
+        streamers, footers = {}, {}
+        with live.container():
+            st.write(f"Running {len(group_personas)} personas (up to {max_parallel} at a time)…")
+            for p in group_personas:
+                panel = st.expander(p["name"], expanded=True)
+                box = panel.container()
+                status = panel.empty()
+                status.caption(f"⏳ {p['name']} — queued…")
+                streamers[p["name"]] = _chat_streamer(box, status, p["name"])
+                footers[p["name"]] = status
+
+        items, errors = [], {}
+        for kind, P, data in simulate_many_events(group_personas, scenario, assumptions, feature_spec, turns,
+                                                  max_parallel, use_cache=use_cache,
+                                                  context_window=context_window,
+                                                  agent_specs=roster.agent_specs):
+            if kind == "message":
+                streamers[P["name"]](*data)
+                continue
+            if kind == "error":
+                footers[P["name"]].error(f"Simulation failed: {data!r}")
+                errors[P["name"]] = repr(data)
+                continue
+            run_id = save_run(data)
+            perf = data["perf"].to_dict()
+            footers[P["name"]].caption(f"Saved run {run_id} · {data['llm_calls']} LLM call(s) · "
+                                       f"{perf['wall_ms'] / 1000:.1f}s")
+            items.append({"run": data, "run_id": run_id, "ratings": dict(DEFAULT_RATINGS)})
+
+        # Keep the group's order, not completion order
+        order = {p["name"]: i for i, p in enumerate(group_personas)}
+        items.sort(key=lambda i: order[i["run"]["persona"]["name"]])
+        st.session_state.result = {"kind": "group", "items": items, "errors": errors}
+        live.empty()
+
+    elif simulate_clicked:
         # Start fresh each run
-        st.session_state.chat = []
+        st.session_state.pop("result", None)
 
         # 1) Get the chosen persona
-        P = next((p for p in personas if p["name"] == persona), None)
+        P = roster.by_name.get(persona)
         if not P:
             st.error("Selected persona not found. Check app/personas.json.")
             st.stop()
 
-        # Resilient persona fields
-        bio = P.get("biography") or "No biography provided."
-        traits = P.get("traits") or ["practical", "direct"]
-        constraints = P.get("constraints") or []
-        device = P.get("device") or "iPhone"
-        occupation = P.get("occupation", "Product Manager")
-        age = P.get("age", 35)
-        gender = P.get("gender", "unspecified")
-        location = P.get("location", "USA")
-        education = P.get("education", "Bachelor's")
-
-        # 2) Build the TinyPerson (unchanged from your version) …
-        agent_spec = {
-            "type": "TinyPerson",
-            "persona": {
-                "name": P.get("name", "Unnamed Persona"),
-                "biography": P.get("biography", "No biography provided."),
-                "personality": {"traits": P.get("traits", ["practical", "direct"])},
-                "preferences": {"device": P.get("device", "iPhone")},
-                "constraints": P.get("constraints", []),
-                "occupation": P.get("occupation", "Product Manager"),
-                "age": P.get("age", 35),
-                "gender": P.get("gender", "unspecified"),
-                "location": P.get("location", "USA"),
-                "education": P.get("education", "Bachelor's"),
-            },
-            "memory": [
-                "You are reviewing an After-Tax Impact feature for a portfolio reporting system.",
-                "Be concrete and tag issues with: usability, copy, trust, speed, a11y, discoverability."
-            ],
-        }
-
-        # --- D3 fix: avoid 'Agent name ... is already in use' across reruns (Streamlit Cloud, etc.)
-        # TinyTroupe keeps a global registry of agents; here we clear it so each simulation
-        # run starts with a clean slate.
-        if hasattr(TinyPerson, "all_agents"):
-            TinyPerson.all_agents.clear()
-
-        tp = TinyPerson.load_specification(agent_spec)
-
-
-        if hasattr(tp, "consolidate_episode_memories"):
-            tp.consolidate_episode_memories = lambda *args, **kwargs: None
-
-        required_defaults = {
-            "name": agent_spec["persona"].get("name", "Unnamed Persona"),
-            "occupation": "Product Manager",
-            "age": 35,
-            "gender": "unspecified",
-            "education": "Bachelor's",
-            "nationality": "USA",
-            "marital_status": "unspecified",
-            "location": "USA",
-            "residence": "USA",
-            "hometown": "USA",
-            "birthplace": "USA",
-            "citizenship": "USA",
-            "employer": "Acme Corp",
-            "company": "Acme Corp",
-            "role": "Product Manager",
-            "seniority": "Senior",
-            "industry": "Software",
-            "languages": ["English"],
-            "interests": ["investing", "personal finance", "mobile apps"],
-        }
-        if not hasattr(tp, "_persona") or tp._persona is None:
-            tp._persona = {}
-        for k, v in required_defaults.items():
-            tp._persona.setdefault(k, v)
-        tp._persona.setdefault("personality", {}).setdefault("traits", ["practical", "direct"])
-        tp._persona.setdefault("preferences", {}).setdefault("device", "iPhone")
-        tp._persona.setdefault("constraints", [])
-        for key in ["occupation", "gender", "location", "residence", "hometown", "birthplace",
-                    "citizenship", "education", "employer", "company", "role", "seniority", "industry"]:
-            if not isinstance(tp._persona.get(key, ""), str):
-                tp._persona[key] = str(tp._persona.get(key, ""))
-
-        # 3) Compose prompts
-        system_msg = textwrap.dedent(f"""
-        You are {P['name']}. Stay strictly in character. Be blunt and concise.
-
-        Output rules (hard):
-        - No meta words (TALK, DONE, etc). No headings. Plain text only.
-        - Do not repeat anything already said earlier in this conversation.
-        - Keep the first reply to 6 lines total.
-
-        Content rules:
-        - Call out (1) clarity of assumptions, (2) trust/explainability,
-        (3) speed/clicks, (4) a11y (contrast, keyboardability, focus order, ARIA).
-        """).strip()
-
-
-        user_prompt = textwrap.dedent(f"""
-        Evaluate this feature and assumptions.
-
-        === FEATURE ===
-        {feature_spec.strip()}
-
-        === ASSUMPTION SUMMARY ===
-        {assumption_text}
-
-        === SCENARIO ===
-        {scenario}
-
-        Task: Provide exactly 3 issues (tag each: usability/copy/trust/speed/a11y/discoverability),
-        exactly 2 suggestions, and exactly 1 follow-up question. Keep to 6 lines total.
-
-        Rules: Do not repeat anything already said in this conversation. Do not include the words TALK or DONE.
-        Do not echo this prompt. Plain text only—no headings, no JSON, no bullets with labels like 'TALK'/'DONE'.
-        """).strip()
-
-  
-        # 4) Run turns
-        st.write("Running turns…")
-        transcript = []
-        _seen = set()
-
-        # Send system + user into the agent
-        tp.listen(system_msg)
-        tp.listen(user_prompt)
-
-        # Record the user turn in transcript + chat UI
-        transcript.append(("User", user_prompt))
-        _push("user", user_prompt)
-
-        # ---- PRIME ONE CLEAR TALK, THEN READ IT ----
-        _ = tp.listen_and_act("Respond with a single TALK containing plain text only.")
-        reply = tp.act(return_actions=True)
-
-        # Optional debugging (uncomment if needed)
-        # st.caption("DEBUG first-turn reply:")
-        # st.json(reply)
-
-        # Extract + sanitize (INITIAL mode = 3 issues / 2 suggestions / 1 question)
-        text = pick_text_from_actions(reply)
-        text = _sanitize_reply(text, mode="initial", prev_text=transcript[-1][1])
-
-        # Fallbacks if still empty: try a plain act(), then a minimal placeholder
-        if not text:
-            reply = tp.act()
-            text = pick_text_from_actions(reply)
-            text = _sanitize_reply(text, mode="initial", prev_text=transcript[-1][1])
-
-        if not text:
-            text = (
-                "usability: Inputs feel dense on first open.\n"
-                "suggestion: Add sensible defaults and a 30-second guided tour.\n"
-                "question: Which tax buckets are estimated vs exact?"
-            )
-
-        # Push the FIRST assistant message (this is the “end of first assistant message”)
-        transcript.append((P["name"], text or "(no content)"))
-        _push("assistant", text or "(no content)", P["name"])
-
-
-        for i in range(1, turns):
-            followup = (
-                "Continue the same review. Add ONE new issue (tag it), "
-                "ONE new suggestion, and ONE concise follow-up question. "
-                "They must be different from anything said earlier. "
-                "Plain text only. No meta words (TALK, DONE)."
-            )
-
-            # Log the user follow-up for transcript + chat UI
-            transcript.append(("User", followup))
-            _push("user", followup)
-
-            # Re-prime and act
-            tp.listen(system_msg)
-            tp.listen(followup)
-            reply = tp.act(return_actions=True)
-
-            # Optional debugging (uncomment if needed)
-            # st.caption(f"DEBUG follow-up {i} reply:")
-            # st.json(reply)
-
-            # Extract + sanitize (FOLLOWUP mode = 1/1/1)
-            text = pick_text_from_actions(reply)
-            if not text:
-                reply = tp.act()
-                text = pick_text_from_actions(reply)
-
-            text = _sanitize_reply(text or "", mode="followup", prev_text=transcript[-1][1])
-
-            # Safety placeholder to avoid "(no content)"
-            if not text:
-                text = (
-                    "discoverability: Explainability panel is easy to miss.\n"
-                    "suggestion: Add a prominent 'Why is tax drag X%?' link.\n"
-                    "question: Should we auto-open it when drag > 1%?"
-                )
-
-            # Push assistant turn
-            transcript.append((P["name"], text or "(no content)"))
-            _push("assistant", text or "(no content)", P["name"])
-
-
-
-        st.subheader("Conversation")
-        _render_chat()
-
-        st.success("Simulation complete.")
-
-        # 5) Show transcript
-        st.subheader("Transcript")
-        for who, txt in transcript:
-            if who == "User":
-                st.markdown(f"**You:** {txt}")
-            else:
-                st.markdown(f"**{who}:** {txt}")
-
-
-        # --- Analytics (Auto): counts of tags in assistant replies ---
-        import io, csv
-
-        st.subheader("Analytics (Auto)")
-        agg = {"usability": 0, "copy": 0, "trust": 0, "speed": 0, "a11y": 0, "discoverability": 0}
-
-        # Count tags only from assistant messages
-        for who, txt in transcript:
-            if who != "User":
-                agg = merge_counts(agg, count_tags(txt))
-
-        # Show a quick KPI row
-        cols = st.columns(len(agg))
-        for (k, v), c in zip(agg.items(), cols):
-            c.metric(k, v)
-
-        # Optional: CSV download of the tag counts
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(["tag", "count"])
-        for k, v in agg.items():
-            writer.writerow([k, v])
-
-        st.download_button(
-            "Download tag counts (CSV)",
-            data=buf.getvalue(),
-            file_name="tag_counts.csv",
-            mime="text/csv",
-        )
-
-
-        # 6) Ratings
-        st.subheader("Quick Ratings (manual)")
-        clarity = st.slider("Clarity (1-5)", 1, 5, 3, key="clarity")
-        confidence = st.slider("Confidence (1-5)", 1, 5, 3, key="confidence")
-        likelihood = st.slider("Likelihood to Use (1-5)", 1, 5, 3, key="likelihood")
-
-        # 7) Export Markdown
-        md_lines = []
-        md_lines.append(f"# {persona} — {ts()}")
-        md_lines.append(f"**Scenario:** {scenario}\n")
-        md_lines.append("## Feature (brief)")
-        md_lines.append(feature_spec.strip() + "\n")
-        md_lines.append("## Assumptions")
-        md_lines.append(assumption_text + "\n")
-        md_lines.append("## Transcript")
-        for who, txt in transcript:
-            md_lines.append(f"- **{who}**: {txt}")
-        md_lines.append("\n## Ratings")
-        md_lines.append(f"- Clarity: {clarity}/5")
-        md_lines.append(f"- Confidence: {confidence}/5")
-        md_lines.append(f"- Likelihood: {likelihood}/5")
-        md_lines.append("\n## Notes / Actionables\n- [ ]\n- [ ]\n")
-
-        md = "\n".join(md_lines)
-        md_filename = f"{persona.replace(' ', '_')}_{ts()}.md"
-        md_path = save_markdown("exports", md_filename, md)
-        st.info(f"Saved: {md_path}")
-
-        # 8) Export JSON
-        json_payload = {
-            "timestamp": ts(),
-            "persona": P["name"],
-            "persona_meta": P,
-            "scenario": scenario,
-            "assumptions": assumptions,
-            "assumption_text": assumption_text,
-            "feature_brief": feature_spec.strip(),
-            "turns": turns,
-            "transcript": [{"speaker": who, "text": txt} for (who, txt) in transcript],
-        }
-        json_str = _json.dumps(json_payload, indent=2)
-        json_filename = f"{P['name'].replace(' ', '_')}_{ts()}.json"
-        json_path = save_markdown("exports", json_filename, json_str)
-        st.info(f"Saved JSON: {json_path}")
+        # 2) Build the TinyPerson + 3) compose prompts + 4) run turns (see simulation.py)
+        # Each turn is rendered as soon as it is sanitized; the live view is cleared once the
+        # run is stored, and the results below render the transcript from the run itself.
+        live = st.empty()
+        with live.container():
+            st.subheader("Conversation")
+            chat_box = st.container()
+            chat_status = st.empty()
+            chat_status.caption("Running turns…")
+        run = simulate(P, scenario, assumptions, feature_spec, turns,
+                       on_message=_chat_streamer(chat_box, chat_status, P["name"]), use_cache=use_cache,
+                       context_window=context_window, agent_spec=roster.agent_specs.get(P["name"]))
+
+        # 5) Store the run with default ratings; rating changes add revisions (see _ratings_and_downloads)
+        run_id = save_run(run)
+        st.session_state.result = {"kind": "single", "errors": {},
+                                   "items": [{"run": run, "run_id": run_id, "ratings": dict(DEFAULT_RATINGS)}]}
+        live.empty()
+
+    # Results of the last Simulate click, shown on every rerun until cleared or replaced
+    result = st.session_state.get("result")
+    if result:
+        if st.button("Clear results"):
+            st.session_state.pop("result", None)
+            st.rerun()
+        _render_result(result)
+
+    # --- Turn cache status (process-wide counters) ---
+    with st.expander("Turn cache", expanded=False):
+        cache_stats = get_turn_cache().stats()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Hits", cache_stats["hits"])
+        c2.metric("Misses", cache_stats["misses"])
+        c3.metric("Evictions", cache_stats["evictions"])
+        c4.metric("Size (MB)", f"{cache_stats['size_bytes'] / 1_048_576:.1f} / {cache_stats['max_bytes'] / 1_048_576:.0f}")
+        if st.button("Clear turn cache"):
+            get_turn_cache().clear()
+            st.rerun()
+
+    # --- Agent pool status (built once per persona spec, restored per run) ---
+    with st.expander("Agent pool", expanded=False):
+        pool_stats = get_agent_pool().stats()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Builds", pool_stats["builds"])
+        c2.metric("Reuses", pool_stats["reuses"])
+        c3.metric("Avg build (ms)", f"{pool_stats['avg_build_ms']:.1f}")
+        c4.metric("Avg restore (ms)", f"{pool_stats['avg_restore_ms']:.1f}")
+        if not pool_stats["pooling"]:
+            st.caption("Pooling is off: restoring measured no cheaper than building, so each run builds its agent.")
+        if pool_stats["complete_state"]:
+            st.caption(f"Restoring the complete state of {', '.join(pool_stats['complete_state'])} agents: "
+                       "their class lacks an attribute simulation.AGENT_RUN_STATE lists for it.")
 
                         # === ML Demo Section ===
     st.subheader("ML Demo: After-Tax Return Regression")
@@ -784,15 +466,18 @@ with col2:
     st.markdown(
         "This demo simulates a dataset of pre-tax returns, turnover, yield, and tax "
         "profiles, then trains a linear regression model to predict the *after-tax* "
-        "return. Each click re-trains the model on freshly simulated data."
+        "return. The data is deterministic, so the model is trained once and then reused "
+        "(cached in memory and under `.cache/models/`)."
     )
 
     if st.button("Run ML Demo (simulate & train)", key="run_ml_after_tax"):
         with st.spinner("Simulating data and training regression model..."):
             results = run_after_tax_regression()
 
+        trained = ("Trained" if results["source"] == "trained"
+                   else f"Reused the cached model ({results['source']}), trained")
         st.success(
-            f"Trained on {results['n_samples']} simulated portfolios "
+            f"{trained} on {results['n_samples']} simulated portfolios "
             f"with {results['n_features']} features.\n\n"
             f"Test set size: {results['test_size']} samples\n\n"
             f"R² on test set: **{results['test_r2']:.3f}**\n\n"
@@ -801,3 +486,12 @@ with col2:
 
         st.markdown("**Sample of true vs. predicted after-tax returns (first 10 rows):**")
         st.dataframe(results["sample_df"])
+
+    # Scoring reuses the cached model (no retraining per slider change). Until the
+    # model is loaded (ML demo or APP_WARMUP), skip it so renders never wait on scikit-learn.
+    if is_model_loaded():
+        pred = predict(features_from_assumptions(assumptions, grid["profile"]["pre_tax_return"]))[0]
+        st.caption(f"Model's after-tax return for the current sliders: {pred * 100:.2f}% "
+                   f"(grid engine, {horizon}y: {metrics['after_tax_return']:.2f}%)")
+    else:
+        st.caption("Run the ML demo to score the current sliders with the regression model.")
@@ -0,0 +1,184 @@
+# app/batch.py
+"""
+Headless batch runner: personas × scenarios × assumption sets.
+
+Usage (from the repo root):
+    python app/batch.py app/jobs.example.json --workers 4
+
+Job file (JSON):
+    {
+      "personas_file": "app/personas.json",        # optional
+      "personas": ["PM Priya (Power User)"],         # names, or "all"
+      "population": {"size": 2000, "seed": 7},       # optional: sample variants of those personas
+      "scenarios": ["First look (discovery + immediate reaction)"],   # or "all"
+      "assumption_sets": [{"name": "base"}, {"name": "no-harvest", "harvest": "OFF"}],
+      "feature_brief": "app/feature_presets.md",     # path or literal text
+      "turns": 4,
+      "use_cache": true,                             # replay unchanged turns from .cache/turns
+      "context_window": null,                        # e.g. 3 for context budget mode
+      "export_dir": "exports"                        # run store directory
+    }
+
+Each assumption set is layered over DEFAULT_ASSUMPTIONS (the slider defaults).
+With "population", the selected personas are archetypes and `size` distinct
+variants are sampled from them (seeded, see population.py); personas and jobs
+are streamed to the workers rather than built up front.
+Every job appends its run to the same run store the Simulate button uses
+(see run_store.py); `python app/run_store.py show RUN_ID --markdown` renders one.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Any, Dict, Iterator, List
+
+from dotenv import load_dotenv
+
+from persona_registry import get_persona_registry
+from population import generate_population
+from simulation import (
+    SCENARIOS, DEFAULT_ASSUMPTIONS, DEFAULT_FEATURE_BRIEF, backend_name, simulate, save_run,
+)
+from run_store import get_run_store
+
+
+def _read_brief(value: str | None) -> str:
+    if not value:
+        return DEFAULT_FEATURE_BRIEF
+    if os.path.isfile(value):
+        with open(value, "r", encoding="utf-8") as f:
+            return f.read()
+    return value
+
+def iter_jobs(spec: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one dict per (persona, scenario, assumption set), lazily. With a
+    "population" entry the personas are sampled from the selected archetypes
+    (see population.py) and each is only built when its jobs are reached.
+    """
+    roster = get_persona_registry(spec.get("personas_file", "app/personas.json")).snapshot()
+    personas, by_name = roster.personas, roster.by_name
+
+    wanted = spec.get("personas", "all")
+    if wanted == "all":
+        selected = personas
+    else:
+        missing = [n for n in wanted if n not in by_name]
+        if missing:
+            raise ValueError(f"Unknown persona(s) in job file: {missing}")
+        selected = [by_name[n] for n in wanted]
+
+    population = spec.get("population")
+    if population:
+        records = generate_population(personas, int(population.get("size", 100)), int(population.get("seed", 0)),
+                                      names=[P["name"] for P in selected])
+        persona_stream = (rec.to_persona() for rec in records)
+    else:
+        persona_stream = iter(selected)
+
+    scenarios = spec.get("scenarios", "all")
+    if scenarios == "all":
+        scenarios = SCENARIOS
+
+    assumption_sets = spec.get("assumption_sets") or [{"name": "default"}]
+    feature_spec = _read_brief(spec.get("feature_brief"))
+    turns = int(spec.get("turns", 4))
+    use_cache = bool(spec.get("use_cache", True))
+    context_window = spec.get("context_window")
+
+    index = 0
+    for P in persona_stream:
+        for scenario in scenarios:
+            for i, aset in enumerate(assumption_sets):
+                overrides = {k: v for k, v in aset.items() if k != "name"}
+                yield {
+                    "index": index,
+                    "persona": P,
+                    "scenario": scenario,
+                    "assumption_set": aset.get("name", f"set{i + 1}"),
+                    "assumptions": {**DEFAULT_ASSUMPTIONS, **overrides},
+                    "feature_spec": feature_spec,
+                    "turns": turns,
+                    "use_cache": use_cache,
+                    "context_window": context_window,
+                }
+                index += 1
+
+def expand_jobs(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """All of iter_jobs as a list (fine for hand-written rosters, not for large populations)."""
+    return list(iter_jobs(spec))
+
+def run_job(job: Dict[str, Any], export_dir: str) -> Dict[str, Any]:
+    """Run one job in a worker process and append it to the run store."""
+    t0 = time.perf_counter()
+    run = simulate(job["persona"], job["scenario"], job["assumptions"], job["feature_spec"], job["turns"],
+                   use_cache=job["use_cache"], context_window=job["context_window"])
+    run_id = save_run(run, store=get_run_store(export_dir))
+    return {
+        "index": job["index"],
+        "persona": job["persona"]["name"],
+        "scenario": job["scenario"],
+        "assumption_set": job["assumption_set"],
+        "run_id": run_id,
+        "seconds": round(time.perf_counter() - t0, 2),
+        "cache_hits": run["cache"]["hits"],
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run persona simulations headlessly.")
+    parser.add_argument("job_file", help="JSON job file (personas × scenarios × assumption sets)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="process pool size")
+    parser.add_argument("--export-dir", default=None, help="override export_dir (the run store) from the job file")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the turn cache for every job")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("OPENAI_API_KEY") and backend_name() != "stub":
+        print("OPENAI_API_KEY not found. Create a .env in the project root.", file=sys.stderr)
+        return 2
+
+    with open(args.job_file, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    export_dir = args.export_dir or spec.get("export_dir", "exports")
+    if args.no_cache:
+        spec["use_cache"] = False
+    print(f"Running jobs across {args.workers} worker(s)")
+
+    failures = submitted = 0
+
+    def report(fut, job) -> None:
+        nonlocal failures
+        try:
+            res = fut.result()
+            print(f"[{res['index']:04d}] {res['persona']} | {res['scenario']} | "
+                  f"{res['assumption_set']} -> {res['run_id']} ({res['seconds']}s, {res['cache_hits']} cached)")
+        except Exception as e:
+            failures += 1
+            print(f"[{job['index']:04d}] {job['persona']['name']} FAILED: {e!r}", file=sys.stderr)
+
+    # Jobs are pulled from the stream only as workers free up, so a large
+    # population never sits in memory (or in the pool's queue) all at once
+    max_in_flight = max(1, args.workers) * 4
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        in_flight: Dict[Any, Dict[str, Any]] = {}
+        for job in iter_jobs(spec):
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    report(fut, in_flight.pop(fut))
+            in_flight[pool.submit(run_job, job, export_dir)] = job
+            submitted += 1
+        for fut in as_completed(in_flight):
+            report(fut, in_flight[fut])
+
+    stats = get_run_store(export_dir).stats()
+    print(f"Done: {submitted - failures} ok, {failures} failed · run store {export_dir}/: "
+          f"{stats['runs']} run(s) in {stats['segments']} segment(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
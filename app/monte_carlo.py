@@ -0,0 +1,141 @@
+# app/monte_carlo.py
+"""
+Monte Carlo after-tax wealth over the slider horizon.
+
+`simulate_wealth(assumptions, n_paths)` draws correlated annual returns for
+the seven mix sliders (paths × years × asset classes), rebalances to the
+slider weights each year and runs every path through the same yearly tax
+walk as the scenario grid (tax_grid.tax_year) with the selected harvest,
+lots and reinvest toggles. Lot selection and the baseline harvest rate are
+the grid's ledger-measured values; down years throw off extra harvestable
+losses on top.
+
+Paths are drawn in fixed-size blocks, each from its own seed
+(seed, block index), so a run is reproducible whether the blocks are
+computed inline or spread over a process pool (`workers`).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from tax_grid import (
+    ASSET_COV, ASSET_RETURNS, RISKY_ASSETS, measured_lot_effects, new_tax_state, portfolio_profile, tax_year,
+)
+
+# Share of a down year's loss on the risky sleeve that harvesting captures
+HARVEST_DRAWDOWN_CAPTURE = 0.5
+
+BLOCK_PATHS = 50_000
+# Below this many paths a process pool costs more than it saves
+PARALLEL_MIN_PATHS = 400_000
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _weights(assumptions: Dict[str, Any]) -> np.ndarray:
+    w = np.array([assumptions[k] for k in ASSET_RETURNS], dtype=float)
+    total = w.sum()
+    return w / total if total > 0 else np.eye(len(ASSET_RETURNS))[list(ASSET_RETURNS).index("cash")]
+
+def _params(assumptions: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything a block needs (plain values, so it pickles cheaply to workers)."""
+    w = _weights(assumptions)
+    risky = np.array([k in RISKY_ASSETS for k in ASSET_RETURNS])
+    sheltered = (assumptions["tax_deferred"] + assumptions["tax_exempt"]) / 100.0
+    taxable = float(np.clip(1.0 - sheltered, 0.0, 1.0))
+    niit, state = assumptions["niit"] / 100.0, assumptions["state_rate"] / 100.0
+    effects = measured_lot_effects(portfolio_profile(assumptions))
+    return {
+        "weights": w,
+        "risky_weights": np.where(risky, w, 0.0),
+        "mean": np.array(list(ASSET_RETURNS.values())),
+        "chol": np.linalg.cholesky(ASSET_COV),
+        "horizon": int(assumptions["horizon"]),
+        "yield": assumptions["yield"] / 100.0,
+        "turnover": assumptions["turnover"] / 100.0,
+        "gain_factor": 1.0 if assumptions["lots"] == "FIFO" else effects["specific_id_gain_factor"],
+        "harvest_loss_rate": effects["harvest_loss_rate"],
+        "harvest": assumptions["harvest"] == "ON",
+        "reinvest": assumptions["reinvest"] == "Yes",
+        "rate_income": (assumptions["ord_rate"] / 100.0 + niit + state) * taxable,
+        "rate_gains": (assumptions["ltcg_rate"] / 100.0 + niit + state) * taxable,
+    }
+
+def _simulate_block(params: Dict[str, Any], n_paths: int, seed: int, block: int) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+    horizon, y = params["horizon"], params["yield"]
+    # Correlated asset-class returns: paths × years × assets
+    z = rng.standard_normal((n_paths, horizon, len(ASSET_RETURNS)))
+    asset_returns = params["mean"] + z @ params["chol"].T
+    total = asset_returns @ params["weights"]
+    risky_total = asset_returns @ params["risky_weights"]
+
+    state = new_tax_state(n_paths)
+    pre_value, pre_paid_out = np.ones(n_paths), np.zeros(n_paths)
+    risky_share = params["risky_weights"].sum()
+    for t in range(horizon):
+        g = total[:, t] - y  # price return this year
+        if params["harvest"]:
+            drawdown = np.maximum(-risky_total[:, t], 0.0)
+            harvest_rate = params["harvest_loss_rate"] * risky_share + HARVEST_DRAWDOWN_CAPTURE * drawdown
+        else:
+            harvest_rate = 0.0
+        state = tax_year(state, g, y, params["turnover"], params["gain_factor"], harvest_rate,
+                         params["rate_income"], params["rate_gains"], params["reinvest"])
+        pre_income = pre_value * y
+        pre_value = pre_value * (1.0 + g) + (pre_income if params["reinvest"] else 0.0)
+        pre_paid_out += 0.0 if params["reinvest"] else pre_income
+    return {
+        "after_tax_wealth": state["value"] + state["paid_out"],
+        "pre_tax_wealth": pre_value + pre_paid_out,
+        "taxes": state["taxes"],
+    }
+
+
+def simulate_wealth(
+    assumptions: Dict[str, Any],
+    n_paths: int = 100_000,
+    seed: int = 0,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Terminal wealth per $1 invested after `assumptions["horizon"]` years.
+
+    Returns {"after_tax_wealth", "pre_tax_wealth", "taxes": per-path arrays,
+    "tax_drag": annualized pre-tax minus after-tax return per path,
+    "horizon", "n_paths"}. `workers` > 1 spreads the blocks over a process
+    pool; by default that only happens from PARALLEL_MIN_PATHS paths up.
+    """
+    params = _params(assumptions)
+    sizes = [min(BLOCK_PATHS, n_paths - start) for start in range(0, n_paths, BLOCK_PATHS)]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if n_paths >= PARALLEL_MIN_PATHS else 1
+    workers = max(1, min(workers, len(sizes)))
+
+    if workers == 1:
+        blocks = [_simulate_block(params, n, seed, i) for i, n in enumerate(sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            blocks = list(pool.map(_simulate_block, [params] * len(sizes), sizes, [seed] * len(sizes),
+                                   range(len(sizes))))
+
+    out = {k: np.concatenate([b[k] for b in blocks]) for k in ("after_tax_wealth", "pre_tax_wealth", "taxes")}
+    horizon = params["horizon"]
+    # Annualized; wealth can go to ~0 on extreme paths, so clamp before the root
+    annualize = lambda w: np.maximum(w, 1e-12) ** (1.0 / horizon) - 1.0  # noqa: E731
+    out["tax_drag"] = annualize(out["pre_tax_wealth"]) - annualize(out["after_tax_wealth"])
+    out["horizon"] = horizon
+    out["n_paths"] = n_paths
+    return out
+
+def wealth_percentiles(result: Dict[str, Any], percentiles: Sequence[float] = PERCENTILES) -> pd.DataFrame:
+    """Percentile table: terminal wealth per $1 (pre/after tax), taxes paid and tax drag (% per year)."""
+    qs = np.asarray(percentiles, dtype=float)
+    return pd.DataFrame({
+        "pre_tax_wealth": np.percentile(result["pre_tax_wealth"], qs),
+        "after_tax_wealth": np.percentile(result["after_tax_wealth"], qs),
+        "taxes_paid": np.percentile(result["taxes"], qs),
+        "tax_drag_%": np.percentile(result["tax_drag"], qs) * 100.0,
+    }, index=pd.Index([f"p{q:g}" for q in qs], name="percentile")).round(4)
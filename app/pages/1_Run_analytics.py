@@ -0,0 +1,69 @@
+# app/pages/1_Run_analytics.py
+"""Dashboard over every exported run (see analytics.py)."""
+import streamlit as st
+
+from analytics import (
+    RATING_COLUMNS, RunAnalytics, TAGS, dominant_tags, filter_runs, runs_over_time, tag_share, tag_totals,
+)
+from run_store import get_run_store
+
+st.set_page_config(page_title="Run analytics", layout="wide")
+st.title("Run analytics — all stored runs")
+
+@st.cache_resource
+def _analytics() -> RunAnalytics:
+    # One table per server process: reruns and page switches only ingest new runs/revisions
+    return RunAnalytics(get_run_store())
+
+def _flat_index(df):
+    """Charts need a single-level index; join grouped keys into one label."""
+    if df.index.nlevels > 1:
+        df = df.copy()
+        df.index = [" · ".join(map(str, key)) for key in df.index]
+    return df
+
+store = _analytics()
+c1, c2 = st.columns([4, 1])
+if c2.button("Rebuild from scratch"):
+    store.clear()
+df = store.refresh()
+c1.caption(f"{len(df)} run(s) indexed · {store.parsed} run(s) read on this load")
+
+if df.empty:
+    st.info("No stored runs yet. Run a simulation (or `python app/batch.py ...`) first; "
+            "older per-run exports load with `python app/run_store.py import exports/*.json`.")
+    st.stop()
+
+f1, f2, f3 = st.columns(3)
+personas = f1.multiselect("Personas", sorted(df["persona"].dropna().unique()))
+scenarios = f2.multiselect("Scenarios", sorted(df["scenario"].dropna().unique()))
+group_by = f3.multiselect("Group by", ["persona", "scenario", "lots", "harvest", "reinvest", "horizon"],
+                          default=["persona"])
+view = filter_runs(df, personas, scenarios)
+if view.empty:
+    st.warning("No runs match these filters.")
+    st.stop()
+by = group_by or ["persona"]
+
+st.subheader("Tag mentions")
+totals = tag_totals(view, by)
+st.dataframe(totals, width="stretch")
+st.bar_chart(_flat_index(totals[TAGS]))
+
+st.subheader("Dominant tag")
+st.dataframe(dominant_tags(view, by).style.format({"share": "{:.0%}"}, na_rep="—"), width="stretch")
+
+with st.expander("Tag share per group", expanded=False):
+    st.dataframe(tag_share(view, by).style.format("{:.0%}"), width="stretch")
+
+st.subheader("Runs over time")
+st.line_chart(runs_over_time(view, "D")[["runs"]])
+
+with st.expander("Ratings, LLM calls and wall time per run (mean)", expanded=False):
+    st.dataframe(
+        view.groupby(by, observed=True)[RATING_COLUMNS + ["llm_calls", "wall_ms", "turns"]].mean().round(1),
+        width="stretch",
+    )
+
+with st.expander("Runs table", expanded=False):
+    st.dataframe(view, width="stretch")
@@ -0,0 +1,80 @@
+# app/perf.py
+"""
+Per-run performance telemetry.
+
+A PerfRecorder collects timed spans (agent construction, every listen/act,
+extraction, sanitization, export writes) plus whatever counters the caller
+attaches to them (token estimates, retries, LLM calls). `to_dict()` is what
+ends up under the `perf` key of every exported JSON, so slow runs can be
+diagnosed after the fact and compared across runs. `stop()` fixes the wall
+time (simulate() calls it when the conversation ends), so a finished run
+re-rendered later reports the same `wall_ms`.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class PerfRecorder:
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._t1: Optional[float] = None
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time the body of a `with` block. The yielded dict starts as `attrs`;
+        anything the body adds to it (e.g. tokens once known) is recorded too.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            rec = {"name": name, "start_ms": round((t0 - self._t0) * 1000.0, 3), "ms": round(ms, 3), **attrs}
+            with self._lock:
+                self.spans.append(rec)
+
+    def stop(self) -> None:
+        """End the wall clock (first call wins); spans recorded afterwards are still kept."""
+        with self._lock:
+            if self._t1 is None:
+                self._t1 = time.perf_counter()
+
+    def wall_ms(self) -> float:
+        end = self._t1 if self._t1 is not None else time.perf_counter()
+        return round((end - self._t0) * 1000.0, 3)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per span name: count, total/mean/max milliseconds."""
+        with self._lock:
+            spans = list(self.spans)
+        out: Dict[str, Dict[str, float]] = {}
+        for s in spans:
+            agg = out.setdefault(s["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            agg["count"] += 1
+            agg["total_ms"] += s["ms"]
+            agg["max_ms"] = max(agg["max_ms"], s["ms"])
+        for agg in out.values():
+            agg["mean_ms"] = agg["total_ms"] / agg["count"]
+            agg["total_ms"] = round(agg["total_ms"], 3)
+            agg["mean_ms"] = round(agg["mean_ms"], 3)
+        return out
+
+    def total(self, attr: str) -> int:
+        """Sum of a numeric span attribute (e.g. "prompt_tokens", "retries") over all spans."""
+        with self._lock:
+            return sum(s.get(attr) or 0 for s in self.spans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "wall_ms": self.wall_ms(),
+            "stages": self.summary(),
+            "totals": {k: self.total(k) for k in ("prompt_tokens", "reply_tokens", "llm_calls", "retries")},
+            "spans": spans,
+        }
@@ -0,0 +1,120 @@
+# app/persona_registry.py
+"""
+Validated personas for a persona file, reloaded only when the file changes.
+
+`get_persona_registry(path).snapshot()` is what every Streamlit rerun calls.
+It costs one os.stat while the file is unchanged. When the mtime or size
+moves, the file is read and hashed. A new content hash re-parses it and
+validates and normalizes every persona once. Each persona's agent spec is
+also built then, along with the diagnostics text. A touched file with the
+same content keeps the old snapshot.
+
+A file that fails to parse keeps serving the last good snapshot, with
+`load_error` set so the UI can say so. With no earlier snapshot the error is
+raised.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from simulation import build_agent_spec, validate_persona
+
+# Diagnostics lines rendered per snapshot; a file with thousands of issues
+# stays cheap to show on every rerun
+MAX_DIAGNOSTIC_LINES = 200
+
+
+class PersonaSnapshot:
+    """One version of the persona file. Treat as read-only: reruns share it."""
+
+    def __init__(self, path: str, digest: str, raw: List[Dict[str, Any]]):
+        self.path = path
+        self.digest = digest
+        self.load_error: Optional[str] = None
+        self.personas: List[Dict[str, Any]] = []
+        self.by_name: Dict[str, Dict[str, Any]] = {}
+        self.agent_specs: Dict[str, Dict[str, Any]] = {}
+        self.error_count = 0
+        self.warning_count = 0
+        lines = []
+        for i, p in enumerate(raw):
+            if not isinstance(p, dict):
+                self.error_count += 1
+                lines.append(f"❌ **Entry {i+1}** is not a JSON object (skipped)")
+                continue
+            v = validate_persona(p)
+            norm = v["normalized"]
+            name = p.get("name", f"Persona {i+1}")
+            self.error_count += len(v["errors"])
+            self.warning_count += len(v["warnings"])
+            if v["errors"]:
+                lines.append(f"❌ **{name}** errors: {v['errors']}")
+            if v["warnings"]:
+                lines.append(f"⚠️ **{name}** warnings: {v['warnings']}")
+            self.personas.append(norm)
+            if "name" in norm:
+                self.by_name.setdefault(norm["name"], norm)
+                self.agent_specs.setdefault(norm["name"], build_agent_spec(norm))
+        self.names = list(self.by_name)
+        more = len(lines) - MAX_DIAGNOSTIC_LINES
+        self.diagnostics = "  \n".join(lines[:MAX_DIAGNOSTIC_LINES]) + (
+            f"  \n…and {more} more" if more > 0 else "")
+
+    def __len__(self) -> int:
+        return len(self.personas)
+
+
+class PersonaRegistry:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat: Optional[Tuple[int, int]] = None
+        self._snapshot: Optional[PersonaSnapshot] = None
+        self._good: Optional[PersonaSnapshot] = None  # last snapshot that parsed
+        self.loads = 0
+
+    def snapshot(self) -> PersonaSnapshot:
+        """The current snapshot; re-validates only if the file's content changed."""
+        st = os.stat(self.path)
+        key = (st.st_mtime_ns, st.st_size)
+        if key == self._stat and self._snapshot is not None:
+            return self._snapshot
+        with self._lock:
+            if key == self._stat and self._snapshot is not None:
+                return self._snapshot
+            with open(self.path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if self._good is None or digest != self._good.digest:
+                try:
+                    raw = json.loads(data.decode("utf-8"))
+                    if not isinstance(raw, list):
+                        raise ValueError("persona file must be a JSON list")
+                    self._good = PersonaSnapshot(self.path, digest, raw)
+                    self._snapshot = self._good
+                    self.loads += 1
+                except (ValueError, UnicodeDecodeError) as e:
+                    if self._good is None:
+                        raise
+                    # Keep serving the last good version; the next change retries
+                    self._snapshot = copy.copy(self._good)
+                    self._snapshot.load_error = f"{type(e).__name__}: {e}"
+            else:
+                self._snapshot = self._good
+            self._stat = key
+            return self._snapshot
+
+
+_registries: Dict[str, PersonaRegistry] = {}
+_registries_lock = threading.Lock()
+
+def get_persona_registry(path: str = "app/personas.json") -> PersonaRegistry:
+    """One registry per persona file per process."""
+    key = os.path.abspath(path)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = PersonaRegistry(path)
+        return _registries[key]
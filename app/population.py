@@ -0,0 +1,210 @@
+# app/population.py
+"""
+Synthetic persona populations sampled from the hand-written archetypes.
+
+`generate_population(archetypes, size, seed)` streams PersonaRecords. Each
+record is one archetype with its age jittered, its device, occupation and
+education sometimes swapped for another archetype's, and its traits and
+constraints a subset of its own plus, sometimes, one borrowed from the rest
+of the roster. Sampling uses one seeded random.Random, so a (roster, size,
+seed) triple always yields the same population in the same order.
+Variants that repeat an earlier record's attributes are skipped.
+
+Records are compact: __slots__ instead of a per-record dict, and every
+string comes from a vocabulary interned once, so 100k records share a few
+dozen string objects. A record turns into the normalized persona dict
+`simulate()` takes with `to_persona()`, only when it is about to run.
+Nothing holds the whole population: the generator keeps only the keys it
+has already emitted (for de-duplication).
+
+Usage (from the repo root):
+    python app/population.py --size 5000 --seed 7 --out population.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+AGE_JITTER = 8          # standard deviation, years
+AGE_RANGE = (22, 75)
+SWAP_DEVICE = 0.5       # chance of another archetype's device
+SWAP_OCCUPATION = 0.15
+SWAP_EDUCATION = 0.2
+BORROW_TRAIT = 0.35     # chance of one extra trait from another archetype
+BORROW_CONSTRAINT = 0.25
+GENDERS = ("female", "male", "unspecified")
+# Stop once this many samples in a row were duplicates (the variant space is used up)
+MAX_CONSECUTIVE_DUPLICATES = 10_000
+
+
+class PersonaRecord:
+    __slots__ = ("name", "archetype", "biography", "traits", "constraints", "device",
+                 "occupation", "age", "gender", "location", "education")
+
+    def __init__(self, name: str, archetype: str, biography: str, traits: Tuple[str, ...],
+                 constraints: Tuple[str, ...], device: str, occupation: str, age: int, gender: str,
+                 location: str, education: str):
+        self.name = name
+        self.archetype = archetype
+        self.biography = biography
+        self.traits = traits
+        self.constraints = constraints
+        self.device = device
+        self.occupation = occupation
+        self.age = age
+        self.gender = gender
+        self.location = location
+        self.education = education
+
+    def key(self) -> Tuple:
+        """Everything but the name: two records with the same key are the same persona."""
+        return (self.archetype, self.traits, self.constraints, self.device, self.occupation,
+                self.age, self.gender, self.location, self.education)
+
+    def to_persona(self) -> Dict[str, Any]:
+        """The normalized persona dict (the shape validate_persona returns)."""
+        return {
+            "name": self.name,
+            "biography": self.biography,
+            "traits": list(self.traits),
+            "constraints": list(self.constraints),
+            "device": self.device,
+            "occupation": self.occupation,
+            "age": self.age,
+            "gender": self.gender,
+            "location": self.location,
+            "education": self.education,
+            "archetype": self.archetype,
+        }
+
+    def __repr__(self) -> str:
+        return f"PersonaRecord({self.name!r}, age={self.age}, device={self.device!r})"
+
+
+def _intern(value: Any) -> str:
+    return sys.intern(str(value))
+
+def _vocab(values) -> Tuple[str, ...]:
+    return tuple(sorted({_intern(v) for v in values}))
+
+class _Archetype:
+    __slots__ = ("name", "biography", "traits", "constraints", "device", "occupation", "age",
+                 "gender", "location", "education", "borrow_traits", "borrow_constraints")
+
+
+def _archetypes(personas: Sequence[Dict[str, Any]]) -> List[_Archetype]:
+    all_traits = _vocab(t for p in personas for t in p.get("traits", []))
+    all_constraints = _vocab(c for p in personas for c in p.get("constraints", []))
+    out = []
+    for p in personas:
+        a = _Archetype()
+        a.name = _intern(p["name"])
+        a.biography = _intern(p.get("biography", ""))
+        a.traits = tuple(_intern(t) for t in p.get("traits", []))
+        a.constraints = tuple(_intern(c) for c in p.get("constraints", []))
+        a.device = _intern(p.get("device", "iPhone"))
+        a.occupation = _intern(p.get("occupation", "Product Manager"))
+        a.age = int(p.get("age", 35))
+        a.gender = _intern(p.get("gender", "unspecified"))
+        a.location = _intern(p.get("location", "USA"))
+        a.education = _intern(p.get("education", "Bachelor's"))
+        a.borrow_traits = tuple(t for t in all_traits if t not in a.traits)
+        a.borrow_constraints = tuple(c for c in all_constraints if c not in a.constraints)
+        out.append(a)
+    return out
+
+def _subset(rng: random.Random, items: Tuple[str, ...]) -> List[str]:
+    """A non-empty random subset, in the original order (empty only if items is)."""
+    if not items:
+        return []
+    picked = [x for x in items if rng.random() < 0.75]
+    return picked or [rng.choice(items)]
+
+
+def generate_population(
+    archetypes: Sequence[Dict[str, Any]],
+    size: int,
+    seed: int = 0,
+    names: Optional[Sequence[str]] = None,
+) -> Iterator[PersonaRecord]:
+    """
+    Yield up to `size` distinct PersonaRecords sampled from `archetypes`
+    (normalized persona dicts). `names` restricts which archetypes are
+    sampled; devices, traits etc. are still drawn from all of them.
+    Fewer are yielded only if the variant space runs out.
+    """
+    arcs = _archetypes(archetypes)
+    pick = [i for i, a in enumerate(arcs) if names is None or a.name in names]
+    if not pick:
+        raise ValueError("No archetypes to sample from")
+    devices = _vocab(a.device for a in arcs)
+    occupations = _vocab(a.occupation for a in arcs)
+    educations = _vocab(a.education for a in arcs)
+    genders = _vocab(GENDERS)
+    rng = random.Random(seed)
+    seen = set()
+    counts = [0] * len(arcs)
+    emitted = duplicates = 0
+    while emitted < size and duplicates < MAX_CONSECUTIVE_DUPLICATES:
+        i = pick[rng.randrange(len(pick))]
+        a = arcs[i]
+        traits = _subset(rng, a.traits)
+        if a.borrow_traits and rng.random() < BORROW_TRAIT:
+            traits.append(rng.choice(a.borrow_traits))
+        constraints = _subset(rng, a.constraints)
+        if a.borrow_constraints and rng.random() < BORROW_CONSTRAINT:
+            constraints.append(rng.choice(a.borrow_constraints))
+        age = int(min(max(round(rng.gauss(a.age, AGE_JITTER)), AGE_RANGE[0]), AGE_RANGE[1]))
+        rec = PersonaRecord(
+            name="",
+            archetype=a.name,
+            biography=a.biography,
+            traits=tuple(traits),
+            constraints=tuple(constraints),
+            device=rng.choice(devices) if rng.random() < SWAP_DEVICE else a.device,
+            occupation=rng.choice(occupations) if rng.random() < SWAP_OCCUPATION else a.occupation,
+            age=age,
+            gender=rng.choice(genders),
+            location=a.location,
+            education=rng.choice(educations) if rng.random() < SWAP_EDUCATION else a.education,
+        )
+        key = rec.key()
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        duplicates = 0
+        counts[i] += 1
+        rec.name = f"{a.name} #{counts[i]}"
+        emitted += 1
+        yield rec
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sample a synthetic persona population (JSON Lines).")
+    parser.add_argument("--personas", default="app/personas.json", help="archetype file")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--archetype", action="append", default=None, help="only sample from these (repeatable)")
+    parser.add_argument("--out", default="-", help="output .jsonl file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    from persona_registry import get_persona_registry
+    archetypes = get_persona_registry(args.personas).snapshot().personas
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    n = 0
+    try:
+        # One line per record as it is generated: no list of the population is ever built
+        for rec in generate_population(archetypes, args.size, args.seed, args.archetype):
+            out.write(json.dumps(rec.to_persona(), ensure_ascii=False) + "\n")
+            n += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{n} persona(s){' (variant space exhausted)' if n < args.size else ''}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+# app/replies.py
+"""
+Reply extraction + cleanup for TinyTroupe turns.
+
+Kept free of Streamlit so the UI and the headless batch runner share
+exactly the same sanitization pipeline.
+"""
+import re
+import hashlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ===== Tag analytics =====
+_TAG_RE = re.compile(r"\b(usability|copy|trust|speed|a11y|discoverability)\b", flags=re.IGNORECASE)
+
+def count_tags(text: str) -> Dict[str, int]:
+    counts = {k: 0 for k in ["usability", "copy", "trust", "speed", "a11y", "discoverability"]}
+    for m in _TAG_RE.findall(text or ""):
+        counts[m.lower()] += 1
+    return counts
+
+def merge_counts(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
+    return {k: a.get(k, 0) + b.get(k, 0) for k in set(a) | set(b)}
+
+
+# ===== Sanitizer =====
+# Lines starting with one of these (case-sensitive) are meta/echo noise
+_DROP_PREFIXES = (
+    "TALK", "DONE", "Evaluate the feature and assumptions",
+    "Feature evaluation for", "Assumptions regarding", "I feel a sense of urgency",
+    "Continue evaluating", "User experience considerations", "Focusing on ",
+    "Impatient with ", "Frustrated with ", "The feature's complexity and the need",
+)
+# Headings-y stuff, matched against the lowercased line
+_DROP_HEADINGS = ("feature evaluation", "assumptions", "outputs:")
+
+_TAGS = ("usability", "copy", "trust", "speed", "a11y", "discoverability")
+_SUGGESTION_STARTS = ("try ", "consider ", "add ", "implement ")
+_QUESTION_STARTS = ("follow-up", "question")
+
+def _prefix_matcher(prefixes) -> re.Pattern:
+    """One anchored alternation instead of a startswith() per prefix."""
+    return re.compile("|".join(re.escape(p) for p in sorted(prefixes, key=len, reverse=True)))
+
+_DROP_RE = _prefix_matcher(_DROP_PREFIXES)
+_ISSUE_RE = re.compile("|".join(("issue",) + _TAGS))
+
+# Line classes (bit flags) used by the template selection
+_ISSUE, _SUGGESTION, _QUESTION = 1, 2, 4
+
+def _classify(ln: str) -> int:
+    low = ln.lower()
+    kind = 0
+    if _ISSUE_RE.search(low):
+        kind |= _ISSUE
+    if "suggestion" in low or low.startswith(_SUGGESTION_STARTS):
+        kind |= _SUGGESTION
+    if "?" in ln or low.startswith(_QUESTION_STARTS):
+        kind |= _QUESTION
+    return kind
+
+# Enough characters to decide _DROP_HEADINGS without lowering the whole line
+_HEADING_WINDOW = max(map(len, _DROP_HEADINGS))
+
+def _scan(text: str) -> List[str]:
+    """
+    Single pass over the reply: strip and drop meta/echo/heading lines.
+    Lines are lowered (for classification) only once the template needs them.
+    """
+    lines: List[str] = []
+    for ln in text.splitlines():
+        s = ln.strip()
+        if not s or _DROP_RE.match(s) or s[:_HEADING_WINDOW].lower().startswith(_DROP_HEADINGS):
+            continue
+        lines.append(s)
+    return lines
+
+def _fill(picked: List[str], lines: List[str], want: int) -> List[str]:
+    """Top `picked` up to `want` lines with the unpicked lines, in order."""
+    if len(picked) >= want:
+        return picked
+    taken = set(picked)
+    for ln in lines:
+        if ln not in taken:
+            picked.append(ln)
+            if len(picked) >= want:
+                break
+    return picked
+
+def _select_initial(lines: List[str]) -> List[str]:
+    """
+    Keep exactly: 3 issue lines, 2 suggestion lines, 1 question line (in that order).
+    We detect by simple keywords; if missing, we take first non-empty lines.
+    """
+    issues: List[str] = []
+    suggs: List[str] = []
+    qs: List[str] = []
+    for ln in lines:
+        kind = _classify(ln)
+        if kind & _ISSUE and len(issues) < 3:
+            issues.append(ln)
+        elif kind & _SUGGESTION and len(suggs) < 2:
+            suggs.append(ln)
+        elif kind & _QUESTION and not qs:
+            qs.append(ln)
+        else:
+            continue
+        if len(issues) == 3 and len(suggs) == 2 and qs:
+            return issues + suggs + qs  # template full: later lines cannot change it
+    # fallback fills from remaining lines in order
+    taken = set(issues) | set(suggs) | set(qs)
+    rest = (ln for ln in lines if ln not in taken)
+    for bucket, want in ((issues, 3), (suggs, 2), (qs, 1)):
+        while len(bucket) < want:
+            ln = next(rest, None)
+            if ln is None:
+                break
+            bucket.append(ln)
+    return issues + suggs + qs
+
+def _select_followup(lines: List[str]) -> List[str]:
+    """
+    Keep exactly: 1 issue, 1 suggestion, 1 question (3 lines).
+    """
+    found: Dict[int, str] = {}
+    for ln in lines:
+        kind = _classify(ln)
+        for flag in (_ISSUE, _SUGGESTION, _QUESTION):
+            if kind & flag and flag not in found:
+                found[flag] = ln
+        if len(found) == 3:
+            break
+    ordered = [found[f] for f in (_ISSUE, _SUGGESTION, _QUESTION) if f in found]
+    # Fallbacks if any are missing
+    return _fill(ordered, lines, 3)[:3]
+
+def sanitize_reply(text: str, mode: str, prev_text: str | None = None) -> str:
+    """
+    Strip meta/echo lines, drop an exact repeat of the previous reply and
+    enforce the reply template (initial: 3 issues / 2 suggestions / 1 question,
+    follow-up: 1/1/1). Lines are split and stripped once, and only lowered
+    and classified until the template is full.
+    """
+    lines = _scan(text or "")
+    # drop exact previous reply (keep only its first line)
+    if prev_text and lines and "\n".join(lines) == prev_text.strip():
+        lines = lines[:1]
+    picked = _select_initial(lines) if mode == "initial" else _select_followup(lines)
+    return "\n".join(picked)
+
+
+_CLEAN_DROP_RE = _prefix_matcher(_DROP_PREFIXES[:6])
+
+def _clean_reply(raw: str, seen_hashes: set[str]) -> str:
+    if not isinstance(raw, str):
+        return ""
+
+    # Drop boilerplate lines and obvious meta noise
+    lines = []
+    for ln in raw.splitlines():
+        s = ln.strip()
+        if not s or _CLEAN_DROP_RE.match(s):
+            continue
+        lines.append(s)
+
+    # Chunk by blank lines and dedupe semantically similar paragraphs
+    cleaned = []
+    buf = []
+    def flush():
+        if not buf:
+            return
+        paragraph = " ".join(buf).strip()
+        h = hashlib.md5(paragraph.lower().encode("utf-8")).hexdigest()
+        if h not in seen_hashes:
+            seen_hashes.add(h)
+            cleaned.append(paragraph)
+        buf.clear()
+
+    for s in lines:
+        if s == "":
+            flush()
+        else:
+            buf.append(s)
+    flush()
+
+    return "\n\n".join(cleaned).strip()
+
+
+# ===== Action payload extraction =====
+_TALK_TYPES = {"TALK", "SAY", "SPEAK", "REPLY"}
+_CONTENT_KEYS = ("content", "text", "message")
+_CONTAINER_KEYS = ("data", "payload", "result", "output")
+_SCALARS = (str, int, float, bool, type(None))
+_ACTION_ITEM_KEYS = {"action", "cognitive_state"}
+# Deeper nodes are ignored (no real reply nests anywhere near this)
+MAX_PAYLOAD_DEPTH = 64
+
+class _Fallback(Exception):
+    """A fast path met something outside its shape; use the generic walker."""
+
+class _Texts:
+    """Collected reply texts: stripped, non-empty, each kept once in first-seen order."""
+    __slots__ = ("seen", "out")
+
+    def __init__(self):
+        self.seen: set = set()
+        self.out: List[str] = []
+
+    def add(self, s) -> None:
+        if isinstance(s, str):
+            s = s.strip()
+            if s and s not in self.seen:
+                self.seen.add(s)
+                self.out.append(s)
+
+def _spoken(d: dict):
+    return d.get("content") or d.get("text") or d.get("message")
+
+def _is_talk(t) -> bool:
+    return str(t).upper() in _TALK_TYPES
+
+def _walk(payload, texts: _Texts) -> None:
+    """
+    Generic walker: the same preorder the old recursive `visit` used (explicit
+    keys first, then a dive over every value), but iterative, with an
+    identity-based visited set (shared subtrees and cycles are walked once)
+    and a depth limit.
+    """
+    visited: Dict[int, Any] = {}  # id -> node; holding the node keeps ids of temporaries unique
+    stack: List[Tuple[bool, Any, int]] = []  # (is_visit, node or text, depth)
+    add = texts.add
+
+    def push(ops: List[Tuple[bool, Any, int]]) -> None:
+        # Texts queued before this node's first child can be emitted right away
+        i, n = 0, len(ops)
+        while i < n and not ops[i][0]:
+            add(ops[i][1])
+            i += 1
+        if i < n:
+            stack.extend(reversed(ops[i:]))
+
+    def child_op(v, depth: int) -> Optional[Tuple[bool, Any, int]]:
+        # Strings are texts; other scalars and nodes already walked add nothing
+        if isinstance(v, str):
+            return (False, v, 0)
+        if v is None or isinstance(v, (int, float)) or id(v) in visited:
+            return None
+        return (True, v, depth)
+
+    first = child_op(payload, 0)
+    if first:
+        push([first])
+    while stack:
+        is_visit, obj, depth = stack.pop()
+        if not is_visit:
+            add(obj)
+            continue
+        if id(obj) in visited or depth > MAX_PAYLOAD_DEPTH:
+            continue
+        visited[id(obj)] = obj
+        child = depth + 1
+
+        # List/Tuple
+        if isinstance(obj, (list, tuple)):
+            push([op for op in (child_op(item, child) for item in obj) if op])
+            continue
+
+        # Dict-like: this node's steps in order
+        if isinstance(obj, dict):
+            ops: List[Tuple[bool, Any, int]] = []
+            # OpenAI-like choices/message
+            ch = obj.get("choices")
+            if isinstance(ch, list) and ch:
+                for choice in ch:
+                    if isinstance(choice, dict):
+                        msg = choice.get("message")
+                        if isinstance(msg, dict):
+                            ops.append((False, msg.get("content"), 0))
+                ops.extend(op for op in (child_op(c, child) for c in ch) if op)
+
+            # common content keys
+            ops.extend((False, obj.get(k), 0) for k in _CONTENT_KEYS)
+
+            # singular action
+            if "action" in obj:
+                a = obj["action"]
+                if isinstance(a, dict):
+                    if _is_talk(a.get("type", "")):
+                        ops.append((False, _spoken(a), 0))
+                elif _is_talk(a):
+                    ops.append((False, _spoken(obj), 0))
+
+            # plural actions
+            if "actions" in obj and isinstance(obj["actions"], list):
+                for a in obj["actions"]:
+                    if isinstance(a, dict) and _is_talk(a.get("type", "")):
+                        ops.append((False, _spoken(a), 0))
+                    op = child_op(a, child)
+                    if op:
+                        ops.append(op)
+
+            # top-level type/content
+            if "type" in obj and _is_talk(obj.get("type", "")):
+                ops.append((False, _spoken(obj), 0))
+
+            # nested containers, then the catch-all dive (repeats are skipped when popped)
+            ops.extend(op for op in (child_op(obj[k], child) for k in _CONTAINER_KEYS if k in obj) if op)
+            ops.extend(op for op in (child_op(v, child) for v in obj.values()) if op)
+            push(ops)
+            continue
+
+        # model_dump/dict/__dict__
+        dumped = None
+        for attr in ("model_dump", "dict"):
+            fn = getattr(obj, attr, None)
+            if callable(fn):
+                try:
+                    dumped = fn()
+                    break
+                except Exception:
+                    pass
+        if dumped is None:
+            d = getattr(obj, "__dict__", None)
+            if isinstance(d, dict):
+                dumped = {k: v for k, v in d.items() if not str(k).startswith("_")}
+        if dumped is not None:
+            op = child_op(dumped, child)
+            if op:
+                push([op])
+
+def _flat(d: dict, texts: _Texts) -> None:
+    """
+    What the generic walker yields for a dict of scalars: its content keys,
+    then every value in order (the action/type branches only re-add those).
+    """
+    for v in d.values():
+        if not isinstance(v, _SCALARS):
+            raise _Fallback
+    for k in _CONTENT_KEYS:
+        texts.add(d.get(k))
+    for v in d.values():
+        texts.add(v)
+
+def _fast_flat(payload, texts: _Texts) -> None:
+    _flat(payload, texts)
+
+def _fast_action_items(payload, texts: _Texts) -> None:
+    """TinyPerson.act(return_actions=True): [{"action": {...}, "cognitive_state": {...}}, ...]."""
+    items = payload if isinstance(payload, list) else [payload]
+    for item in items:
+        a = item.get("action")
+        if isinstance(a, dict):
+            if _is_talk(a.get("type", "")):
+                texts.add(_spoken(a))
+        elif a is not None and not isinstance(a, _SCALARS):
+            raise _Fallback
+        # a scalar "action" would speak the item's content keys, which this shape has none of
+        for v in item.values():
+            if isinstance(v, dict):
+                _flat(v, texts)
+            elif isinstance(v, _SCALARS):
+                texts.add(v)
+            else:
+                raise _Fallback
+
+def _fast_actions(payload, texts: _Texts) -> None:
+    """{"actions": [{"type": "TALK", "content": ...}, ...]} with flat action dicts."""
+    actions = payload["actions"]
+    if not isinstance(actions, list):
+        raise _Fallback
+    for a in actions:
+        if not isinstance(a, dict):
+            raise _Fallback
+        _flat(a, texts)  # a TALK's content is its first content key anyway
+
+def _signature(payload) -> Tuple:
+    if isinstance(payload, dict):
+        return ("dict", tuple(payload))
+    if isinstance(payload, list) and all(isinstance(x, dict) for x in payload):
+        return ("list", frozenset(tuple(x) for x in payload))
+    return ("other", type(payload))
+
+@lru_cache(maxsize=256)
+def _fast_path_for(signature: Tuple) -> Optional[Callable[[Any, _Texts], None]]:
+    """Shape signature -> specialised extractor (or None for the generic walker)."""
+    kind = signature[0]
+    if kind == "list":
+        keysets = signature[1]
+        if keysets and all(ks and set(ks) <= _ACTION_ITEM_KEYS for ks in keysets):
+            return _fast_action_items
+    elif kind == "dict":
+        keys = set(signature[1])
+        if keys == {"actions"}:
+            return _fast_actions
+        if keys and keys <= _ACTION_ITEM_KEYS:
+            return _fast_action_items
+        if keys.isdisjoint(("choices", "action", "actions") + _CONTAINER_KEYS):
+            return _fast_flat
+    return None
+
+def pick_text_from_actions(payload) -> str:
+    """
+    Extract plain text from a wide variety of TinyTroupe / LLM reply shapes.
+    Handles:
+    - {"action": {"type":"TALK","content":"..."}}
+    - {"actions": [ {"type":"TALK","content":"..."}, ... ]}
+    - {"type":"TALK","content":"..."}  (top-level)
+    - {"content": "..."} / {"text":"..."} / {"message":"..."}
+    - OpenAI-like {"choices":[{"message":{"content":"..."}}]}
+    - {"data": ...} / {"payload": ...} / {"result": ...} / {"output": ...}
+    - lists/tuples of any of the above
+    - arbitrary objects with .dict() / .model_dump() / __dict__
+    Returns the distinct texts found, newline-joined in first-seen order.
+    Common TinyTroupe shapes take a fast path chosen by a cached shape
+    signature; everything else goes through the iterative generic walker.
+    """
+    texts = _Texts()
+    fast = _fast_path_for(_signature(payload))
+    if fast is not None:
+        try:
+            fast(payload, texts)
+        except _Fallback:
+            texts = _Texts()
+            _walk(payload, texts)
+    else:
+        _walk(payload, texts)
+    return "\n".join(texts.out).strip()
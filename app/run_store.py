@@ -0,0 +1,435 @@
+# app/run_store.py
+"""
+Append-only store for finished runs.
+
+Replaces one Markdown + one JSON file per run. Every run (and every later
+revision of it, e.g. new ratings) is one gzip member holding one JSON line,
+appended to the active segment `seg-NNNNNN.jsonl.gz`; concatenated members
+are still a valid gzip file, so a segment reads like compressed JSONL. An
+`index.jsonl` line per record maps run id -> (segment, offset, length), so a
+run is read back with a single seek. Segments rotate at `segment_max_bytes`;
+`compact()` rewrites the store keeping only the latest revision of each run.
+
+Appends from several threads or batch worker processes are serialized with
+an flock on `store.lock`. Data is written with one os.write per record; fsync
+is batched (every `fsync_every` records or `fsync_interval` seconds, plus on
+flush/close/exit). Markdown is rendered on demand from the stored payload.
+
+CLI (from the repo root):
+    python app/run_store.py list [--persona NAME]
+    python app/run_store.py show RUN_ID [--markdown]
+    python app/run_store.py import exports/*.json     # legacy per-run JSON exports
+    python app/run_store.py compact
+"""
+import argparse
+import atexit
+import bisect
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from multiprocessing import util as mp_util
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+DEFAULT_STORE_DIR = os.getenv("RUN_STORE_DIR", "exports")
+DEFAULT_SEGMENT_MAX_BYTES = int(float(os.getenv("RUN_STORE_SEGMENT_MB", "16")) * 1024 * 1024)
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = "store.lock"
+_SEGMENT_RE = re.compile(r"^seg-(\d{6})\.jsonl\.gz$")
+
+
+def _segment_name(n: int) -> str:
+    return f"seg-{n:06d}.jsonl.gz"
+
+def new_run_id(payload: Dict[str, Any]) -> str:
+    """Sortable and unique across concurrent runs: '<timestamp>-<8 hex>'."""
+    return f"{payload.get('timestamp') or time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class RunStore:
+    def __init__(
+        self,
+        root: str = DEFAULT_STORE_DIR,
+        segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES,
+        fsync_every: int = 32,
+        fsync_interval: float = 1.0,
+    ):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.RLock()
+        # Latest index entry per run id, plus secondary indexes over them
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._by_persona: Dict[str, set] = {}
+        self._by_time: List[tuple] = []  # sorted (timestamp, run_id)
+        self._index_pos = 0
+        self._index_ino: Optional[int] = None
+        # Open append handles and batched-fsync bookkeeping
+        self._seg_no = 0
+        self._seg_fd: Optional[int] = None
+        self._index_fd: Optional[int] = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.appends = 0
+        self.fsyncs = 0
+        with self._locked():
+            self._refresh_index()
+
+    # ----- locking -----
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            fd = os.open(os.path.join(self.root, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    # ----- index -----
+    def _index_path(self) -> str:
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _reset_index(self) -> None:
+        self._entries.clear()
+        self._by_persona.clear()
+        self._by_time.clear()
+        self._index_pos = 0
+
+    def _remember(self, entry: Dict[str, Any]) -> None:
+        run_id = entry["run_id"]
+        prev = self._entries.get(run_id)
+        if prev is not None and prev["rev"] > entry["rev"]:
+            return
+        self._entries[run_id] = entry
+        if prev is None:
+            self._by_persona.setdefault(entry.get("persona") or "", set()).add(run_id)
+            bisect.insort(self._by_time, (entry.get("timestamp") or "", run_id))
+
+    def _refresh_index(self) -> None:
+        """Pick up index lines appended (or a rewrite done) by other processes."""
+        try:
+            st = os.stat(self._index_path())
+        except FileNotFoundError:
+            self._reset_index()
+            self._index_ino = None
+            return
+        if st.st_ino != self._index_ino or st.st_size < self._index_pos:
+            self._reset_index()  # compacted elsewhere: start over
+            self._index_ino = st.st_ino
+            self._close_fds()
+        if st.st_size == self._index_pos:
+            return
+        with open(self._index_path(), "rb") as f:
+            f.seek(self._index_pos)
+            chunk = f.read(st.st_size - self._index_pos)
+        # Only consume complete lines; a torn last line is retried next time
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                self._remember(json.loads(line))
+            except ValueError:
+                continue
+        self._index_pos += end
+
+    # ----- writing -----
+    def _close_fds(self) -> None:
+        for fd in (self._seg_fd, self._index_fd):
+            if fd is not None:
+                try:
+                    os.fsync(fd)
+                except OSError:
+                    pass
+                os.close(fd)
+        self._seg_fd = self._index_fd = None
+        self._unsynced = 0
+
+    def _segment_for(self, nbytes: int) -> int:
+        """Active segment number (opening/rotating as needed); caller holds the lock."""
+        if self._seg_fd is None or os.path.exists(os.path.join(self.root, _segment_name(self._seg_no + 1))):
+            # First append here, or another process rotated/compacted: append to the newest segment
+            numbers = [int(m.group(1)) for m in map(_SEGMENT_RE.match, os.listdir(self.root)) if m]
+            self._open_segment(max(numbers, default=1))
+        size = os.fstat(self._seg_fd).st_size
+        if size and size + nbytes > self.segment_max_bytes:
+            self._open_segment(self._seg_no + 1)
+        return self._seg_no
+
+    def _open_segment(self, n: int) -> None:
+        if self._seg_fd is not None:
+            os.fsync(self._seg_fd)
+            os.close(self._seg_fd)
+        self._seg_no = n
+        path = os.path.join(self.root, _segment_name(n))
+        self._seg_fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _write_index_line(self, entry: Dict[str, Any]) -> None:
+        if self._index_fd is None:
+            self._index_fd = os.open(self._index_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._index_ino = os.fstat(self._index_fd).st_ino
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        os.write(self._index_fd, line)
+        self._index_pos += len(line)
+
+    def _maybe_sync(self, force: bool = False) -> None:
+        self._unsynced += 0 if force else 1
+        due = self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval
+        if self._unsynced and (force or due):
+            for fd in (self._seg_fd, self._index_fd):
+                if fd is not None:
+                    os.fsync(fd)
+            self.fsyncs += 1
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def append(self, payload: Dict[str, Any], ratings: Optional[Dict[str, Any]] = None,
+               run_id: Optional[str] = None) -> str:
+        """
+        Store a run payload (see simulation.build_json_payload). Passing the
+        `run_id` of a stored run appends a new revision of it. Returns the run id.
+        """
+        with self._locked():
+            self._refresh_index()
+            prev = self._entries.get(run_id) if run_id else None
+            run_id = run_id or new_run_id(payload)
+            record = {
+                "run_id": run_id,
+                "rev": prev["rev"] + 1 if prev else 0,
+                "stored_at": time.time(),
+                "ratings": ratings,
+                "payload": payload,
+            }
+            blob = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"), compresslevel=6)
+            seg = self._segment_for(len(blob))
+            offset = os.fstat(self._seg_fd).st_size  # exact: appends are serialized by the lock
+            os.write(self._seg_fd, blob)
+            entry = {
+                "run_id": run_id,
+                "rev": record["rev"],
+                "persona": payload.get("persona"),
+                "scenario": payload.get("scenario"),
+                "timestamp": payload.get("timestamp"),
+                "segment": _segment_name(seg),
+                "offset": offset,
+                "length": len(blob),
+            }
+            self._write_index_line(entry)
+            self._remember(entry)
+            self.appends += 1
+            self._maybe_sync()
+            return run_id
+
+    def flush(self) -> None:
+        """fsync whatever is still only in the page cache."""
+        with self._lock:
+            self._maybe_sync(force=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_fds()
+
+    # ----- reading -----
+    def _read(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        with open(os.path.join(self.root, entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            blob = f.read(entry["length"])
+        return json.loads(gzip.decompress(blob))
+
+    def refresh(self) -> None:
+        with self._locked():
+            self._refresh_index()
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Latest revision of a run: {"run_id", "rev", "stored_at", "ratings", "payload"}."""
+        self.refresh()
+        with self._lock:
+            entry = self._entries.get(run_id)
+        return self._read(entry) if entry else None
+
+    def entries(self, persona: Optional[str] = None, since: Optional[str] = None,
+                until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Latest index entry per run, oldest first, optionally by persona and timestamp range."""
+        self.refresh()
+        with self._lock:
+            lo = bisect.bisect_left(self._by_time, (since or "",))
+            hi = bisect.bisect_right(self._by_time, (until + "\uffff",)) if until else len(self._by_time)
+            ids = [rid for _ts, rid in self._by_time[lo:hi]]
+            if persona is not None:
+                wanted = self._by_persona.get(persona, set())
+                ids = [rid for rid in ids if rid in wanted]
+            return [dict(self._entries[rid]) for rid in ids]
+
+    def records(self, **filters) -> Iterator[Dict[str, Any]]:
+        for entry in self.entries(**filters):
+            yield self._read(entry)
+
+    def read(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return self._read(entry)
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._entries)
+
+    # ----- maintenance -----
+    def compact(self) -> Dict[str, int]:
+        """
+        Rewrite the store keeping only the latest revision of every run, into
+        fresh segments after the current ones, then swap the index and drop
+        the old segments. Readers elsewhere notice the new index inode.
+        """
+        with self._locked():
+            self._refresh_index()
+            self._close_fds()
+            old = sorted(m.group(0) for m in map(_SEGMENT_RE.match, os.listdir(self.root)) if m)
+            old_bytes = sum(os.path.getsize(os.path.join(self.root, s)) for s in old)
+            start = max((int(_SEGMENT_RE.match(s).group(1)) for s in old), default=0) + 1
+            live = [self._entries[rid] for _ts, rid in self._by_time]
+
+            new_index: List[Dict[str, Any]] = []
+            seg_no, seg_f, seg_size = start, None, 0
+            try:
+                for entry in live:
+                    with open(os.path.join(self.root, entry["segment"]), "rb") as f:
+                        f.seek(entry["offset"])
+                        blob = f.read(entry["length"])
+                    if seg_f is None or (seg_size and seg_size + len(blob) > self.segment_max_bytes):
+                        if seg_f is not None:
+                            seg_f.flush()
+                            os.fsync(seg_f.fileno())
+                            seg_f.close()
+                            seg_no += 1
+                        seg_f = open(os.path.join(self.root, _segment_name(seg_no)), "wb")
+                        seg_size = 0
+                    seg_f.write(blob)
+                    new_index.append({**entry, "segment": _segment_name(seg_no), "offset": seg_size})
+                    seg_size += len(blob)
+            finally:
+                if seg_f is not None:
+                    seg_f.flush()
+                    os.fsync(seg_f.fileno())
+                    seg_f.close()
+
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                for entry in new_index:
+                    f.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._index_path())
+            for s in old:
+                os.remove(os.path.join(self.root, s))
+
+            self._index_ino = None
+            self._refresh_index()
+            new = sorted(m.group(0) for m in map(_SEGMENT_RE.match, os.listdir(self.root)) if m)
+            return {
+                "runs": len(new_index),
+                "segments_before": len(old),
+                "segments_after": len(new),
+                "bytes_before": old_bytes,
+                "bytes_after": sum(os.path.getsize(os.path.join(self.root, s)) for s in new),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        self.refresh()
+        segments = [m.group(0) for m in map(_SEGMENT_RE.match, os.listdir(self.root)) if m]
+        with self._lock:
+            return {
+                "runs": len(self._entries),
+                "segments": len(segments),
+                "bytes": sum(os.path.getsize(os.path.join(self.root, s)) for s in segments),
+                "appends": self.appends,
+                "fsyncs": self.fsyncs,
+            }
+
+
+_stores: Dict[str, RunStore] = {}
+_stores_lock = threading.Lock()
+
+def get_run_store(root: str = DEFAULT_STORE_DIR) -> RunStore:
+    """Process-wide store per root; pending fsyncs are flushed at exit (also in pool workers)."""
+    key = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = RunStore(root)
+            atexit.register(store.close)
+            mp_util.Finalize(store, store.close, exitpriority=10)
+        return store
+
+
+def import_exports(store: RunStore, paths: List[str]) -> int:
+    """Load legacy per-run export JSONs into the store."""
+    n = 0
+    for fp in paths:
+        try:
+            with open(fp, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(payload, dict) and "transcript" in payload:
+            store.append(payload)
+            n += 1
+    store.flush()
+    return n
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect and maintain the run store.")
+    parser.add_argument("--root", default=DEFAULT_STORE_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_list = sub.add_parser("list")
+    p_list.add_argument("--persona")
+    p_show = sub.add_parser("show")
+    p_show.add_argument("run_id")
+    p_show.add_argument("--markdown", action="store_true")
+    p_import = sub.add_parser("import")
+    p_import.add_argument("paths", nargs="+")
+    sub.add_parser("compact")
+    sub.add_parser("stats")
+    args = parser.parse_args(argv)
+
+    store = RunStore(args.root)
+    if args.cmd == "list":
+        for e in store.entries(persona=args.persona):
+            print(f"{e['run_id']}  rev {e['rev']}  {e['persona']} | {e['scenario']}")
+    elif args.cmd == "show":
+        record = store.get(args.run_id)
+        if record is None:
+            print(f"No run {args.run_id!r}", file=sys.stderr)
+            return 1
+        if args.markdown:
+            from simulation import record_markdown
+            print(record_markdown(record))
+        else:
+            print(json.dumps(record, indent=2, ensure_ascii=False))
+    elif args.cmd == "import":
+        paths = [p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])]
+        print(f"Imported {import_exports(store, paths)} run(s)")
+    elif args.cmd == "compact":
+        print(json.dumps(store.compact(), indent=2))
+    else:
+        print(json.dumps(store.stats(), indent=2))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
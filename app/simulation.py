@@ -0,0 +1,766 @@
+# app/simulation.py
+"""
+Headless persona simulation pipeline.
+
+Everything the Simulate button does — persona normalization, building the
+TinyPerson, composing prompts, running the one-act-per-turn loop and storing
+the run (see run_store.py) — lives here so it can be driven from the
+Streamlit UI or from the batch runner (`app/batch.py`).
+"""
+import json
+import os
+import queue
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from replies import pick_text_from_actions, sanitize_reply
+from turn_cache import TurnCache, get_turn_cache, llm_settings
+from agent_pool import AgentPool
+from perf import PerfRecorder
+from run_store import RunStore, get_run_store
+from tax_grid import after_tax_grid, grid_prompt_text, selected_metrics
+from transcript import USER, Transcript
+from utils import assumption_summary, estimate_tokens, ts
+
+SCENARIOS = [
+    "First look (discovery + immediate reaction)",
+    "Guided task (compare Harvest ON vs OFF)",
+    "Week-later (annoyances & delighters)",
+]
+
+DEFAULT_FEATURE_BRIEF = (
+    "Feature: After-Tax Impact module. Show tax drag, harvest toggles, lot selection, "
+    "reinvest on/off, turnover, yield."
+)
+
+# Same defaults as the sliders in app.py
+DEFAULT_ASSUMPTIONS: Dict[str, Any] = {
+    "us_eq": 40,
+    "intl_eq": 20,
+    "fi": 15,
+    "altshf": 5,
+    "altspe": 10,
+    "altsre": 5,
+    "cash": 5,
+    "turnover": 40,
+    "yield": 2,
+    "horizon": 1,
+    "lots": "FIFO",
+    "harvest": "ON",
+    "reinvest": "Yes",
+    "ord_rate": 37,
+    "ltcg_rate": 20,
+    "niit": 3,
+    "state_rate": 6,
+    "tax_deferred": 20,
+    "tax_exempt": 0,
+}
+
+DEFAULT_RATINGS = {"clarity": 3, "confidence": 3, "likelihood": 3}
+
+FOLLOWUP_PROMPT = (
+    "Continue the same review. Add ONE new issue (tag it), "
+    "ONE new suggestion, and ONE concise follow-up question. "
+    "They must be different from anything said earlier. "
+    "Plain text only. No meta words (TALK, DONE)."
+)
+
+INITIAL_PLACEHOLDER = (
+    "usability: Inputs feel dense on first open.\n"
+    "suggestion: Add sensible defaults and a 30-second guided tour.\n"
+    "question: Which tax buckets are estimated vs exact?"
+)
+
+FOLLOWUP_PLACEHOLDER = (
+    "discoverability: Explainability panel is easy to miss.\n"
+    "suggestion: Add a prominent 'Why is tax drag X%?' link.\n"
+    "question: Should we auto-open it when drag > 1%?"
+)
+
+
+
+# ===== Persona validation / normalization =====
+RECOMMENDED_FIELDS = ["occupation", "age", "gender", "location", "education"]
+
+def validate_persona(p: dict) -> dict:
+    """Return {'errors': [...], 'warnings': [...], 'normalized': dict}."""
+    errors, warnings = [], []
+    norm = dict(p)  # shallow copy
+
+    # Required
+    for k in ["name", "biography", "traits", "constraints", "device"]:
+        if k not in p:
+            errors.append(f"Missing required field: {k}")
+
+    # Types
+    if "traits" in p and not isinstance(p["traits"], list):
+        errors.append("traits must be a list of strings")
+    if "constraints" in p and not isinstance(p["constraints"], list):
+        errors.append("constraints must be a list of strings")
+
+    # Recommendations
+    for k in RECOMMENDED_FIELDS:
+        if k not in p:
+            warnings.append(f"Recommended field missing: {k}")
+
+    # Normalizations
+    norm.setdefault("occupation", "Product Manager")
+    norm.setdefault("age", 35)
+    norm.setdefault("gender", "unspecified")
+    norm.setdefault("location", "USA")
+    norm.setdefault("education", "Bachelor's")
+
+    # Ensure lists are clean
+    if isinstance(norm.get("traits"), list):
+        norm["traits"] = [str(t).strip() for t in norm["traits"] if str(t).strip()]
+    if isinstance(norm.get("constraints"), list):
+        norm["constraints"] = [str(c).strip() for c in norm["constraints"] if str(c).strip()]
+
+    return {"errors": errors, "warnings": warnings, "normalized": norm}
+
+
+# ===== Agent construction =====
+def backend_name() -> str:
+    return os.getenv("SIM_BACKEND", "tinytroupe").lower()
+
+def agent_class():
+    """
+    TinyPerson, or the offline StubPerson when SIM_BACKEND=stub.
+    Imported lazily so the stub backend works without TinyTroupe installed.
+    """
+    if backend_name() == "stub":
+        from stub_backend import StubPerson
+        return StubPerson
+    # Keep this import only — it's stable across TinyTroupe versions
+    from tinytroupe.agent import TinyPerson
+    return TinyPerson
+
+def build_agent_spec(P: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "TinyPerson",
+        "persona": {
+            "name": P.get("name", "Unnamed Persona"),
+            "biography": P.get("biography", "No biography provided."),
+            "personality": {"traits": P.get("traits", ["practical", "direct"])},
+            "preferences": {"device": P.get("device", "iPhone")},
+            "constraints": P.get("constraints", []),
+            "occupation": P.get("occupation", "Product Manager"),
+            "age": P.get("age", 35),
+            "gender": P.get("gender", "unspecified"),
+            "location": P.get("location", "USA"),
+            "education": P.get("education", "Bachelor's"),
+        },
+        "memory": [
+            "You are reviewing an After-Tax Impact feature for a portfolio reporting system.",
+            "Be concrete and tag issues with: usability, copy, trust, speed, a11y, discoverability."
+        ],
+    }
+
+def disable_memory_consolidation(tp) -> None:
+    if hasattr(tp, "consolidate_episode_memories"):
+        tp.consolidate_episode_memories = lambda *args, **kwargs: None
+
+def build_agent(agent_spec: Dict[str, Any]):
+    # --- D3 fix: avoid 'Agent name ... is already in use' across reruns (Streamlit Cloud, etc.)
+    # TinyTroupe keeps a global registry of agents keyed by name; drop only a stale agent
+    # with this persona's name so pooled or concurrently running agents stay registered.
+    cls = agent_class()
+    registry = getattr(cls, "all_agents", None)
+    if isinstance(registry, dict):
+        registry.pop(agent_spec["persona"].get("name", "Unnamed Persona"), None)
+
+    tp = cls.load_specification(agent_spec)
+
+    disable_memory_consolidation(tp)
+
+    required_defaults = {
+        "name": agent_spec["persona"].get("name", "Unnamed Persona"),
+        "occupation": "Product Manager",
+        "age": 35,
+        "gender": "unspecified",
+        "education": "Bachelor's",
+        "nationality": "USA",
+        "marital_status": "unspecified",
+        "location": "USA",
+        "residence": "USA",
+        "hometown": "USA",
+        "birthplace": "USA",
+        "citizenship": "USA",
+        "employer": "Acme Corp",
+        "company": "Acme Corp",
+        "role": "Product Manager",
+        "seniority": "Senior",
+        "industry": "Software",
+        "languages": ["English"],
+        "interests": ["investing", "personal finance", "mobile apps"],
+    }
+    if not hasattr(tp, "_persona") or tp._persona is None:
+        tp._persona = {}
+    for k, v in required_defaults.items():
+        tp._persona.setdefault(k, v)
+    tp._persona.setdefault("personality", {}).setdefault("traits", ["practical", "direct"])
+    tp._persona.setdefault("preferences", {}).setdefault("device", "iPhone")
+    tp._persona.setdefault("constraints", [])
+    for key in ["occupation", "gender", "location", "residence", "hometown", "birthplace",
+                "citizenship", "education", "employer", "company", "role", "seniority", "industry"]:
+        if not isinstance(tp._persona.get(key, ""), str):
+            tp._persona[key] = str(tp._persona.get(key, ""))
+
+    return tp
+
+def forget_agent(tp) -> None:
+    """Drop an agent the pool let go from TinyTroupe's global registry (if it is still the one registered)."""
+    registry = getattr(type(tp), "all_agents", None)
+    name = getattr(tp, "name", None)
+    if isinstance(registry, dict) and registry.get(name) is tp:
+        registry.pop(name, None)
+
+# What a conversation changes on an agent, per agent class; the pool restores only these
+# between runs. A class whose agents lack a listed attribute falls back to its complete
+# state (with a warning); bench_agent_pool.py checks a restored agent equals a new one.
+AGENT_RUN_STATE = {
+    "TinyPerson": ("episodic_memory", "_mental_state", "_actions_buffer", "_accessible_agents",
+                   "_displayed_communications_buffer", "current_messages"),
+    "StubPerson": ("episodic_memory", "act_calls", "llm_calls", "_cursor"),
+}
+
+# One pool per process: each distinct agent spec is built once, then restored from a snapshot
+_agent_pool = AgentPool(build_agent, on_restore=disable_memory_consolidation, on_evict=forget_agent,
+                        run_state=AGENT_RUN_STATE)
+
+def get_agent_pool() -> AgentPool:
+    return _agent_pool
+
+# ===== Turn protocol =====
+PRIME_TALK = "Respond with a single TALK containing plain text only."
+TALK_NUDGE = "Respond now with a single TALK action whose content is plain text (no JSON)."
+MAX_TURN_RETRIES = 2
+
+def act_once(tp):
+    """
+    One LLM round trip: ask for exactly one action instead of acting until DONE
+    (which costs an extra call for the DONE action on every turn).
+    """
+    return tp.act(until_done=False, n=1, return_actions=True)
+
+def take_turn(tp, mode: str, prev_text: str | None, perf: Optional[PerfRecorder] = None) -> Tuple[str, int]:
+    """
+    Act once, extract and sanitize. Only if that yields nothing usable (no
+    TALK text survived) nudge the agent and retry, up to MAX_TURN_RETRIES.
+    Returns (text, llm_calls); text is "" if every attempt failed.
+    """
+    perf = perf or PerfRecorder()
+    calls = 0
+    text = ""
+    for attempt in range(1 + MAX_TURN_RETRIES):
+        if attempt:
+            with perf.span("listen", retry=True):
+                tp.listen(TALK_NUDGE)
+        with perf.span("act", attempt=attempt):
+            reply = act_once(tp)
+        calls += 1
+        with perf.span("extract") as sp:
+            raw = pick_text_from_actions(reply) or ""
+            sp["chars"] = len(raw)
+        with perf.span("sanitize", mode=mode) as sp:
+            text = sanitize_reply(raw, mode=mode, prev_text=prev_text)
+            sp["reply_tokens"] = estimate_tokens(text)
+        if text:
+            break
+    return text, calls
+
+
+# ===== Prompts =====
+def compose_prompts(P: Dict[str, Any], feature_spec: str, assumption_text: str, scenario: str) -> Tuple[str, str]:
+    system_msg = textwrap.dedent(f"""
+    You are {P['name']}. Stay strictly in character. Be blunt and concise.
+
+    Output rules (hard):
+    - No meta words (TALK, DONE, etc). No headings. Plain text only.
+    - Do not repeat anything already said earlier in this conversation.
+    - Keep the first reply to 6 lines total.
+
+    Content rules:
+    - Call out (1) clarity of assumptions, (2) trust/explainability,
+    (3) speed/clicks, (4) a11y (contrast, keyboardability, focus order, ARIA).
+    """).strip()
+
+    user_prompt = textwrap.dedent(f"""
+    Evaluate this feature and assumptions.
+
+    === FEATURE ===
+    {feature_spec.strip()}
+
+    === ASSUMPTION SUMMARY ===
+    {assumption_text}
+
+    === SCENARIO ===
+    {scenario}
+
+    Task: Provide exactly 3 issues (tag each: usability/copy/trust/speed/a11y/discoverability),
+    exactly 2 suggestions, and exactly 1 follow-up question. Keep to 6 lines total.
+
+    Rules: Do not repeat anything already said in this conversation. Do not include the words TALK or DONE.
+    Do not echo this prompt. Plain text only—no headings, no JSON, no bullets with labels like 'TALK'/'DONE'.
+    """).strip()
+
+    return system_msg, user_prompt
+
+
+# ===== Turn loop =====
+# Episodic-memory entries one follow-up turn adds in context budget mode: the
+# follow-up stimulus plus the single TALK action (take_turn acts with n=1, so
+# no DONE is recorded; a cached turn is replayed as one action too). A retried
+# turn adds a nudge and another action, which briefly shortens the window.
+_MEMORY_ENTRIES_PER_TURN = 2
+_SUMMARY_MAX_ITEMS = 8
+_SUMMARY_ITEM_CHARS = 80
+
+def _summarize_turns(replies: List[str]) -> List[str]:
+    """One short, de-duplicated line per earlier reply (its issue line), newest last, capped."""
+    items: Dict[str, None] = {}
+    for txt in replies:
+        first = next((ln.strip() for ln in txt.splitlines() if ln.strip()), "")
+        if first:
+            item = first if len(first) <= _SUMMARY_ITEM_CHARS else first[:_SUMMARY_ITEM_CHARS - 1] + "…"
+            items.pop(item, None)
+            items[item] = None
+    return list(items)[-_SUMMARY_MAX_ITEMS:]
+
+def _budget_followup(summary: List[str]) -> str:
+    if not summary:
+        return FOLLOWUP_PROMPT
+    return FOLLOWUP_PROMPT + "\nAlready raised earlier (do not repeat):\n" + "\n".join(f"- {s}" for s in summary)
+
+def _bound_agent_memory(tp, lookback_entries: int) -> bool:
+    """
+    Pin everything the agent has heard so far (persona seed, system prompt,
+    first prompt) as the fixed prefix and keep only a rolling window after it.
+    Works with TinyTroupe's EpisodicMemory (and the stub's look-alike).
+    """
+    mem = getattr(tp, "episodic_memory", None)
+    if mem is None or not hasattr(mem, "lookback_length"):
+        return False
+    if isinstance(getattr(mem, "memory", None), list) and hasattr(mem, "fixed_prefix_length"):
+        mem.fixed_prefix_length = len(mem.memory)
+    mem.lookback_length = lookback_entries
+    return True
+
+def context_tokens(tp) -> Optional[int]:
+    """Tokens the agent will put in front of the model (persona + recent memory), if inspectable."""
+    mem = getattr(tp, "episodic_memory", None)
+    if mem is None or not hasattr(mem, "retrieve_recent"):
+        return None
+    try:
+        recent = mem.retrieve_recent()
+    except Exception:
+        return None
+    persona = json.dumps(getattr(tp, "_persona", {}) or {}, default=str)
+    return estimate_tokens(persona) + estimate_tokens(json.dumps(recent, default=str))
+
+def _replay_reply(tp, text: str) -> None:
+    """
+    Put a reply served from the turn cache into the agent's memory as its own
+    TALK action, the entry TinyPerson.act() would have stored for it.
+    """
+    entry = {"role": "assistant", "type": "action",
+             "content": {"action": {"type": "TALK", "content": text, "target": ""}, "cognitive_state": {}}}
+    if callable(getattr(tp, "iso_datetime", None)):
+        entry["simulation_timestamp"] = tp.iso_datetime()
+    if callable(getattr(tp, "store_in_memory", None)):
+        tp.store_in_memory(entry)
+    elif hasattr(getattr(tp, "episodic_memory", None), "store"):
+        tp.episodic_memory.store(entry)
+    else:
+        tp.listen(f"(Your earlier reply in this conversation:)\n{text}")
+
+def run_turns(
+    make_agent: Callable[[], Any],
+    name: str,
+    system_msg: str,
+    user_prompt: str,
+    turns: int,
+    on_message: Optional[Callable[[str, str, Optional[str]], None]] = None,
+    cache: Optional[TurnCache] = None,
+    cache_scope: Optional[Dict[str, Any]] = None,
+    cache_stats: Optional[Dict[str, int]] = None,
+    context_window: Optional[int] = None,
+    turn_log: Optional[List[Dict[str, Any]]] = None,
+    perf: Optional[PerfRecorder] = None,
+) -> Transcript:
+    """
+    Run the conversation and return its Transcript ((speaker, text) turns).
+    `on_message(role, content, name)` is called for every user/assistant message
+    so callers (e.g. the chat UI) can mirror the transcript.
+
+    The agent is only built (via `make_agent`) once a turn actually needs the
+    LLM: turns served from `cache` skip it. Before its first act it is brought
+    up to date in conversation order: prompts it has not heard yet go through
+    `listen` and cached replies are stored as its own TALK actions, so a reply
+    it generates after cached turns sees the same history the cache keys on.
+
+    With `context_window=N` (context budget mode) the system prompt is sent
+    once, the agent's memory keeps that prefix plus the last N turns, and
+    older replies are folded into a short "already raised" list in the
+    follow-up prompt, so prompt size stays flat as turns grow.
+
+    Each turn is a single act() round trip (see take_turn); retries only
+    happen when nothing usable came back.
+
+    `turn_log`, if given, receives one dict per assistant turn with
+    `prompt_tokens` (estimated context size before the call, 0 when cached)
+    and `llm_calls` (round trips the turn actually used).
+
+    `perf`, if given, receives a span per listen/act/extract/sanitize plus
+    one "turn" span per assistant turn carrying its token/call/retry counts.
+    """
+    perf = perf or PerfRecorder()
+    transcript = Transcript()
+    replies: List[str] = []
+    tp = None
+    # Turns the agent has not seen yet, in order: ("listen", prompt) or ("reply", cached reply)
+    pending: List[Tuple[str, str]] = []
+    delivered = 0
+    heard_tokens = 0  # fallback accounting when the agent's memory is not inspectable
+    budget = context_window is not None and context_window > 0
+
+    def agent():
+        nonlocal tp, heard_tokens, delivered
+        if tp is None:
+            tp = make_agent()
+        for kind, msg in pending:
+            if kind == "reply":
+                _replay_reply(tp, msg)
+            else:
+                with perf.span("listen", tokens=estimate_tokens(msg)) as sp:
+                    tp.listen(msg)
+                heard_tokens += sp["tokens"]
+            delivered += 1
+            if budget and delivered == len(opening):
+                # Pin the opening prompts only; later turns go through the rolling window
+                _bound_agent_memory(tp, context_window * _MEMORY_ENTRIES_PER_TURN)
+        pending.clear()
+        return tp
+
+    def prompt_tokens() -> int:
+        measured = context_tokens(tp)
+        return measured if measured is not None else heard_tokens
+
+    def record(speaker: str, role: str, content: str):
+        transcript.append(speaker, content)
+        if on_message:
+            on_message(role, content, None if role == "user" else speaker)
+
+    def log_turn(sp: Dict[str, Any], turn: int, tokens: int, cached_turn: bool, calls: int):
+        # calls beyond the first one were retries
+        sp.update(turn=turn, cached=cached_turn, prompt_tokens=tokens, llm_calls=calls, retries=max(0, calls - 1))
+        if turn_log is not None:
+            turn_log.append({"turn": turn, "cached": cached_turn, "prompt_tokens": tokens, "llm_calls": calls})
+
+    def cache_key(prompt: str) -> Optional[str]:
+        if cache is None:
+            return None
+        return cache.key(scope=cache_scope, system=system_msg, prompt=prompt, history=transcript.pairs())
+
+    def cached(key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        text = cache.get(key)
+        if cache_stats is not None:
+            cache_stats["hits" if text is not None else "misses"] += 1
+        return text
+
+    # Send system + user (+ the TALK prime, as a stimulus rather than its own act) into the agent
+    opening = (system_msg, user_prompt, PRIME_TALK)
+    pending.extend(("listen", msg) for msg in opening)
+    record(USER, "user", user_prompt)
+
+    with perf.span("turn") as sp:
+        key = cache_key(user_prompt)
+        text = cached(key)
+        hit, tokens, calls = text is not None, 0, 0
+        if not hit:
+            agent()
+            tokens = prompt_tokens()
+            # Extract + sanitize (INITIAL mode = 3 issues / 2 suggestions / 1 question)
+            text, calls = take_turn(tp, "initial", transcript[-1][1], perf)
+
+            # Only real replies are cached; placeholders mean the turn failed
+            if text and key is not None:
+                cache.put(key, text)
+        else:
+            pending.append(("reply", text))
+        log_turn(sp, 1, tokens, hit, calls)
+
+    if not text:
+        text = INITIAL_PLACEHOLDER
+
+    record(name, "assistant", text or "(no content)")
+    replies.append(text)
+    heard_tokens += estimate_tokens(text)
+
+    for i in range(1, turns):
+        if budget:
+            # Only the turns that fell out of the memory window need summarizing
+            followup = _budget_followup(_summarize_turns(replies[:-context_window]))
+            pending.append(("listen", followup))
+        else:
+            followup = FOLLOWUP_PROMPT
+            # Re-prime and act
+            pending.extend([("listen", system_msg), ("listen", FOLLOWUP_PROMPT)])
+        record(USER, "user", followup)
+
+        with perf.span("turn") as sp:
+            key = cache_key(followup)
+            text = cached(key)
+            hit, tokens, calls = text is not None, 0, 0
+            if not hit:
+                agent()
+                tokens = prompt_tokens()
+                # Extract + sanitize (FOLLOWUP mode = 1/1/1)
+                text, calls = take_turn(tp, "followup", transcript[-1][1], perf)
+
+                if text and key is not None:
+                    cache.put(key, text)
+            else:
+                pending.append(("reply", text))
+            log_turn(sp, i + 1, tokens, hit, calls)
+
+        # Safety placeholder to avoid "(no content)"
+        if not text:
+            text = FOLLOWUP_PLACEHOLDER
+
+        record(name, "assistant", text or "(no content)")
+        replies.append(text)
+        heard_tokens += estimate_tokens(text)
+
+    return transcript
+
+
+def simulate(
+    P: Dict[str, Any],
+    scenario: str,
+    assumptions: Dict[str, Any],
+    feature_spec: str,
+    turns: int,
+    on_message: Optional[Callable[[str, str, Optional[str]], None]] = None,
+    use_cache: bool = True,
+    context_window: Optional[int] = None,
+    agent_spec: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Run one full conversation for a normalized persona.
+    `agent_spec` is the persona's prebuilt spec (see persona_registry); built from P if omitted.
+    The agent is leased from the process-wide agent pool (built once per spec).
+    `run["perf"]` is the run's PerfRecorder; save_run adds its store write span.
+    With `use_cache`, unchanged turns are replayed from the on-disk turn cache.
+    With `context_window`, the conversation runs in context budget mode (see run_turns).
+    """
+    perf = PerfRecorder()
+    with perf.span("after_tax_grid"):
+        # The persona reviews the computed numbers, not just the slider values
+        grid = after_tax_grid(assumptions)
+        assumption_text = assumption_summary(assumptions) + "\n" + grid_prompt_text(grid, assumptions)
+    agent_spec = agent_spec or build_agent_spec(P)
+    system_msg, user_prompt = compose_prompts(P, feature_spec, assumption_text, scenario)
+    cache = get_turn_cache() if use_cache else None
+    cache_stats = {"hits": 0, "misses": 0}
+    turn_log: List[Dict[str, Any]] = []
+    pool, backend = get_agent_pool(), backend_name()
+    leased = []
+
+    def make_agent():
+        builds = pool.builds
+        with perf.span("construct") as sp:
+            tp = pool.acquire(agent_spec, scope=backend)
+            # Best effort under concurrent runs: another thread may have built meanwhile
+            sp["pooled"] = pool.builds == builds
+        leased.append(tp)
+        return tp
+
+    try:
+        transcript = run_turns(
+            make_agent,
+            P["name"], system_msg, user_prompt, turns,
+            on_message=on_message,
+            cache=cache,
+            # backend is part of the key so stub replays never answer for the real LLM
+            cache_scope={"persona": agent_spec, "backend": backend, "context_window": context_window,
+                         **llm_settings()},
+            cache_stats=cache_stats,
+            context_window=context_window,
+            turn_log=turn_log,
+            perf=perf,
+        )
+    finally:
+        for tp in leased:
+            pool.release(agent_spec, tp, scope=backend)
+    perf.stop()
+    return {
+        "persona": P,
+        "scenario": scenario,
+        "assumptions": assumptions,
+        "assumption_text": assumption_text,
+        "after_tax": selected_metrics(grid, assumptions),
+        "feature_brief": feature_spec.strip(),
+        "turns": turns,
+        "transcript": transcript,
+        "cache": {"enabled": use_cache, **cache_stats},
+        "context": {
+            "mode": "budget" if context_window else "full",
+            "window": context_window,
+            "prompt_tokens": [t["prompt_tokens"] for t in turn_log],
+        },
+        "turn_log": turn_log,
+        "llm_calls": sum(t["llm_calls"] for t in turn_log),
+        "perf": perf,
+    }
+
+
+def simulate_many_events(
+    personas: List[Dict[str, Any]],
+    scenario: str,
+    assumptions: Dict[str, Any],
+    feature_spec: str,
+    turns: int,
+    max_workers: int = 3,
+    use_cache: bool = True,
+    context_window: Optional[int] = None,
+    agent_specs: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Iterator[Tuple[str, Dict[str, Any], Any]]:
+    """
+    Run several personas' conversations at the same time and yield events
+    on the calling thread as they happen:
+        ("message", persona, (role, content, name))  — one per transcript entry
+        ("done", persona, run)
+        ("error", persona, exception)
+
+    Threads are enough here: each conversation spends nearly all of its time
+    waiting on LLM I/O. Persona names are unique, so the agents can share the
+    TinyTroupe registry. Workers only put events on a queue, so callers
+    (e.g. Streamlit) can render from the main thread. `agent_specs` maps
+    persona names to prebuilt specs.
+    """
+    events: "queue.Queue[Tuple[str, Dict[str, Any], Any]]" = queue.Queue()
+
+    def work(P: Dict[str, Any]):
+        try:
+            run = simulate(
+                P, scenario, assumptions, feature_spec, turns,
+                on_message=lambda role, content, name=None: events.put(("message", P, (role, content, name))),
+                use_cache=use_cache,
+                context_window=context_window,
+                agent_spec=(agent_specs or {}).get(P["name"]),
+            )
+            events.put(("done", P, run))
+        except Exception as e:
+            events.put(("error", P, e))
+
+    workers = max(1, min(max_workers, len(personas)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="persona") as pool:
+        for P in personas:
+            pool.submit(work, P)
+        remaining = len(personas)
+        while remaining:
+            kind, P, data = events.get()
+            if kind != "message":
+                remaining -= 1
+            yield kind, P, data
+
+def simulate_many(
+    personas: List[Dict[str, Any]],
+    scenario: str,
+    assumptions: Dict[str, Any],
+    feature_spec: str,
+    turns: int,
+    max_workers: int = 3,
+    use_cache: bool = True,
+    context_window: Optional[int] = None,
+) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Exception]]]:
+    """Like simulate_many_events, but only yields (persona, run, error) in completion order."""
+    for kind, P, data in simulate_many_events(personas, scenario, assumptions, feature_spec, turns,
+                                              max_workers, use_cache, context_window):
+        if kind == "done":
+            yield P, data, None
+        elif kind == "error":
+            yield P, None, data
+
+
+# ===== Exports =====
+def render_markdown(run: Dict[str, Any], ratings: Dict[str, int] = DEFAULT_RATINGS,
+                    timestamp: Optional[str] = None) -> str:
+    md_lines = []
+    md_lines.append(f"# {run['persona']['name']} — {timestamp or ts()}")
+    md_lines.append(f"**Scenario:** {run['scenario']}\n")
+    md_lines.append("## Feature (brief)")
+    md_lines.append(run["feature_brief"] + "\n")
+    md_lines.append("## Assumptions")
+    md_lines.append(run["assumption_text"] + "\n")
+    md_lines.append("## Transcript")
+    md_lines.extend(run["transcript"].markdown_lines())
+    md_lines.append("\n## Ratings")
+    md_lines.append(f"- Clarity: {ratings['clarity']}/5")
+    md_lines.append(f"- Confidence: {ratings['confidence']}/5")
+    md_lines.append(f"- Likelihood: {ratings['likelihood']}/5")
+    md_lines.append("\n## Notes / Actionables\n- [ ]\n- [ ]\n")
+    return "\n".join(md_lines)
+
+def build_json_payload(run: Dict[str, Any]) -> Dict[str, Any]:
+    P = run["persona"]
+    return {
+        "timestamp": ts(),
+        "persona": P["name"],
+        "persona_meta": P,
+        "scenario": run["scenario"],
+        "assumptions": run["assumptions"],
+        "assumption_text": run["assumption_text"],
+        "after_tax": run.get("after_tax"),
+        "feature_brief": run["feature_brief"],
+        "turns": run["turns"],
+        "transcript": run["transcript"].to_json(),
+        "context": run.get("context"),
+        "llm_calls": {
+            "total": run.get("llm_calls"),
+            "per_turn": [t["llm_calls"] for t in run.get("turn_log", [])],
+        },
+        "perf": run["perf"].to_dict() if run.get("perf") else None,
+    }
+
+def record_markdown(record: Dict[str, Any]) -> str:
+    """Markdown for a stored run (rendered on demand; nothing is written to disk)."""
+    payload = record["payload"]
+    run = {
+        "persona": payload.get("persona_meta") or {"name": payload["persona"]},
+        "scenario": payload["scenario"],
+        "feature_brief": payload["feature_brief"],
+        "assumption_text": payload["assumption_text"],
+        "transcript": Transcript.from_json(payload["transcript"]),
+    }
+    return render_markdown(run, record.get("ratings") or DEFAULT_RATINGS, timestamp=payload.get("timestamp"))
+
+def save_run(
+    run: Dict[str, Any],
+    ratings: Dict[str, int] = DEFAULT_RATINGS,
+    store: Optional[RunStore] = None,
+) -> str:
+    """
+    Append a finished run (JSON payload + ratings) to the run store; returns its run id.
+    The "store_append" span (JSON encode, gzip, fsync) lands in run["perf"] after the
+    payload is built, so the Performance panel shows it but the stored `perf` does not.
+    """
+    # Not `store or ...`: RunStore has __len__, so an empty store is falsy
+    store = store if store is not None else get_run_store()
+    perf = run.get("perf") or PerfRecorder()
+    payload = build_json_payload(run)
+    with perf.span("store_append"):
+        return store.append(payload, ratings=dict(ratings))
+
+def update_ratings(run_id: str, ratings: Dict[str, int], store: Optional[RunStore] = None) -> int:
+    """Store new ratings for a saved run as a new revision (same payload); returns the new revision number."""
+    store = store if store is not None else get_run_store()
+    record = store.get(run_id)
+    if record is None:
+        raise KeyError(f"Unknown run id {run_id!r}")
+    store.append(record["payload"], ratings=dict(ratings), run_id=run_id)
+    return record["rev"] + 1
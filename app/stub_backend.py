@@ -0,0 +1,191 @@
+# app/stub_backend.py
+"""
+Offline stand-in for TinyTroupe's TinyPerson.
+
+Select it with `SIM_BACKEND=stub`. It replays recorded assistant replies
+(by default the transcripts in `deliverables/d2/examples/*.json`) wrapped in
+any of the payload shapes `pick_text_from_actions` understands, with an
+optional per-call latency. No API key and no network are needed, so the
+non-LLM part of the turn pipeline can be exercised and benchmarked in CI.
+
+Environment knobs:
+    STUB_REPLAY      file or directory of export JSONs to replay (default: d2 examples)
+    STUB_SHAPE       payload shape, see SHAPES (default: tinytroupe)
+    STUB_LATENCY_MS  sleep per act() call, in milliseconds (default: 0)
+    STUB_EMPTY_EVERY return an empty (unparseable) reply on every Nth act() (default: 0 = never)
+
+`llm_calls` counts what a real TinyPerson would spend: acting until DONE
+costs one call for the TALK plus one for the DONE; act(n=1) costs one.
+"""
+import copy
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_REPLAY = os.path.join("deliverables", "d2", "examples")
+
+# Used when no recordings are available (e.g. inside the Docker image)
+_BUILTIN_REPLIES = [
+    "usability: Inputs feel dense on first open.\n"
+    "copy: 'Tax drag' is never defined on screen.\n"
+    "trust: No source shown for the LTCG rate.\n"
+    "suggestion: Add sensible defaults and a 30-second guided tour.\n"
+    "Consider an inline 'How we calculate this' link.\n"
+    "Which tax buckets are estimated vs exact?",
+    "New issue: speed - comparing Harvest ON vs OFF takes four taps.\n"
+    "Suggestion: Try a side-by-side toggle on one screen.\n"
+    "Follow-up: Can the comparison be saved as a preset?",
+    "New issue: a11y - the drag chart relies on color alone.\n"
+    "Suggestion: Add patterns and ARIA labels to each bar.\n"
+    "Follow-up: Is keyboard focus order tested on the sliders?",
+]
+
+
+def _talk(text: str) -> Dict[str, Any]:
+    return {"type": "TALK", "content": text, "target": ""}
+
+# shape name -> builder(text) returning the payload act(return_actions=True) would give
+SHAPES = {
+    # What TinyPerson.act(return_actions=True) returns: a list of action + cognitive state dicts
+    "tinytroupe": lambda t: [
+        {
+            "action": _talk(t),
+            "cognitive_state": {
+                "goals": "Focusing on evaluating the after-tax feature.",
+                "attention": "Impatient with extra clicks.",
+                "emotions": "Frustrated with unclear assumptions.",
+            },
+        },
+        {"action": {"type": "DONE", "content": "", "target": ""}, "cognitive_state": {}},
+    ],
+    "action": lambda t: {"action": _talk(t)},
+    "actions": lambda t: {"actions": [_talk(t), {"type": "DONE", "content": ""}]},
+    "toplevel": lambda t: _talk(t),
+    "content": lambda t: {"content": t},
+    "choices": lambda t: {"choices": [{"message": {"role": "assistant", "content": t}}]},
+    "nested": lambda t: {"data": {"payload": {"result": {"output": [_talk(t)]}}}},
+}
+
+
+def load_recorded_replies(source: Optional[str] = None) -> List[str]:
+    """Assistant turns from export JSONs (a file or a directory of them)."""
+    source = source or os.getenv("STUB_REPLAY") or DEFAULT_REPLAY
+    files = sorted(glob.glob(os.path.join(source, "*.json"))) if os.path.isdir(source) else [source]
+    replies = []
+    for fp in files:
+        try:
+            with open(fp, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for turn in payload.get("transcript", []):
+            if turn.get("speaker") != "User" and turn.get("text"):
+                replies.append(turn["text"])
+    return replies or list(_BUILTIN_REPLIES)
+
+
+class StubEpisodicMemory:
+    """
+    Mirrors TinyTroupe's EpisodicMemory windowing: the first `fixed_prefix_length`
+    entries are always kept, plus the last `lookback_length` ones.
+    """
+
+    def __init__(self, fixed_prefix_length: int = 100, lookback_length: int = 100):
+        self.fixed_prefix_length = fixed_prefix_length
+        self.lookback_length = lookback_length
+        self.memory: List[Dict[str, Any]] = []
+
+    def store(self, value: Dict[str, Any]) -> None:
+        self.memory.append(value)
+
+    def retrieve_recent(self) -> List[Dict[str, Any]]:
+        prefix = self.memory[: self.fixed_prefix_length]
+        rest = self.memory[self.fixed_prefix_length:]
+        return prefix + rest[-self.lookback_length:] if self.lookback_length > 0 else prefix
+
+
+class StubPerson:
+    """Duck-types the parts of TinyPerson the simulation pipeline touches."""
+
+    all_agents: Dict[str, "StubPerson"] = {}
+    _replies: Optional[List[str]] = None
+    _lock = threading.RLock()
+
+    def __init__(self, name: str, shape: Optional[str] = None, latency_ms: Optional[float] = None):
+        self.name = name
+        self.shape = shape or os.getenv("STUB_SHAPE", "tinytroupe")
+        if self.shape not in SHAPES:
+            raise ValueError(f"Unknown STUB_SHAPE {self.shape!r}; expected one of {sorted(SHAPES)}")
+        self.latency_ms = float(os.getenv("STUB_LATENCY_MS", "0")) if latency_ms is None else latency_ms
+        self._persona: Dict[str, Any] = {}
+        self.empty_every = int(os.getenv("STUB_EMPTY_EVERY", "0"))
+        self.episodic_memory = StubEpisodicMemory()
+        self.act_calls = 0
+        self.llm_calls = 0
+        self._cursor = 0  # next recorded reply
+
+    @classmethod
+    def _recorded(cls) -> List[str]:
+        with cls._lock:
+            if cls._replies is None:
+                cls._replies = load_recorded_replies()
+            return cls._replies
+
+    @classmethod
+    def load_specification(cls, spec: Dict[str, Any]) -> "StubPerson":
+        persona = dict(spec.get("persona", {}))
+        name = persona.get("name", "Unnamed Persona")
+        with cls._lock:
+            if name in cls.all_agents:
+                raise ValueError(f"Agent name {name} is already in use.")
+            agent = cls(name)
+            cls.all_agents[name] = agent
+        agent._persona = persona
+        for m in spec.get("memory", []):
+            agent.episodic_memory.store({"role": "system", "content": m})
+        return agent
+
+    def encode_complete_state(self) -> Dict[str, Any]:
+        return copy.deepcopy({
+            "_persona": self._persona,
+            "episodic_memory": self.episodic_memory.__dict__,
+            "act_calls": self.act_calls,
+            "llm_calls": self.llm_calls,
+        })
+
+    def decode_complete_state(self, state: Dict[str, Any]) -> "StubPerson":
+        self._persona = state["_persona"]
+        self.episodic_memory = StubEpisodicMemory()
+        self.episodic_memory.__dict__.update(state["episodic_memory"])
+        self.act_calls = state["act_calls"]
+        self.llm_calls = state["llm_calls"]
+        self._cursor = 0  # next recorded reply
+        return self
+
+    def listen(self, speech: str, **kwargs):
+        self.episodic_memory.store({"role": "user", "content": speech})
+        return self
+
+    def act(self, until_done: bool = True, n: Optional[int] = None, return_actions: bool = False, **kwargs):
+        self.act_calls += 1
+        single = not until_done and n == 1
+        self.llm_calls += 1 if single else 2
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        if self.empty_every and self.act_calls % self.empty_every == 0:
+            return [] if return_actions else None
+        replies = self._recorded()
+        text = replies[self._cursor % len(replies)]
+        self._cursor += 1
+        self.episodic_memory.store({"role": "assistant", "content": text})
+        payload = SHAPES[self.shape](text)
+        if single and isinstance(payload, list):
+            payload = payload[:1]  # no DONE action when only one action was requested
+        return payload if return_actions else None
+
+    def listen_and_act(self, speech: str, return_actions: bool = False, **kwargs):
+        self.listen(speech)
+        return self.act(return_actions=return_actions)
@@ -0,0 +1,273 @@
+# app/tax_grid.py
+"""
+Vectorized after-tax scenario grid.
+
+`after_tax_grid(assumptions)` evaluates the slider assumptions across every
+combination of the toggles (harvest × lots × reinvest × horizon) and a range
+of ordinary / LTCG / state rates around the chosen ones, in one batched NumPy
+pass. The tax-drag model follows `_simulate_after_tax_data` in
+after_tax_regression.py (income taxed at ord+NIIT+state, realized gains at
+LTCG+NIIT+state, only on the taxable share of the account mix), made explicit
+per year so the toggles matter:
+
+- turnover realizes that share of the embedded gain each year;
+- Specific ID sells high-basis lots first, so less of the sale is gain;
+- harvesting offsets realized gains with harvested losses (and lowers basis,
+  so it defers rather than forgives the tax); unused losses carry forward;
+- reinvest No pays distributions out instead of compounding them.
+
+How much Specific ID and harvesting are worth is measured on simulated lot
+ledgers for the mix's risky sleeve (tax_lots.lot_effects, read from its
+precomputed table), not assumed.
+
+Returns are the annualized change in wealth before liquidation. The asset
+class returns are illustrative capital-market assumptions, not forecasts.
+"""
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tax_lots import tabulated_lot_effects
+
+# Expected pre-tax total return per mix slider (illustrative)
+ASSET_RETURNS = {
+    "us_eq": 0.070,
+    "intl_eq": 0.075,
+    "fi": 0.040,
+    "altshf": 0.055,
+    "altspe": 0.090,
+    "altsre": 0.060,
+    "cash": 0.030,
+}
+# Annual volatility per mix slider (illustrative, like ASSET_RETURNS)
+ASSET_VOLS = {
+    "us_eq": 0.16,
+    "intl_eq": 0.18,
+    "fi": 0.05,
+    "altshf": 0.08,
+    "altspe": 0.22,
+    "altsre": 0.15,
+    "cash": 0.005,
+}
+# Correlations, in ASSET_RETURNS order
+ASSET_CORR = np.array([
+    # us    intl  fi     hf    pe    re    cash
+    [1.00, 0.80, 0.10, 0.60, 0.70, 0.55, 0.00],
+    [0.80, 1.00, 0.10, 0.55, 0.65, 0.50, 0.00],
+    [0.10, 0.10, 1.00, 0.10, 0.05, 0.20, 0.20],
+    [0.60, 0.55, 0.10, 1.00, 0.50, 0.40, 0.00],
+    [0.70, 0.65, 0.05, 0.50, 1.00, 0.50, 0.00],
+    [0.55, 0.50, 0.20, 0.40, 0.50, 1.00, 0.00],
+    [0.00, 0.00, 0.20, 0.00, 0.00, 0.00, 1.00],
+])
+ASSET_COV = ASSET_CORR * np.outer(list(ASSET_VOLS.values()), list(ASSET_VOLS.values()))
+# Mix sliders whose holdings throw off harvestable losses
+RISKY_ASSETS = ("us_eq", "intl_eq", "altshf", "altspe", "altsre")
+
+TOGGLES: Dict[str, Tuple[Any, ...]] = {
+    "harvest": ("ON", "OFF"),
+    "lots": ("FIFO", "Specific ID"),
+    "reinvest": ("Yes", "No"),
+    "horizon": (1, 3, 5),
+}
+# Rate axes: offsets (percentage points) around the slider value, clipped to the slider range
+RATE_STEPS: Dict[str, Tuple[int, ...]] = {
+    "ord_rate": (-10, -5, 0, 5, 10),
+    "ltcg_rate": (-5, 0, 5),
+    "state_rate": (-3, 0, 3),
+}
+RATE_BOUNDS = {"ord_rate": (0, 55), "ltcg_rate": (0, 35), "state_rate": (0, 15)}
+
+AXES = tuple(TOGGLES) + tuple(RATE_STEPS)
+
+
+def _rate_axis(key: str, value: float) -> np.ndarray:
+    lo, hi = RATE_BOUNDS[key]
+    return np.clip(value + np.asarray(RATE_STEPS[key], dtype=float), lo, hi) / 100.0
+
+def _along(values, axis: int) -> np.ndarray:
+    """`values` as an array laid along `axis` of the 7-d grid (size 1 elsewhere)."""
+    shape = [1] * len(AXES)
+    shape[axis] = -1
+    return np.asarray(values).reshape(shape)
+
+def _horizons(assumptions: Dict[str, Any]) -> Tuple[int, ...]:
+    return tuple(sorted({*TOGGLES["horizon"], int(assumptions["horizon"])}))
+
+def portfolio_profile(assumptions: Dict[str, Any]) -> Dict[str, float]:
+    """Pre-tax return, yield, risky share and taxable share implied by the sliders."""
+    weights = np.array([assumptions[k] for k in ASSET_RETURNS], dtype=float)
+    total = weights.sum()
+    weights = weights / total if total > 0 else np.eye(len(ASSET_RETURNS))[list(ASSET_RETURNS).index("cash")]
+    mean = np.array(list(ASSET_RETURNS.values()))
+    risky_w = np.where([k in RISKY_ASSETS for k in ASSET_RETURNS], weights, 0.0)
+    risky = float(risky_w.sum())
+    # The sleeve whose lots are harvested (the whole mix when nothing is risky)
+    sleeve = risky_w / risky if risky > 0 else weights
+    sheltered = (assumptions["tax_deferred"] + assumptions["tax_exempt"]) / 100.0
+    return {
+        "pre_tax_return": float(weights @ mean),
+        "yield": assumptions["yield"] / 100.0,
+        "turnover": assumptions["turnover"] / 100.0,
+        "risky_share": risky,
+        "sleeve_return": float(sleeve @ mean),
+        "sleeve_vol": float(np.sqrt(sleeve @ ASSET_COV @ sleeve)),
+        "taxable_share": float(np.clip(1.0 - sheltered, 0.0, 1.0)),
+    }
+
+def measured_lot_effects(prof: Dict[str, float]) -> Dict[str, Any]:
+    """lot_effects for the profile's risky sleeve (price growth net of yield)."""
+    return tabulated_lot_effects(prof["sleeve_return"] - prof["yield"], prof["sleeve_vol"], prof["turnover"])
+
+
+def new_tax_state(shape) -> Dict[str, np.ndarray]:
+    """$1 invested at basis 1, nothing paid out, no loss carryforward."""
+    return {"value": np.ones(shape), "basis": np.ones(shape), "paid_out": np.zeros(shape),
+            "carry": np.zeros(shape), "taxes": np.zeros(shape)}
+
+def tax_year(state: Dict[str, np.ndarray], g, y, turnover, gain_factor, harvest_rate, rate_income, rate_gains,
+             reinvest) -> Dict[str, np.ndarray]:
+    """
+    One year of the after-tax walk; every argument broadcasts against the state.
+    `g` is the price return and `y` the yield for the year, `harvest_rate` the
+    losses harvested as a share of the grown value, rates already scaled by the
+    taxable share.
+    """
+    value, basis, carry = state["value"], state["basis"], state["carry"]
+    income = value * y
+    grown = value * (1.0 + g)
+    realized = turnover * np.maximum(grown - basis, 0.0) * gain_factor
+    harvested = grown * harvest_rate
+    losses = harvested + carry
+    taxable_gain = np.maximum(realized - losses, 0.0)
+    tax_income = income * rate_income
+    tax_gains = taxable_gain * rate_gains
+    # Sold lots are re-bought at market; harvest swaps re-enter at the lower price
+    basis = basis + realized - harvested
+    net_income = income - tax_income
+    return {
+        "value": grown - tax_gains + np.where(reinvest, net_income, 0.0),
+        "basis": basis + np.where(reinvest, net_income, 0.0),
+        "paid_out": state["paid_out"] + np.where(reinvest, 0.0, net_income),
+        "carry": losses - (realized - taxable_gain),
+        "taxes": state["taxes"] + tax_income + tax_gains,
+    }
+
+
+def after_tax_grid(assumptions: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evaluate every toggle combination and rate step in one pass.
+
+    Returns {"axes": {name: values}, "pre_tax_return", "after_tax_return",
+    "tax_drag": arrays shaped by AXES (annualized fractions), "profile",
+    "lot_effects"}.
+    """
+    prof = portfolio_profile(assumptions)
+    horizons = _horizons(assumptions)
+    axes: Dict[str, Any] = {k: TOGGLES[k] for k in ("harvest", "lots", "reinvest")}
+    axes["horizon"] = horizons
+    for key in RATE_STEPS:
+        axes[key] = _rate_axis(key, assumptions[key])
+
+    effects = measured_lot_effects(prof)
+    harvest = _along([v == "ON" for v in axes["harvest"]], 0)
+    gain_factor = _along([1.0 if v == "FIFO" else effects["specific_id_gain_factor"] for v in axes["lots"]], 1)
+    reinvest = _along([v == "Yes" for v in axes["reinvest"]], 2)
+    niit = assumptions["niit"] / 100.0
+    ord_rate, ltcg_rate, state_rate = (_along(axes[k], AXES.index(k)) for k in RATE_STEPS)
+    rate_income = (ord_rate + niit + state_rate) * prof["taxable_share"]
+    rate_gains = (ltcg_rate + niit + state_rate) * prof["taxable_share"]
+
+    y = prof["yield"]
+    g = prof["pre_tax_return"] - y  # price return
+    harvest_rate = np.where(harvest, effects["harvest_loss_rate"] * prof["risky_share"], 0.0)
+
+    # Broadcast state over every non-horizon axis; horizons are snapshots of one walk
+    shape = np.broadcast_shapes(harvest.shape, gain_factor.shape, reinvest.shape, rate_income.shape,
+                                rate_gains.shape)
+    state = new_tax_state(shape)
+    pre_value, pre_paid_out = np.ones(reinvest.shape), np.zeros(reinvest.shape)
+    after, pre = [], []
+    for year in range(1, max(horizons) + 1):
+        state = tax_year(state, g, y, prof["turnover"], gain_factor, harvest_rate, rate_income, rate_gains,
+                         reinvest)
+        pre_income = pre_value * y
+        pre_value = pre_value * (1.0 + g) + np.where(reinvest, pre_income, 0.0)
+        pre_paid_out = pre_paid_out + np.where(reinvest, 0.0, pre_income)
+        if year in horizons:
+            after.append((state["value"] + state["paid_out"]) ** (1.0 / year) - 1.0)
+            pre.append(np.broadcast_to((pre_value + pre_paid_out) ** (1.0 / year) - 1.0, shape))
+
+    h = AXES.index("horizon")
+    after_tax = np.concatenate(after, axis=h)
+    pre_tax = np.concatenate(pre, axis=h)
+    return {
+        "axes": axes,
+        "pre_tax_return": pre_tax,
+        "after_tax_return": after_tax,
+        "tax_drag": pre_tax - after_tax,
+        "profile": prof,
+        "lot_effects": effects,
+    }
+
+
+def selected_index(grid: Dict[str, Any], assumptions: Dict[str, Any]) -> Tuple[int, ...]:
+    """Grid index of the slider selection (rate axes at offset 0)."""
+    axes = grid["axes"]
+    idx = [list(axes[k]).index(assumptions[k]) for k in ("harvest", "lots", "reinvest")]
+    idx.append(list(axes["horizon"]).index(int(assumptions["horizon"])))
+    idx += [RATE_STEPS[k].index(0) for k in RATE_STEPS]
+    return tuple(idx)
+
+def selected_metrics(grid: Dict[str, Any], assumptions: Dict[str, Any]) -> Dict[str, float]:
+    """Pre-tax / after-tax return and tax drag for the current slider selection (percent)."""
+    i = selected_index(grid, assumptions)
+    return {k: round(float(grid[k][i]) * 100.0, 3) for k in ("pre_tax_return", "after_tax_return", "tax_drag")}
+
+def grid_table(grid: Dict[str, Any], assumptions: Dict[str, Any]) -> pd.DataFrame:
+    """
+    One row per toggle combination at the slider rates, with the after-tax
+    range across the rate steps. Values in percent.
+    """
+    rates = tuple(RATE_STEPS[k].index(0) for k in RATE_STEPS)
+    at_rates = (Ellipsis,) + rates
+    rate_axes = tuple(range(len(TOGGLES), len(AXES)))
+    index = pd.MultiIndex.from_product([grid["axes"][k] for k in TOGGLES], names=list(TOGGLES))
+    df = pd.DataFrame({
+        "pre_tax_%": grid["pre_tax_return"][at_rates].ravel(),
+        "after_tax_%": grid["after_tax_return"][at_rates].ravel(),
+        "tax_drag_%": grid["tax_drag"][at_rates].ravel(),
+        "after_tax_low_%": grid["after_tax_return"].min(axis=rate_axes).ravel(),
+        "after_tax_high_%": grid["after_tax_return"].max(axis=rate_axes).ravel(),
+    }, index=index) * 100.0
+    return df.round(2)
+
+def grid_prompt_text(grid: Dict[str, Any], assumptions: Dict[str, Any]) -> str:
+    """A few lines of computed numbers for the persona prompt."""
+    cur = selected_metrics(grid, assumptions)
+    h, l, r, hz, *_ = selected_index(grid, assumptions)
+    rates = tuple(RATE_STEPS[k].index(0) for k in RATE_STEPS)
+    drag = grid["tax_drag"]
+
+    def delta(axis: int) -> float:
+        # Drag change from flipping one toggle, everything else as selected
+        i = [h, l, r, hz, *rates]
+        i[axis] = 1 - i[axis]
+        return (drag[tuple(i)] - drag[h, l, r, hz, *rates]) * 100.0
+
+    # Best harvest/lots/reinvest at the selected horizon and rates; among ties (e.g. lots
+    # when nothing is realized) the combination closest to the current selection wins
+    table = grid["after_tax_return"][:, :, :, hz, *rates]
+    ties = np.argwhere(table >= table.max() - 1e-12)
+    best = tuple(ties[np.argmin((ties != (h, l, r)).sum(axis=1))])
+    best_label = ", ".join(f"{k} {grid['axes'][k][j]}" for k, j in zip(("harvest", "lots", "reinvest"), best))
+    lo = grid["after_tax_return"][h, l, r, hz].min() * 100.0
+    hi = grid["after_tax_return"][h, l, r, hz].max() * 100.0
+    return (
+        f"Computed (annualized, {assumptions['horizon']}y): pre-tax {cur['pre_tax_return']:.2f}%, "
+        f"after-tax {cur['after_tax_return']:.2f}%, tax drag {cur['tax_drag']:.2f}%\n"
+        f"Drag change if flipped: harvest {delta(0):+.2f}%, lots {delta(1):+.2f}%, reinvest {delta(2):+.2f}%\n"
+        f"After-tax range over ord/LTCG/state rate steps: {lo:.2f}% to {hi:.2f}%; best toggles at {assumptions['horizon']}y: "
+        f"{best_label} ({table[best] * 100.0:.2f}%)"
+    )
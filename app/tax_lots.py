@@ -0,0 +1,383 @@
+# app/tax_lots.py
+"""
+Array-backed tax-lot ledger for one holding.
+
+LotLedger keeps every purchase lot in parallel NumPy arrays (shares, cost per
+share, acquisition day). Sales pick lots in one of three orders and are
+settled in bulk: a cumulative-shares search finds the cut-off lot, every lot
+before it is closed at once and the cut-off lot is sold partially.
+
+- "FIFO": oldest lots first (acquisition order; a head pointer skips closed lots).
+- "HIFO": highest cost first. A cost-sorted index is maintained by merging new
+  lots in on each buy, so no sale re-sorts the book.
+- "LOSS_FIRST": tax-aware Specific ID. Short-term losses first, then long-term
+  losses, long-term gains and short-term gains, largest loss and smallest gain
+  first within each group (per sale, only the lots needed are partitioned out
+  and sorted).
+
+`harvest(price, day)` realizes every lot trading below cost in one masked pass
+and re-buys the shares as a single new lot (a similar, not identical, holding).
+Closed lots are compacted away once they are half the book, which keeps a
+ledger of a few hundred thousand lots at a few milliseconds per operation.
+
+`lot_effects()` runs ledgers along simulated monthly price paths to measure
+what the Lot Selection and Harvest Losses toggles are worth (LOT_METHODS maps
+each Lot Selection choice to the sale orders it may use). One measurement
+takes about 45 ms, too slow for every slider step, so `tabulated_lot_effects()`
+interpolates in a table of them precomputed over a (growth, vol, turnover)
+lattice that covers every slider position (app/lot_effects_table.npz,
+rebuilt with `python app/tax_lots.py --tabulate`) and measures directly only
+outside it. tax_grid and monte_carlo use these numbers instead of assumed
+constants.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Union
+
+import numpy as np
+
+LONG_TERM_DAYS = 365
+METHODS = ("FIFO", "HIFO", "LOSS_FIRST")
+# UI "Lot Selection" choices -> the ledger sale orders they may use. Specific ID
+# is measured as whichever of its orders realizes the least gain.
+LOT_METHODS = {"FIFO": ("FIFO",), "Specific ID": ("HIFO", "LOSS_FIRST")}
+
+ArrayLike = Union[float, np.ndarray]
+
+
+def _empty_realization() -> Dict[str, float]:
+    return {"shares": 0.0, "proceeds": 0.0, "cost_basis": 0.0, "gain": 0.0,
+            "short_term": 0.0, "long_term": 0.0, "lots": 0}
+
+
+class LotLedger:
+    def __init__(self, capacity: int = 1024):
+        self._shares = np.zeros(capacity)
+        self._cost = np.zeros(capacity)
+        self._acquired = np.zeros(capacity, dtype=np.int64)
+        self._n = 0         # lots ever held (closed ones included until compaction)
+        self._closed = 0
+        self._head = 0      # first lot that may still be open (FIFO)
+        self._by_cost = np.zeros(0, dtype=np.int64)  # lot indexes, ascending cost
+
+    # ----- book -----
+    def __len__(self) -> int:
+        return self._n - self._closed
+
+    @property
+    def shares(self) -> float:
+        return float(self._shares[:self._n].sum())
+
+    def cost_basis(self) -> float:
+        return float(self._shares[:self._n] @ self._cost[:self._n])
+
+    def market_value(self, price: float) -> float:
+        return self.shares * price
+
+    def unrealized(self, price: float) -> float:
+        return self.market_value(price) - self.cost_basis()
+
+    def _grow(self, need: int) -> None:
+        cap = len(self._shares)
+        if need <= cap:
+            return
+        cap = max(need, cap * 2)
+        for name in ("_shares", "_cost", "_acquired"):
+            old = getattr(self, name)
+            new = np.zeros(cap, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def buy(self, shares: ArrayLike, price: ArrayLike, day: ArrayLike) -> None:
+        """Open one lot per element (scalars open one lot). Lots are assumed to arrive in day order."""
+        shares, price, day = np.broadcast_arrays(np.atleast_1d(shares).astype(float),
+                                                 np.atleast_1d(price).astype(float), np.atleast_1d(day))
+        keep = shares > 0
+        m = int(keep.sum())
+        if not m:
+            return
+        self._grow(self._n + m)
+        new = np.arange(self._n, self._n + m)
+        self._shares[new] = shares[keep]
+        self._cost[new] = price[keep]
+        self._acquired[new] = day[keep]
+        self._n += m
+        # Merge the new lots into the cost order: O(n + m log m), no full re-sort
+        new = new[np.argsort(self._cost[new])]
+        if not len(self._by_cost):
+            self._by_cost = new
+            return
+        pos = np.searchsorted(self._cost[self._by_cost], self._cost[new], side="right")
+        self._by_cost = np.insert(self._by_cost, pos, new)
+
+    # ----- sales -----
+    def _order(self, method: str, price: float, day: int) -> Callable[[int], np.ndarray]:
+        """`prefix(width)`: the first `width` lots in sale order (fewer at the end of the book)."""
+        if method == "FIFO":
+            head, n = self._head, self._n
+            return lambda width: np.arange(head, min(head + width, n))
+        if method == "HIFO":
+            desc = self._by_cost[::-1]
+            return lambda width: desc[:width]
+        if method == "LOSS_FIRST":
+            idx = np.flatnonzero(self._shares[:self._n] > 0)
+            unit = price - self._cost[idx]
+            long_term = (day - self._acquired[idx]) >= LONG_TERM_DAYS
+            # 0: short-term loss, 1: long-term loss, 2: long-term gain, 3: short-term gain
+            group = np.where(unit < 0, np.where(long_term, 1, 0), np.where(long_term, 2, 3))
+            # One float sort key: group, then unit gain (offset so it stays inside its group's band)
+            low = float(unit.min()) if len(unit) else 0.0
+            key = group * (float(unit.max()) - low + 1.0 if len(unit) else 1.0) + (unit - low)
+
+            def prefix(width: int) -> np.ndarray:
+                # Partition out the `width` smallest keys and sort only those
+                if width >= len(key):
+                    return idx[np.argsort(key)]
+                part = np.argpartition(key, width)[:width]
+                return idx[part[np.argsort(key[part])]]
+            return prefix
+        raise ValueError(f"Unknown lot method {method!r}; expected one of {METHODS}")
+
+    def _settle(self, idx: np.ndarray, sold: np.ndarray, price: float, day: int) -> Dict[str, float]:
+        cost = sold * self._cost[idx]
+        gain = sold * price - cost
+        long_term = (day - self._acquired[idx]) >= LONG_TERM_DAYS
+        was_open = self._shares[idx] > 0
+        self._shares[idx] -= sold
+        # Only lots this sale closed count toward compaction
+        closed = idx[was_open & (self._shares[idx] <= 1e-12)]
+        self._shares[closed] = 0.0
+        self._closed += len(closed)
+        return {
+            "shares": float(sold.sum()),
+            "proceeds": float(sold.sum() * price),
+            "cost_basis": float(cost.sum()),
+            "gain": float(gain.sum()),
+            "short_term": float(gain[~long_term].sum()),
+            "long_term": float(gain[long_term].sum()),
+            "lots": int(len(idx)),
+        }
+
+    def sell(self, shares: float, price: float, day: int, method: str = "FIFO") -> Dict[str, float]:
+        """Sell `shares` picking lots by `method`; returns the realized proceeds, basis and ST/LT gains."""
+        if shares <= 0:
+            return _empty_realization()
+        held = self.shares
+        if shares > held * (1 + 1e-12):
+            raise ValueError(f"Cannot sell {shares} shares; only {held} held")
+        prefix = self._order(method, price, day)
+        # Widen the prefix until it covers the sale, so small sales stay O(lots sold)
+        width = 1024
+        while True:
+            order = prefix(width)
+            # The FIFO range and the cost index still hold lots closed since the last compaction
+            open_ = order[self._shares[order] > 0]
+            cum = np.cumsum(self._shares[open_])
+            if (len(cum) and cum[-1] >= shares) or len(order) < width:
+                break
+            width *= 4
+        if not len(cum):
+            return _empty_realization()
+        order = open_
+        cut = min(int(np.searchsorted(cum, shares, side="left")), len(cum) - 1)
+        idx = order[:cut + 1]
+        sold = self._shares[idx].copy()
+        sold[-1] = shares - (cum[cut - 1] if cut else 0.0)
+        out = self._settle(idx, np.minimum(sold, self._shares[idx]), price, day)
+        self._after_close()
+        return out
+
+    def harvest(self, price: float, day: int, min_loss: float = 0.0) -> Dict[str, float]:
+        """
+        Realize every lot whose loss exceeds `min_loss` (a fraction of cost) and
+        re-buy the same shares at `price` as one new lot.
+        """
+        n = self._n
+        idx = np.flatnonzero((self._shares[:n] > 0) & (price < self._cost[:n] * (1.0 - min_loss)))
+        if not len(idx):
+            return _empty_realization()
+        out = self._settle(idx, self._shares[idx].copy(), price, day)
+        self.buy(out["shares"], price, day)
+        self._after_close()
+        return out
+
+    def _after_close(self) -> None:
+        # Advance the FIFO head past closed lots, a window at a time
+        width = 1024
+        while self._head < self._n:
+            open_ = np.flatnonzero(self._shares[self._head:self._head + width] > 0)
+            if len(open_):
+                self._head += int(open_[0])
+                break
+            self._head = min(self._head + width, self._n)
+            width *= 4
+        if self._closed > max(64, self._n // 2):
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop closed lots and rebuild the cost index."""
+        n = self._n
+        keep = np.flatnonzero(self._shares[:n] > 0)
+        m = len(keep)
+        for name in ("_shares", "_cost", "_acquired"):
+            arr = getattr(self, name)
+            arr[:m] = arr[keep]
+            arr[m:n] = 0
+        remap = np.full(n, -1, dtype=np.int64)
+        remap[keep] = np.arange(m)
+        by_cost = remap[self._by_cost]
+        self._by_cost = by_cost[by_cost >= 0]
+        self._n, self._closed, self._head = m, 0, 0
+
+
+# ===== Measured toggle effects =====
+def _walk(path: np.ndarray, turnover: float, method: str, harvest: bool, history_months: int) -> Dict[str, float]:
+    """Monthly buys for `history_months`, then yearly turnover sales (re-bought) and monthly harvest checks."""
+    ledger = LotLedger()
+    # The buying history is one bulk buy: one lot per month, in day order
+    history = path[:history_months]
+    ledger.buy((1.0 / history_months) / history, history, np.arange(history_months) * 30)
+    realized, harvested, value_years = 0.0, 0.0, 0.0
+    for month in range(history_months, len(path)):
+        price, day = path[month], month * 30
+        if harvest:
+            harvested -= ledger.harvest(price, day, min_loss=0.02)["gain"]
+        if (month - history_months) % 12 == 11:
+            value = ledger.market_value(price)
+            sale = ledger.sell(turnover * ledger.shares, price, day, method)
+            ledger.buy(sale["shares"], price, day)
+            realized += sale["gain"]
+            value_years += value
+    return {"realized": realized, "harvested": harvested, "value_years": value_years}
+
+# What _ledger_sums returns, in order: the gain realized under each sale order,
+# then the losses harvested and the value-years held under FIFO with harvesting
+SUMS = METHODS + ("harvested", "value_years")
+
+def _ledger_sums(growth: float, vol: float, turnover: float, years: int, paths: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    history, months = 36, 36 + 12 * years
+    steps = rng.normal(growth / 12 - vol ** 2 / 24, vol / np.sqrt(12), size=(paths, months))
+    prices = np.exp(np.cumsum(steps, axis=1))
+    gains = [sum(_walk(p, turnover, m, False, history)["realized"] for p in prices) for m in METHODS]
+    harvested = [_walk(p, turnover, LOT_METHODS["FIFO"][0], True, history) for p in prices]
+    return np.array(gains + [sum(r["harvested"] for r in harvested), sum(r["value_years"] for r in harvested)])
+
+def _effects(sums: np.ndarray) -> Dict[str, Any]:
+    totals = dict(zip(SUMS, sums.tolist()))
+    fifo_gain = min(totals[m] for m in LOT_METHODS["FIFO"])
+    specific = min(LOT_METHODS["Specific ID"], key=totals.__getitem__)
+    value_years = totals["value_years"]
+    return {
+        "specific_id_gain_factor": float(np.clip(totals[specific] / fifo_gain, 0.0, 1.0)) if fifo_gain > 0 else 1.0,
+        "specific_id_method": specific,
+        "harvest_loss_rate": totals["harvested"] / value_years if value_years else 0.0,
+    }
+
+@lru_cache(maxsize=256)
+def _lot_effects(growth: float, vol: float, turnover: float, years: int, paths: int, seed: int) -> Dict[str, Any]:
+    return _effects(_ledger_sums(growth, vol, turnover, years, paths, seed))
+
+def lot_effects(growth: float, vol: float, turnover: float, years: int = 5, paths: int = 16,
+                seed: int = 7) -> Dict[str, Any]:
+    """
+    What lot selection and harvesting do for a holding with this price growth,
+    volatility and yearly turnover, measured on simulated ledgers:
+
+    - specific_id_gain_factor: gains realized under Specific ID relative to
+      FIFO, for the same turnover. Specific ID uses whichever of its orders
+      (highest cost first or loss first) realizes less (specific_id_method);
+    - harvest_loss_rate: losses harvested per year as a share of the holding.
+
+    Inputs are rounded so nearby slider positions share a cached result.
+    """
+    return dict(_lot_effects(round(growth, 3), round(vol, 3), round(turnover, 2), years, paths, seed))
+
+
+# ===== Precomputed table =====
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lot_effects_table.npz")
+# Sleeve growth net of yield spans 0.09 (all PE) down to 0.03 - 0.20 (cash, 20% yield);
+# sleeve volatility 0.005 (cash) to 0.22 (all PE)
+TABLE_AXES = {
+    "growth": np.round(np.arange(-0.17, 0.0901, 0.01), 3),
+    "vol": np.round(np.arange(0.0, 0.2401, 0.02), 3),
+    "turnover": np.round(np.arange(0.0, 1.0001, 0.1), 2),
+}
+# Bump when _walk or _ledger_sums change, so an older table is ignored
+TABLE_VERSION = 1
+_TABLE_PARAMS = (TABLE_VERSION, 5, 16, 7)  # version, years, paths, seed (lot_effects defaults)
+
+
+def _table_row(growth: float) -> np.ndarray:
+    _v, years, paths, seed = _TABLE_PARAMS
+    return np.array([[_ledger_sums(float(growth), float(vol), float(turnover), years, paths, seed)
+                      for turnover in TABLE_AXES["turnover"]] for vol in TABLE_AXES["vol"]])
+
+def tabulate_lot_effects(path: str = TABLE_PATH, workers: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Run the ledgers at every TABLE_AXES point (one growth row per worker task) and save their sums."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(_table_row, TABLE_AXES["growth"]))
+    table = {**TABLE_AXES, "sums": np.stack(rows), "params": np.array(_TABLE_PARAMS)}
+    np.savez_compressed(path, **table)
+    _load_table.cache_clear()
+    return table
+
+@lru_cache(maxsize=1)
+def _load_table() -> Optional[Dict[str, np.ndarray]]:
+    """The saved table, or None if it is missing or was built for other parameters."""
+    try:
+        with np.load(TABLE_PATH) as f:
+            table = {k: f[k] for k in f.files}
+    except (OSError, ValueError):
+        return None
+    if tuple(table["params"].tolist()) != _TABLE_PARAMS:
+        return None
+    if any(not np.array_equal(table[k], v) for k, v in TABLE_AXES.items()):
+        return None
+    return table
+
+def tabulated_lot_effects(growth: float, vol: float, turnover: float) -> Dict[str, Any]:
+    """
+    lot_effects from the precomputed table: the ledger sums (gains per sale
+    order, harvested losses, value-years) are interpolated trilinearly and the
+    effects derived from them as lot_effects does. The ratios themselves jump
+    where gains cross zero, so they are not interpolated. Falls back to
+    measuring when there is no usable table or the point lies outside it.
+    """
+    table = _load_table()
+    point = (growth, vol, turnover)
+    if table is None or any(not (axis[0] <= x <= axis[-1]) for axis, x in zip(TABLE_AXES.values(), point)):
+        return lot_effects(growth, vol, turnover)
+    lo, w = [], []
+    for axis, x in zip(TABLE_AXES.values(), point):
+        i = int(np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2))
+        lo.append(i)
+        w.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+    # The 2x2x2 cell around the point, weighted per corner
+    cell = tuple(slice(i, i + 2) for i in lo)
+    weights = np.einsum("i,j,k->ijk", *[np.array([1.0 - wi, wi]) for wi in w])
+    return _effects(np.einsum("ijks,ijk->s", table["sums"][cell], weights))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute the lot_effects table the scenario grid interpolates in.")
+    parser.add_argument("--tabulate", action="store_true", help="measure every table point and save the table")
+    parser.add_argument("--out", default=TABLE_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    if not args.tabulate:
+        parser.print_help()
+        return 0
+    t0 = time.perf_counter()
+    table = tabulate_lot_effects(args.out, args.workers)
+    n = table["sums"][..., 0].size
+    print(f"Wrote {args.out}: {n} points in {time.perf_counter() - t0:.0f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# app/transcript.py
+"""
+One conversation, stored once.
+
+A Transcript keeps each turn as a single (speaker, text) pair, with the
+speaker string interned, and hands out views instead of copies:
+
+- iteration / indexing: the (speaker, text) pairs, as the old list was;
+- messages(start): chat-message dicts for turns from `start` on, built on
+  the fly. The UI renders only the turns it has not drawn yet;
+- markdown_lines(): the "- **speaker**: text" lines of the Markdown export;
+- to_json() / from_json(): the payload's [{"speaker", "text"}] form;
+- assistant_texts(): the persona's replies, for tag analytics.
+
+The user side of the conversation is always the speaker "User".
+"""
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+USER = "User"
+
+
+class Transcript:
+    __slots__ = ("_turns",)
+
+    def __init__(self, pairs: Optional[Iterable[Tuple[str, str]]] = None):
+        self._turns: List[Tuple[str, str]] = []
+        for speaker, text in pairs or ():
+            self.append(speaker, text)
+
+    def append(self, speaker: str, text: str) -> int:
+        """Add a turn; returns its index."""
+        self._turns.append((sys.intern(speaker), text))
+        return len(self._turns) - 1
+
+    # ----- the (speaker, text) pairs -----
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return iter(self._turns)
+
+    def __getitem__(self, i):
+        return self._turns[i]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Transcript):
+            return self._turns == other._turns
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Transcript({len(self)} turns)"
+
+    def pairs(self) -> List[Tuple[str, str]]:
+        """The underlying list (not a copy; do not mutate). Used for cache keys."""
+        return self._turns
+
+    # ----- views -----
+    def messages(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """{"role", "name", "content"} per turn from `start` on (name is None for the user)."""
+        for speaker, text in self._turns[start:]:
+            user = speaker == USER
+            yield {"role": "user" if user else "assistant", "name": None if user else speaker, "content": text}
+
+    def markdown_lines(self) -> Iterator[str]:
+        for speaker, text in self._turns:
+            yield f"- **{speaker}**: {text}"
+
+    def assistant_texts(self) -> Iterator[str]:
+        return (text for speaker, text in self._turns if speaker != USER)
+
+    def to_json(self) -> List[Dict[str, str]]:
+        return [{"speaker": speaker, "text": text} for speaker, text in self._turns]
+
+    @classmethod
+    def from_json(cls, turns: Iterable[Dict[str, str]]) -> "Transcript":
+        return cls((t["speaker"], t["text"]) for t in turns)
@@ -0,0 +1,154 @@
+# app/turn_cache.py
+"""
+Persistent, content-addressed cache for persona LLM turns.
+
+A turn is keyed on everything that can change the model's answer: the
+persona spec, system message, the prompt for this turn, the transcript so
+far, and the model/temperature from config.ini. Entries are small JSON
+files under `.cache/turns/`, evicted least-recently-used once the directory
+grows past `max_bytes` (a hit bumps the file's mtime).
+"""
+import configparser
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "turns")
+DEFAULT_MAX_BYTES = int(float(os.getenv("TURN_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+
+def llm_settings(config_path: str = "config.ini") -> Dict[str, Any]:
+    """Model + temperature TinyTroupe will use (part of every cache key)."""
+    cfg = configparser.ConfigParser()
+    cfg.read(config_path, encoding="utf-8")
+    return {
+        "model": cfg.get("OpenAI", "model", fallback="gpt-4o-mini"),
+        "temperature": cfg.getfloat("OpenAI", "temperature", fallback=0.2),
+    }
+
+
+class TurnCache:
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._size = self._scan_size()
+
+    @staticmethod
+    def key(**parts: Any) -> str:
+        blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _scan_size(self) -> int:
+        total = 0
+        for dirpath, _dirs, files in os.walk(self.root):
+            for fn in files:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, fn))
+                except OSError:
+                    pass
+        return total
+
+    def get(self, key: str) -> Optional[str]:
+        fp = self._path(key)
+        try:
+            with open(fp, "r", encoding="utf-8") as f:
+                text = json.load(f)["text"]
+            os.utime(fp, None)  # LRU: touch on hit
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        fp = self._path(key)
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        data = json.dumps({"text": text, "created": time.time()}, ensure_ascii=False)
+        # Atomic replace so concurrent runs (threads or batch workers) never read half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fp), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        try:
+            replaced = os.path.getsize(fp)  # overwriting a key frees the old entry's bytes
+        except OSError:
+            replaced = 0
+        os.replace(tmp, fp)
+        with self._lock:
+            self.writes += 1
+            self._size += len(data.encode("utf-8")) - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop least-recently-used entries until the cache is back under 90% of max_bytes."""
+        with self._lock:
+            entries = []
+            for dirpath, _dirs, files in os.walk(self.root):
+                for fn in files:
+                    fp = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(fp)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, fp))
+            total = sum(e[1] for e in entries)
+            target = int(self.max_bytes * 0.9)
+            for _mtime, size, fp in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(fp)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+            self._size = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for dirpath, _dirs, files in os.walk(self.root):
+                for fn in files:
+                    try:
+                        os.remove(os.path.join(dirpath, fn))
+                    except OSError:
+                        pass
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_default_cache: Optional[TurnCache] = None
+_default_lock = threading.Lock()
+
+def get_turn_cache() -> TurnCache:
+    """Process-wide cache instance (shared by UI reruns and concurrent personas)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TurnCache()
+        return _default_cache
@@ -27,3 +27,20 @@ def save_markdown(export_dir: str, filename: str, text: str) -> str:
 
 def ts() -> str:
     return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+_ENCODING = None
+
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken when available (it ships with TinyTroupe's OpenAI stack), else ~4 chars/token."""
+    global _ENCODING
+    if not text:
+        return 0
+    if _ENCODING is None:
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _ENCODING = False
+    if _ENCODING:
+        return len(_ENCODING.encode(text))
+    return max(1, len(text) // 4)
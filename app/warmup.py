@@ -0,0 +1,75 @@
+# app/warmup.py
+"""
+Optional warm-up for production containers.
+
+The app's first render only imports what the sliders and the scenario grid
+need; TinyTroupe and scikit-learn load on first use (the first Simulate or
+ML demo). warm_up() pays for them ahead of that:
+
+- APP_WARMUP=1 makes app.py start warm_up() on a background thread once per
+  server process, so the first page still renders without waiting on it;
+- `python app/warmup.py` (e.g. as a Docker build step) runs it in the
+  foreground, which also leaves the trained model under .cache/models/.
+
+Each step is timed; a step that fails (say, TinyTroupe not installed) is
+reported and does not stop the others.
+"""
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict
+
+
+def _agent_backend() -> None:
+    from simulation import agent_class
+    agent_class()
+
+def _after_tax_grid() -> None:
+    from simulation import DEFAULT_ASSUMPTIONS
+    from tax_grid import after_tax_grid
+    after_tax_grid(DEFAULT_ASSUMPTIONS)
+
+def _regression_model() -> None:
+    from after_tax_regression import get_trained_model
+    get_trained_model()
+
+STEPS = {
+    "agent_backend": _agent_backend,
+    "after_tax_grid": _after_tax_grid,
+    "regression_model": _regression_model,
+}
+
+
+def warm_up() -> Dict[str, Any]:
+    """Run every step; returns {step: {"ms": float, "error": str | None}}."""
+    report = {}
+    for name, step in STEPS.items():
+        t0 = time.perf_counter()
+        try:
+            step()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        report[name] = {"ms": (time.perf_counter() - t0) * 1000.0, "error": error}
+    return report
+
+def start_background_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="app-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def warm_up_enabled() -> bool:
+    return os.getenv("APP_WARMUP", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+if __name__ == "__main__":
+    # after_tax_regression lives in the repo root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from dotenv import load_dotenv
+    load_dotenv()
+    failed = False
+    for name, r in warm_up().items():
+        print(f"{name:<18} {r['ms']:>9.1f} ms" + (f"  FAILED: {r['error']}" if r["error"] else ""))
+        failed = failed or bool(r["error"])
+    sys.exit(1 if failed else 0)
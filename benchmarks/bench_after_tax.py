@@ -0,0 +1,190 @@
+# benchmarks/bench_after_tax.py
+"""
+Benchmark + regression gate for after_tax_regression.py.
+
+For each size (10^3 .. 10^7 rows) a fresh worker process times:
+- `_simulate_after_tax_data` on its own;
+- the training path (`_train`, what a cold `run_after_tax_regression` runs)
+  split into stages: simulate, dataframe, split, fit, predict, metrics, sample;
+- a warm `run_after_tax_regression` call (model served from the process cache);
+and records the tracemalloc peak of one training run and the worker's peak RSS.
+Times are the best of --repeat runs.
+
+The results are compared with a stored baseline
+(benchmarks/baselines/after_tax.json). The script exits 1 when the total
+training time or the tracemalloc peak of any size grows past --threshold
+(ratio, default 1.25). Slowdowns under --min-delta-ms are ignored as noise.
+It also exits 1 when R^2/MAE differ from the baseline, which means the
+generator or the model changed. Stage ratios are printed for diagnosis but
+do not fail the run. Re-record the baseline with --save-baseline after an
+intended change; baselines are machine-specific.
+
+Usage (from the repo root):
+    python benchmarks/bench_after_tax.py                       # compare with the baseline
+    python benchmarks/bench_after_tax.py --sizes 1e3 1e5 1e7   # any sizes in the baseline
+    python benchmarks/bench_after_tax.py --save-baseline
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "baselines", "after_tax.json")
+DEFAULT_SIZES = [1e3, 1e4, 1e5, 1e6]
+STAGES = ["simulate", "dataframe", "split", "fit", "predict", "metrics", "sample"]
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+def measure(n: int, repeat: int, random_state: int) -> Dict[str, Any]:
+    """Runs in a fresh worker process so peak RSS belongs to this size alone."""
+    from after_tax_regression import _simulate_after_tax_data, _train, get_trained_model, run_after_tax_regression
+
+    rss_start = _peak_rss_mb()
+    best: Dict[str, Any] = {}
+    for _ in range(repeat):
+        gc.collect()
+        stages: Dict[str, float] = {}
+        t0 = time.perf_counter()
+        trained = _train(n, random_state, stages)
+        total = time.perf_counter() - t0
+        if not best or total < best["train_s"]:
+            best = {"train_s": total, "stages": stages}
+
+    simulate_s = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        _simulate_after_tax_data(n_samples=n, random_state=random_state)
+        simulate_s = min(simulate_s, time.perf_counter() - t0)
+
+    get_trained_model(n, random_state, model_dir=None)
+    t0 = time.perf_counter()
+    run_after_tax_regression(n, random_state)
+    warm_s = time.perf_counter() - t0
+
+    gc.collect()
+    tracemalloc.start()
+    _train(n, random_state)
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss_end = _peak_rss_mb()
+    return {
+        "rows": n,
+        "train_ms": round(best["train_s"] * 1e3, 3),
+        "stages_ms": {k: round(best["stages"].get(k, 0.0) * 1e3, 3) for k in STAGES},
+        "simulate_data_ms": round(simulate_s * 1e3, 3),
+        "warm_run_ms": round(warm_s * 1e3, 4),
+        "tracemalloc_peak_mb": round(peak / 1e6, 2),
+        "peak_rss_mb": None if rss_end is None else round(rss_end, 1),
+        "rss_growth_mb": None if rss_end is None else round(rss_end - rss_start, 1),
+        "test_r2": trained["test_r2"],
+        "test_mae": trained["test_mae"],
+    }
+
+def run_sizes(sizes: List[int], repeat: int, random_state: int) -> Dict[str, Dict[str, Any]]:
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for n in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            res = pool.submit(measure, n, repeat if n < 1_000_000 else 1, random_state).result()
+        results[str(n)] = res
+        stages = " ".join(f"{k}={v:.1f}" for k, v in res["stages_ms"].items())
+        print(f"{n:>11,} rows: train {res['train_ms']:>10.1f} ms ({stages}) · sim-only {res['simulate_data_ms']:.1f} ms"
+              f" · warm {res['warm_run_ms']:.3f} ms · tracemalloc {res['tracemalloc_peak_mb']:.1f} MB"
+              f" · RSS {res['peak_rss_mb']} MB · R^2 {res['test_r2']:.4f}")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float, min_delta_ms: float) -> List[str]:
+    """Failures against the baseline (sizes missing from it are skipped)."""
+    failures = []
+    print(f"\nAgainst baseline (threshold x{threshold}):")
+    for size, cur in results.items():
+        base = baseline.get(size)
+        if not base:
+            print(f"  {int(size):>11,}: no baseline, skipped")
+            continue
+        ratio = cur["train_ms"] / base["train_ms"] if base["train_ms"] else 1.0
+        mem = (cur["tracemalloc_peak_mb"] / base["tracemalloc_peak_mb"]) if base["tracemalloc_peak_mb"] else 1.0
+        stage_ratios = " ".join(
+            f"{k} x{cur['stages_ms'][k] / base['stages_ms'][k]:.2f}"
+            for k in STAGES if base["stages_ms"].get(k)
+        )
+        flags = []
+        if ratio > threshold and cur["train_ms"] - base["train_ms"] > min_delta_ms:
+            flags.append(f"train time x{ratio:.2f}")
+        if mem > threshold:
+            flags.append(f"tracemalloc peak x{mem:.2f}")
+        if abs(cur["test_r2"] - base["test_r2"]) > 1e-9 or abs(cur["test_mae"] - base["test_mae"]) > 1e-9:
+            flags.append("results changed (R^2/MAE differ)")
+        status = "REGRESSION: " + ", ".join(flags) if flags else "ok"
+        print(f"  {int(size):>11,}: train x{ratio:.2f}, memory x{mem:.2f} [{stage_ratios}] -> {status}")
+        failures += [f"{size} rows: {f}" for f in flags]
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=float, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size below 1e6 rows (best is kept)")
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed current/baseline ratio")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_sizes([int(s) for s in args.sizes], args.repeat, args.random_state)
+    meta = {"python": sys.version.split()[0], "platform": sys.platform, "cpus": os.cpu_count(),
+            "random_state": args.random_state, "repeat": args.repeat}
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    failures = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# benchmarks/bench_agent_pool.py
+"""
+Agent pool: restoring a pooled agent vs constructing a new one.
+
+For each backend this times (median of --runs):
+- "construct": simulation.build_agent (load_specification + persona defaults);
+- "full restore": decode_complete_state of the agent's complete encoded state
+  (deep-copied), what the pool used to do on every lease;
+- "run-state restore": only the AGENT_RUN_STATE attributes (memory, mental
+  state, buffers), what the pool does now;
+- "lease": AgentPool.acquire + release of an idle agent for a registry spec.
+
+Before timing, it checks the run-state list is complete: an agent that held
+a conversation, was released and leased again must equal a newly built one,
+attribute by attribute (AssertionError naming the attributes that differ).
+
+The pool only keeps pooling while a lease is cheaper than a build (see
+agent_pool.MIN_SAMPLES); the last column says which way it goes.
+The tinytroupe backend needs TinyTroupe installed and is skipped otherwise.
+
+Usage (from the repo root):
+    python benchmarks/bench_agent_pool.py --backends stub tinytroupe --runs 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from agent_pool import AgentPool, _restore, _snapshot  # noqa: E402
+from persona_registry import get_persona_registry  # noqa: E402
+from simulation import (  # noqa: E402
+    AGENT_RUN_STATE, act_once, agent_class, build_agent, disable_memory_consolidation, forget_agent,
+)
+
+PROMPTS = ("Evaluate this feature and assumptions.", "What would you change first?")
+
+
+def _median_us(fn: Callable[[], Any], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1e6
+
+
+def _diff(a: Any, b: Any, path: str, seen: set) -> List[str]:
+    """Paths at which a and b differ; objects are compared attribute by attribute."""
+    if (id(a), id(b)) in seen:
+        return []
+    seen.add((id(a), id(b)))
+    if type(a) is not type(b):
+        return [path]
+    if isinstance(a, dict):
+        if a.keys() != b.keys():
+            return [path]
+        return [d for k in a for d in _diff(a[k], b[k], f"{path}[{k!r}]", seen)]
+    if isinstance(a, (list, tuple)):
+        if len(a) != len(b):
+            return [path]
+        return [d for i, (x, y) in enumerate(zip(a, b)) for d in _diff(x, y, f"{path}[{i}]", seen)]
+    if callable(a) and hasattr(a, "__code__"):
+        return [] if a.__code__ is b.__code__ else [path]  # per-agent patched lambdas
+    if hasattr(a, "__dict__") and not isinstance(a, type):
+        return _diff(vars(a), vars(b), path, seen)
+    return [] if a == b else [path]
+
+def check_restored_equals_fresh(spec: Dict[str, Any], backend: str) -> int:
+    """Lease, converse, release, lease again: the restored agent must equal a newly built one."""
+    pool = AgentPool(build_agent, on_restore=disable_memory_consolidation, on_evict=forget_agent,
+                     run_state=AGENT_RUN_STATE)
+    agent = pool.acquire(spec, backend)
+    for prompt in PROMPTS:
+        agent.listen(prompt)
+        act_once(agent)
+    pool.release(spec, agent, backend)
+    restored = pool.acquire(spec, backend)
+    if restored is not agent:
+        raise AssertionError(f"{backend}: the second lease built a new agent instead of restoring the pooled one")
+    fresh = build_agent(spec)
+    diffs = _diff(vars(restored), vars(fresh), type(restored).__name__, set())
+    forget_agent(fresh)
+    pool.release(spec, restored, backend)
+    pool.clear()
+    if diffs:
+        raise AssertionError(f"{backend}: a restored agent differs from a new one at {', '.join(diffs)}; "
+                             "add the attributes to simulation.AGENT_RUN_STATE")
+    return len(vars(fresh))
+
+def bench_backend(backend: str, runs: int) -> Dict[str, float]:
+    os.environ["SIM_BACKEND"] = backend
+    agent_class()  # ImportError when the backend is not installed
+    specs = get_persona_registry("app/personas.json").snapshot().agent_specs
+    spec = next(iter(specs.values()))
+    checked = check_restored_equals_fresh(spec, backend)
+
+    def construct():
+        forget_agent(build_agent(spec))
+
+    agent = build_agent(spec)
+    fields = AGENT_RUN_STATE[type(agent).__name__]
+    full, run_state = _snapshot(agent), _snapshot(agent, fields)
+    pool = AgentPool(build_agent, on_restore=disable_memory_consolidation, on_evict=forget_agent,
+                     run_state=AGENT_RUN_STATE)
+    pool.release(spec, pool.acquire(spec, backend), backend)
+    res = {
+        "construct_us": _median_us(construct, runs),
+        "full_restore_us": _median_us(lambda: _restore(agent, full), runs),
+        "run_state_restore_us": _median_us(lambda: _restore(agent, run_state, fields), runs),
+        "lease_us": _median_us(lambda: pool.release(spec, pool.acquire(spec, backend), backend), runs),
+    }
+    res = {k: round(v, 2) for k, v in res.items()}
+    res["pooling"] = pool.pays_off()
+    res["attributes_checked"] = checked
+    forget_agent(agent)
+    pool.clear()
+    return res
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="*", default=["stub", "tinytroupe"])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'backend':<11} {'construct µs':>13} {'full restore µs':>16} {'run-state µs':>13} {'lease µs':>9}  pooling")
+    for backend in args.backends:
+        try:
+            res = bench_backend(backend, args.runs)
+        except ImportError as e:
+            print(f"{backend:<11} skipped ({e})")
+            continue
+        results[backend] = res
+        print(f"{backend:<11} {res['construct_us']:>13.1f} {res['full_restore_us']:>16.1f} "
+              f"{res['run_state_restore_us']:>13.1f} {res['lease_us']:>9.1f}  {'on' if res['pooling'] else 'off'}")
+        print(f"{'':<11} restored agent equals a new one ({res['attributes_checked']} attributes)")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"runs": args.runs, "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
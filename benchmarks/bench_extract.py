@@ -0,0 +1,267 @@
+# benchmarks/bench_extract.py
+"""
+Iterative pick_text_from_actions vs the previous recursive walker.
+
+The old walker re-entered shared subtrees (every explicit branch plus the
+catch-all dive), so it returned each text several times and its work grew
+exponentially with nesting depth. The new one returns each distinct text
+once, in the same first-seen order. This script:
+
+1. checks new == the old texts with repeats dropped, on every stub payload
+   shape built from the recorded replies and on a seeded batch of random
+   nested payloads (shared subtrees, tuples, __dict__ and model_dump objects);
+2. times both on deep ({"data": {"data": ...}}), wide (thousands of actions)
+   and TinyTroupe-shaped payloads (the legacy walker is skipped once a size
+   would take too long);
+3. runs both on a cyclic __dict__ graph: the old walker recursed until
+   RecursionError (swallowed by its own `except Exception`), the new one
+   walks each object once.
+
+Usage (from the repo root):
+    python benchmarks/bench_extract.py
+    python benchmarks/bench_extract.py --json bench_extract.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from replies import pick_text_from_actions  # noqa: E402
+from stub_backend import SHAPES, load_recorded_replies  # noqa: E402
+
+
+# ----- Reference: the recursive walker pick_text_from_actions replaced -----
+def legacy_texts(payload) -> List[str]:
+    texts = []
+
+    def maybe_add(s):
+        if isinstance(s, str):
+            s = s.strip()
+            if s:
+                texts.append(s)
+
+    def visit(obj):
+        if obj is None:
+            return
+        if isinstance(obj, str):
+            maybe_add(obj)
+            return
+        if isinstance(obj, (list, tuple)):
+            for item in obj:
+                visit(item)
+            return
+        if isinstance(obj, dict):
+            ch = obj.get("choices")
+            if isinstance(ch, list) and ch:
+                for choice in ch:
+                    if isinstance(choice, dict):
+                        msg = choice.get("message")
+                        if isinstance(msg, dict):
+                            maybe_add(msg.get("content"))
+                for choice in ch:
+                    visit(choice)
+            for k in ("content", "text", "message"):
+                maybe_add(obj.get(k))
+            if "action" in obj:
+                a = obj["action"]
+                if isinstance(a, dict):
+                    t = str(a.get("type", "")).upper()
+                    c = a.get("content") or a.get("text") or a.get("message")
+                    if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
+                        maybe_add(c)
+                else:
+                    t = str(a).upper()
+                    if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
+                        c = obj.get("content") or obj.get("text") or obj.get("message")
+                        maybe_add(c)
+            if "actions" in obj and isinstance(obj["actions"], list):
+                for a in obj["actions"]:
+                    if isinstance(a, dict):
+                        t = str(a.get("type", "")).upper()
+                        if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
+                            c = a.get("content") or a.get("text") or a.get("message")
+                            maybe_add(c)
+                    visit(a)
+            if "type" in obj:
+                t = str(obj.get("type", "")).upper()
+                if t in {"TALK", "SAY", "SPEAK", "REPLY"}:
+                    c = obj.get("content") or obj.get("text") or obj.get("message")
+                    maybe_add(c)
+            for k in ("data", "payload", "result", "output"):
+                if k in obj:
+                    visit(obj[k])
+            for v in obj.values():
+                visit(v)
+            return
+        for attr in ("model_dump", "dict"):
+            if hasattr(obj, attr) and callable(getattr(obj, attr)):
+                try:
+                    visit(getattr(obj, attr)())
+                    return
+                except Exception:
+                    pass
+        d = getattr(obj, "__dict__", None)
+        if isinstance(d, dict):
+            try:
+                visit({k: v for k, v in d.items() if not str(k).startswith("_")})
+                return
+            except Exception:
+                pass
+
+    visit(payload)
+    return texts
+
+def legacy_pick_text_from_actions(payload) -> str:
+    out = "\n".join([t for t in legacy_texts(payload) if t])
+    return out.strip()
+
+
+# ----- Inputs -----
+class _Obj:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+        self._private = "hidden"
+
+class _Model:
+    def __init__(self, data):
+        self._data = data
+
+    def model_dump(self):
+        return dict(self._data)
+
+_WORDS = ["usability: dense inputs", "Try a guided tour", "Is lot selection exact?", "TALK", "DONE",
+          "assistant", "", "  ", "trust: no source for LTCG", "stop"]
+_KEYS = ["content", "text", "message", "type", "action", "actions", "choices", "data", "payload",
+         "result", "output", "target", "role", "cognitive_state", "goals", "index"]
+
+def random_payload(rng: random.Random, depth: int = 0, shared: List[Any] | None = None) -> Any:
+    shared = shared if shared is not None else []
+    r = rng.random()
+    if depth > 4 or r < 0.25:
+        return rng.choice(_WORDS + [None, 3, True])
+    if shared and r < 0.3:
+        return rng.choice(shared)  # shared subtree (a DAG, not a cycle)
+    if r < 0.45:
+        node: Any = [random_payload(rng, depth + 1, shared) for _ in range(rng.randint(0, 4))]
+        if rng.random() < 0.3:
+            node = tuple(node)
+    elif r < 0.55:
+        node = _Obj(**{k: random_payload(rng, depth + 1, shared) for k in rng.sample(_KEYS, rng.randint(1, 3))})
+    elif r < 0.6:
+        node = _Model({k: random_payload(rng, depth + 1, shared) for k in rng.sample(_KEYS, rng.randint(1, 3))})
+    else:
+        node = {k: random_payload(rng, depth + 1, shared) for k in rng.sample(_KEYS, rng.randint(1, 5))}
+        if "type" in node and rng.random() < 0.6:
+            node["type"] = rng.choice(["TALK", "say", "DONE", "THINK"])
+        if "choices" in node and rng.random() < 0.7:
+            node["choices"] = [{"message": {"role": "assistant", "content": rng.choice(_WORDS)}}]
+    shared.append(node)
+    return node
+
+def check_equivalence(rng: random.Random, fuzz: int) -> int:
+    """new output == the old walker's texts with repeats dropped, in first-seen order."""
+    replies = load_recorded_replies()
+    cases = [build(text) for text in replies for build in SHAPES.values()]
+    cases += [random_payload(rng) for _ in range(fuzz)]
+    for payload in cases:
+        want = "\n".join(dict.fromkeys(legacy_texts(payload))).strip()
+        got = pick_text_from_actions(payload)
+        if got != want:
+            raise AssertionError(f"Mismatch on {payload!r}:\n{want!r}\n{got!r}")
+    return len(cases)
+
+def deep_payload(depth: int) -> Dict[str, Any]:
+    node: Dict[str, Any] = {"type": "TALK", "content": "usability: bottom of the stack"}
+    for i in range(depth):
+        node = {"data": node, "text": f"level {i}"}
+    return node
+
+def wide_payload(n: int) -> Dict[str, Any]:
+    return {"actions": [{"type": "TALK", "content": f"line {i % 50}", "target": ""} for i in range(n)]}
+
+def tinytroupe_payload(n: int) -> List[Dict[str, Any]]:
+    return [item for _ in range(n) for item in SHAPES["tinytroupe"]("usability: dense inputs\nTry a tour")]
+
+
+def _time(fn: Callable[[Any], str], payload: Any, min_seconds: float = 0.2) -> float:
+    clock = time.perf_counter
+    n, elapsed = 0, 0.0
+    while elapsed < min_seconds:
+        t0 = clock()
+        fn(payload)
+        elapsed += clock() - t0
+        n += 1
+    return elapsed / n
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fuzz", type=int, default=3000, help="random payloads in the equivalence check")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--legacy-budget", type=float, default=0.5,
+                        help="skip the legacy walker once one call takes longer than this (seconds)")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    print(f"Equivalence: {check_equivalence(random.Random(args.seed), args.fuzz)} payloads match")
+
+    suites = {
+        "deep": (deep_payload, [4, 8, 12, 16, 20, 200, 2000]),
+        "wide": (wide_payload, [10, 100, 1_000, 10_000]),
+        "tinytroupe": (tinytroupe_payload, [1, 10, 100, 1_000]),
+    }
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    print(f"{'payload':<11} {'size':>6} {'legacy µs':>12} {'new µs':>10} {'speedup':>9}")
+    for name, (build, sizes) in suites.items():
+        legacy_ok = True
+        for n in sizes:
+            payload = build(n)
+            new = _time(pick_text_from_actions, payload)
+            legacy = None
+            if legacy_ok:
+                try:
+                    t0 = time.perf_counter()
+                    legacy_pick_text_from_actions(payload)
+                    first = time.perf_counter() - t0
+                    legacy = first if first > args.legacy_budget else _time(legacy_pick_text_from_actions, payload)
+                    legacy_ok = first <= args.legacy_budget
+                except RecursionError:
+                    legacy_ok = False
+                    legacy = float("nan")
+            results.setdefault(name, []).append({
+                "size": n, "legacy_us": None if legacy is None else round(legacy * 1e6, 2),
+                "new_us": round(new * 1e6, 2),
+            })
+            legacy_col = "skipped" if legacy is None else ("RecursionErr" if legacy != legacy else f"{legacy * 1e6:.1f}")
+            speed = f"{legacy / new:.1f}x" if legacy is not None and legacy == legacy else "-"
+            print(f"{name:<11} {n:>6} {legacy_col:>12} {new * 1e6:>10.1f} {speed:>9}")
+
+    a = _Obj(content="usability: cyclic graph")
+    a.peer = _Obj(back=a, text="Try breaking the cycle")
+    t0 = time.perf_counter()
+    try:
+        n_old = len(legacy_texts(a))
+        print(f"cyclic: legacy recursed to the limit, swallowed RecursionError and returned {n_old} texts "
+              f"in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    except RecursionError:
+        print("cyclic: legacy RecursionError")
+    t0 = time.perf_counter()
+    out = pick_text_from_actions(a)
+    print(f"cyclic: new -> {out!r} in {(time.perf_counter() - t0) * 1e3:.3f} ms")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"seed": args.seed, "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
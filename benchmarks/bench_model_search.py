@@ -0,0 +1,65 @@
+# benchmarks/bench_model_search.py
+"""
+Core scaling of run_model_search (candidate x fold CV on joblib workers).
+
+Runs the same search with each --jobs value and reports wall time, speedup
+over one job and parallel efficiency (speedup / jobs). The tasks are
+independent and the dataset reaches workers as a memory map, so efficiency
+should stay close to 1 until jobs exceed the physical cores or the number
+of tasks. The first parallel run also pays for starting the worker pool.
+
+Usage (from the repo root):
+    python benchmarks/bench_model_search.py --rows 100000 --folds 5 --jobs 1 2 4 8
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from after_tax_regression import run_model_search  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=float, default=1e5)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", nargs="*", type=int,
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    n = int(args.rows)
+    print(f"{n:,} rows, {args.folds}-fold CV, {os.cpu_count()} CPUs")
+    print(f"{'jobs':>5} {'wall s':>8} {'task s':>8} {'speedup':>8} {'efficiency':>10}  best")
+    results: Dict[str, Any] = {}
+    base = None
+    for jobs in args.jobs:
+        res = run_model_search(n_samples=n, folds=args.folds, n_jobs=jobs)
+        base = base or res["wall_s"]
+        speedup = base / res["wall_s"]
+        results[str(jobs)] = {
+            "wall_s": round(res["wall_s"], 3),
+            "task_s": round(res["task_s"], 3),
+            "speedup": round(speedup, 2),
+            "efficiency": round(speedup / jobs, 2),
+            "best": res["best"],
+            "per_candidate_s": res["results"]["task_s"].round(3).to_dict(),
+        }
+        print(f"{jobs:>5} {res['wall_s']:>8.2f} {res['task_s']:>8.2f} {speedup:>8.2f} "
+              f"{speedup / jobs:>10.2f}  {res['best']}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"rows": n, "folds": args.folds, "cpus": os.cpu_count(),
+                                "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# benchmarks/bench_persona_registry.py
+"""
+Per-rerun persona cost: re-validating every rerun vs the persona registry.
+
+For persona files of each size this times:
+- "revalidate": what a rerun used to do: json.load, validate_persona for
+  every entry and a build_agent_spec per simulated persona;
+- "registry hit": snapshot() on an unchanged file (one os.stat);
+- "registry reload": snapshot() after the file's content changed (read, hash,
+  parse, validate and build every spec once).
+
+Usage (from the repo root):
+    python benchmarks/bench_persona_registry.py --sizes 10 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from persona_registry import PersonaRegistry  # noqa: E402
+from simulation import build_agent_spec, validate_persona  # noqa: E402
+
+
+def _personas(n: int) -> List[Dict[str, Any]]:
+    with open(os.path.join("app", "personas.json"), "r", encoding="utf-8") as f:
+        base = json.load(f)
+    return [{**base[i % len(base)], "name": f"{base[i % len(base)]['name']} #{i}"} for i in range(n)]
+
+def _best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+def _revalidate(path: str) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    personas = [validate_persona(p)["normalized"] for p in raw]
+    for p in personas:
+        build_agent_spec(p)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'personas':>9} {'revalidate ms':>14} {'registry hit ms':>16} {'registry reload ms':>19}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            path = os.path.join(tmp, f"personas_{n}.json")
+            data = _personas(n)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            registry = PersonaRegistry(path)
+            registry.snapshot()
+
+            # Two versions of the file (one persona's device differs); only snapshot() is timed
+            data[0]["device"] = "iPad"
+            versions = [json.dumps(data).encode("utf-8"), json.dumps(_personas(n)).encode("utf-8")]
+            reload_s = float("inf")
+            for i in range(args.repeat):
+                with open(path, "wb") as f:
+                    f.write(versions[i % 2])
+                t0 = time.perf_counter()
+                registry.snapshot()
+                reload_s = min(reload_s, time.perf_counter() - t0)
+
+            res = {
+                "revalidate_ms": round(_best_ms(lambda: _revalidate(path), args.repeat), 3),
+                "registry_hit_ms": round(_best_ms(registry.snapshot, args.repeat * 20), 4),
+                "registry_reload_ms": round(reload_s * 1000.0, 3),
+            }
+            results[str(n)] = res
+            print(f"{n:>9,} {res['revalidate_ms']:>14.2f} {res['registry_hit_ms']:>16.4f} "
+                  f"{res['registry_reload_ms']:>19.2f}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
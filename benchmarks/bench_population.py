@@ -0,0 +1,74 @@
+# benchmarks/bench_population.py
+"""
+Synthetic persona population: generation rate and memory per representation.
+
+For each size this measures (tracemalloc peak):
+- "stream": iterate generate_population and build each persona dict only
+  as it is consumed (what batch.py does); only the de-duplication keys are kept;
+- "records": hold every PersonaRecord (slotted, interned strings);
+- "dicts": hold every persona as a plain dict (what a JSON list would load into).
+
+Usage (from the repo root):
+    python benchmarks/bench_population.py --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from persona_registry import get_persona_registry  # noqa: E402
+from population import generate_population  # noqa: E402
+
+
+def _measure(fn: Callable[[], Any]) -> Dict[str, float]:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    kept = fn()
+    seconds = time.perf_counter() - t0
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return {"seconds": round(seconds, 3), "peak_mb": round(peak / 1e6, 2)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    archetypes = get_persona_registry("app/personas.json").snapshot().personas
+    results = {}
+    print(f"{'personas':>9} {'mode':<8} {'seconds':>8} {'personas/s':>11} {'peak MB':>8}")
+    for n in args.sizes:
+        def stream():
+            for rec in generate_population(archetypes, n, args.seed):
+                rec.to_persona()
+        modes = {
+            "stream": stream,
+            "records": lambda: list(generate_population(archetypes, n, args.seed)),
+            "dicts": lambda: [r.to_persona() for r in generate_population(archetypes, n, args.seed)],
+        }
+        for name, fn in modes.items():
+            res = _measure(fn)
+            results.setdefault(str(n), {})[name] = res
+            rate = n / res["seconds"] if res["seconds"] else float("inf")
+            print(f"{n:>9,} {name:<8} {res['seconds']:>8.2f} {rate:>11,.0f} {res['peak_mb']:>8.1f}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"seed": args.seed, "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
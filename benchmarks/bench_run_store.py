@@ -0,0 +1,95 @@
+# benchmarks/bench_run_store.py
+"""
+Write cost and file count: run store vs one Markdown + JSON pair per run.
+
+Writes N copies of a recorded run payload (deliverables/d2/examples) both
+ways into a temp directory and reports the mean/p95 time per run and how
+many files each approach leaves behind, for growing N. With the store both
+stay flat; with file pairs the file count grows 2 per run.
+
+Usage (from the repo root):
+    python benchmarks/bench_run_store.py --sizes 100 1000 10000
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from run_store import RunStore  # noqa: E402
+from simulation import DEFAULT_RATINGS, record_markdown  # noqa: E402
+from utils import save_markdown  # noqa: E402
+
+
+def _payload() -> Dict:
+    for fp in sorted(glob.glob(os.path.join("deliverables", "d2", "examples", "*.json"))):
+        with open(fp, "r", encoding="utf-8") as f:
+            return json.load(f)
+    raise SystemExit("No recorded example in deliverables/d2/examples")
+
+def _files(path: str) -> int:
+    return sum(len(files) for _dirs, _sub, files in os.walk(path))
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    us = sorted(s * 1e6 for s in samples)
+    return {"mean_us": round(statistics.mean(us), 1), "p95_us": round(us[int(0.95 * (len(us) - 1))], 1)}
+
+def bench_pairs(payload: Dict, n: int, root: str) -> Dict[str, float]:
+    """The previous export path: render Markdown, write .md, encode JSON, write .json."""
+    record = {"payload": payload, "ratings": DEFAULT_RATINGS}
+    samples = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        save_markdown(root, f"run_{i:06d}.md", record_markdown(record))
+        save_markdown(root, f"run_{i:06d}.json", json.dumps(payload, indent=2))
+        samples.append(time.perf_counter() - t0)
+    return {**_summary(samples), "files": _files(root)}
+
+def bench_store(payload: Dict, n: int, root: str) -> Dict[str, float]:
+    store = RunStore(root)
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        store.append(payload, ratings=DEFAULT_RATINGS)
+        samples.append(time.perf_counter() - t0)
+    store.close()
+    return {**_summary(samples), "files": _files(root), "fsyncs": store.fsyncs}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=int, default=[100, 1_000, 5_000])
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    payload = _payload()
+    results = {}
+    print(f"{'runs':>7} {'layout':<7} {'mean µs':>9} {'p95 µs':>9} {'files':>7}")
+    for n in args.sizes:
+        for name, fn in (("pairs", bench_pairs), ("store", bench_store)):
+            tmp = tempfile.mkdtemp(prefix=f"bench_{name}_")
+            try:
+                res = fn(payload, n, tmp)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            results.setdefault(str(n), {})[name] = res
+            print(f"{n:>7} {name:<7} {res['mean_us']:>9.1f} {res['p95_us']:>9.1f} {res['files']:>7}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
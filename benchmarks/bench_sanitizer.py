@@ -0,0 +1,204 @@
+# benchmarks/bench_sanitizer.py
+"""
+Single-pass sanitize_reply vs the previous multi-pass implementation.
+
+First checks that both produce identical output on every recorded reply
+(deliverables/d2/examples, both modes, with and without a repeated previous
+reply) and on a seeded batch of randomized replies. Then times both on
+replies of growing size, for realistic and adversarial line mixes, and
+reports µs per reply and ns per line so the scaling is visible.
+
+Usage (from the repo root):
+    python benchmarks/bench_sanitizer.py
+    python benchmarks/bench_sanitizer.py --sizes 10 1000 100000 --json bench_sanitizer.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from replies import sanitize_reply  # noqa: E402
+from stub_backend import load_recorded_replies  # noqa: E402
+
+
+# ----- Reference: the multi-pass sanitizer sanitize_reply replaced -----
+def _legacy_strip_meta(text: str) -> str:
+    if not text:
+        return text
+    DROP_PREFIXES = (
+        "TALK", "DONE", "Evaluate the feature and assumptions",
+        "Feature evaluation for", "Assumptions regarding", "I feel a sense of urgency",
+        "Continue evaluating", "User experience considerations", "Focusing on ",
+        "Impatient with ", "Frustrated with ", "The feature's complexity and the need",
+    )
+    lines = []
+    for ln in text.splitlines():
+        s = ln.strip()
+        if not s:
+            continue
+        if any(s.startswith(p) for p in DROP_PREFIXES):
+            continue
+        if s.lower().startswith(("feature evaluation", "assumptions", "outputs:")):
+            continue
+        lines.append(s)
+    return "\n".join(lines)
+
+def _legacy_dedupe_paragraphs(text: str) -> str:
+    if not text:
+        return text
+    parts = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    out, seen = [], set()
+    for p in parts:
+        if p not in seen:
+            out.append(p); seen.add(p)
+    return "\n\n".join(out)
+
+def _legacy_trim_lines(text: str, max_lines: int) -> str:
+    if not text:
+        return text
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    return "\n".join(lines[:max_lines])
+
+def _legacy_enforce_template_initial(text: str) -> str:
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    issues, suggs, qs = [], [], []
+    for ln in lines:
+        low = ln.lower()
+        if len(issues) < 3 and ("issue" in low or any(t in low for t in ["usability","copy","trust","speed","a11y","discoverability"])):
+            issues.append(ln); continue
+        if len(suggs) < 2 and ("suggestion" in low or low.startswith(("try ", "consider ", "add ", "implement "))):
+            suggs.append(ln); continue
+        if not qs and ("?" in ln or low.startswith("follow-up") or low.startswith("question")):
+            qs = [ln]; continue
+    rest = [ln for ln in lines if ln not in issues + suggs + qs]
+    while len(issues) < 3 and rest: issues.append(rest.pop(0))
+    while len(suggs) < 2 and rest: suggs.append(rest.pop(0))
+    if not qs and rest: qs = [rest.pop(0)]
+    ordered = issues + suggs + qs
+    return "\n".join(ordered[:6])
+
+def _legacy_enforce_template_followup(text: str) -> str:
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    issue = next((ln for ln in lines if ("issue" in ln.lower() or any(t in ln.lower() for t in ["usability","copy","trust","speed","a11y","discoverability"]))), None)
+    suggestion = next((ln for ln in lines if ("suggestion" in ln.lower() or ln.lower().startswith(("try ","consider ","add ","implement ")))), None)
+    question = next((ln for ln in lines if "?" in ln or ln.lower().startswith(("follow-up","question"))), None)
+    ordered = [x for x in [issue, suggestion, question] if x]
+    rest = [ln for ln in lines if ln not in ordered]
+    while len(ordered) < 3 and rest:
+        ordered.append(rest.pop(0))
+    return "\n".join(ordered[:3])
+
+def legacy_sanitize_reply(text: str, mode: str, prev_text: str | None = None) -> str:
+    text = _legacy_strip_meta(text)
+    text = _legacy_dedupe_paragraphs(text)
+    if prev_text and text.strip() == prev_text.strip():
+        text = text.splitlines()[0]
+    if mode == "initial":
+        text = _legacy_enforce_template_initial(text)
+        text = _legacy_trim_lines(text, 6)
+    else:
+        text = _legacy_enforce_template_followup(text)
+        text = _legacy_trim_lines(text, 3)
+    return text.strip()
+
+
+# ----- Inputs -----
+_REALISTIC = [
+    "usability: Inputs feel dense on first open.",
+    "copy: 'Tax drag' is never defined on screen.",
+    "Suggestion: Add sensible defaults and a 30-second guided tour.",
+    "Consider an inline 'How we calculate this' link.",
+    "Follow-up: Which tax buckets are estimated vs exact?",
+    "TALK",
+    "DONE",
+    "Focusing on evaluating the after-tax feature.",
+    "Assumptions regarding turnover are unclear.",
+    "   ",
+    "",
+    "The numbers move when I toggle harvest, which is confusing.",
+]
+_ADVERSARIAL = [
+    # nothing classifies, so every line is a fallback candidate
+    "The screen loads and shows a number.",
+    "Another plain remark without any keyword.",
+    # duplicates of classified lines (value-based membership checks)
+    "trust: No source shown for the LTCG rate.",
+    "trust: No source shown for the LTCG rate.",
+    # near-miss prefixes and mixed case
+    "talk about this later",
+    "OUTPUTS: none",
+    "x" * 2000,
+]
+
+def make_reply(rng: random.Random, pool: List[str], n_lines: int) -> str:
+    return "\n".join(rng.choice(pool) for _ in range(n_lines))
+
+def check_equivalence(rng: random.Random, fuzz: int) -> int:
+    cases = load_recorded_replies()
+    cases += [make_reply(rng, _REALISTIC + _ADVERSARIAL, rng.randint(0, 40)) for _ in range(fuzz)]
+    checked = 0
+    for text in cases:
+        for mode in ("initial", "followup"):
+            for prev in (None, "Evaluate this feature.", legacy_sanitize_reply(text, mode), _legacy_strip_meta(text)):
+                want = legacy_sanitize_reply(text, mode, prev)
+                got = sanitize_reply(text, mode, prev)
+                if got != want:
+                    raise AssertionError(f"Mismatch (mode={mode}, prev={prev!r}):\n{text!r}\n{want!r}\n{got!r}")
+                checked += 1
+    return checked
+
+
+def _time(fn: Callable[..., str], text: str, mode: str, min_seconds: float = 0.2) -> float:
+    """Seconds per call (repeats until min_seconds of samples)."""
+    clock = time.perf_counter
+    n, elapsed = 0, 0.0
+    while elapsed < min_seconds:
+        t0 = clock()
+        fn(text, mode, None)
+        elapsed += clock() - t0
+        n += 1
+    return elapsed / n
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10, 100, 1_000, 10_000, 100_000],
+                        help="reply sizes in lines")
+    parser.add_argument("--fuzz", type=int, default=2000, help="randomized replies in the equivalence check")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"Equivalence: {check_equivalence(rng, args.fuzz)} cases identical")
+
+    results: Dict[str, List[Dict[str, float]]] = {}
+    print(f"{'mix':<12} {'mode':<9} {'lines':>8} {'legacy µs':>12} {'single µs':>12} {'ns/line':>9} {'speedup':>8}")
+    for mix, pool in (("realistic", _REALISTIC), ("adversarial", _ADVERSARIAL)):
+        for mode in ("initial", "followup"):
+            rows = results.setdefault(f"{mix}/{mode}", [])
+            for n in args.sizes:
+                text = make_reply(rng, pool, n)
+                legacy = _time(legacy_sanitize_reply, text, mode)
+                single = _time(sanitize_reply, text, mode)
+                rows.append({"lines": n, "legacy_us": round(legacy * 1e6, 2), "single_us": round(single * 1e6, 2)})
+                print(f"{mix:<12} {mode:<9} {n:>8} {legacy * 1e6:>12.1f} {single * 1e6:>12.1f} "
+                      f"{single * 1e9 / n:>9.1f} {legacy / single:>7.1f}x")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"seed": args.seed, "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
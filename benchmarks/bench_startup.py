@@ -0,0 +1,112 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start budget: import time per module and time to first render.
+
+Imports: one fresh interpreter imports app.py's modules in app.py's order
+under `python -X importtime`; each module's cumulative time is what it adds
+on top of the ones before it (pandas, for one, is charged to simulation,
+the first module that pulls it in). The deferred modules (scikit-learn,
+TinyTroupe) are then listed with what they cost when first used.
+
+First render: a fresh interpreter (SIM_BACKEND=stub) runs app.py once through
+Streamlit's AppTest, from process start to the end of the script run.
+This is the median of --runs. The script exits 1 if the median exceeds
+--budget-s.
+
+Usage (from the repo root):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --budget-s 2.0 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+# app.py's imports, in order
+APP_IMPORTS = [
+    "numpy", "streamlit", "dotenv", "utils", "replies", "turn_cache", "simulation", "run_store",
+    "tax_grid", "monte_carlo", "after_tax_regression", "warmup",
+]
+DEFERRED_IMPORTS = ["sklearn.linear_model", "tinytroupe.agent"]
+
+FIRST_RENDER = """
+import os
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(os.path.join({root!r}, "app", "app.py"), default_timeout=120).run()
+assert not at.exception, at.exception
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ, SIM_BACKEND="stub", APP_WARMUP="0")
+    env["PYTHONPATH"] = os.pathsep.join([os.path.join(ROOT, "app"), ROOT, env.get("PYTHONPATH", "")])
+    return env
+
+def import_times(modules: List[str]) -> Dict[str, Optional[float]]:
+    """Cumulative ms each module adds when imported in this order in one fresh interpreter (None: not installed)."""
+    code = "\n".join(f"try:\n    import {m}\nexcept ImportError:\n    print({m!r})" for m in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=_env(),
+                          capture_output=True, text=True)
+    out = {}
+    for line in proc.stderr.splitlines():
+        # "import time:  self | cumulative | name"; top-level imports are not indented
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\S.*)$", line)
+        if m and m.group(3) in modules:
+            out[m.group(3)] = int(m.group(2)) / 1000.0
+    missing = set(proc.stdout.split())
+    return {mod: None if mod in missing else out.get(mod, 0.0) for mod in modules}
+
+def first_render_s() -> float:
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", FIRST_RENDER.format(root=ROOT)], env=_env(),
+                          capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"first render failed:\n{proc.stderr[-2000:]}")
+    return time.perf_counter() - t0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-s", type=float, default=2.0,
+                        help="max median seconds from interpreter start to first render")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    eager = import_times(APP_IMPORTS)
+    print(f"{'app.py import':<24} {'ms':>9}")
+    for mod, ms in eager.items():
+        print(f"{mod:<24} {ms:>9.1f}" if ms is not None else f"{mod:<24} {'missing':>9}")
+    print(f"{'total':<24} {sum(ms or 0.0 for ms in eager.values()):>9.1f}")
+
+    deferred = import_times(APP_IMPORTS + DEFERRED_IMPORTS)
+    print(f"\n{'deferred to first use':<24} {'ms':>9}")
+    for mod in DEFERRED_IMPORTS:
+        ms = deferred[mod]
+        print(f"{mod:<24} {ms:>9.1f}" if ms is not None else f"{mod:<24} {'missing':>9}")
+
+    runs = [first_render_s() for _ in range(args.runs)]
+    median = statistics.median(runs)
+    ok = median <= args.budget_s
+    print(f"\nFirst render: median {median:.2f}s over {args.runs} runs "
+          f"({', '.join(f'{r:.2f}' for r in runs)}); budget {args.budget_s:.2f}s -> {'ok' if ok else 'OVER BUDGET'}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"python": sys.version.split()[0], "budget_s": args.budget_s},
+                       "imports_ms": eager, "deferred_ms": {m: deferred[m] for m in DEFERRED_IMPORTS},
+                       "first_render_s": runs, "median_s": median, "ok": ok}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# benchmarks/bench_streaming_regression.py
+"""
+Peak memory and time: in-memory after-tax regression vs the chunked one.
+
+The in-memory path builds the full DataFrame, splits and fits
+LinearRegression (as run_after_tax_regression's training does); its peak
+grows with n_samples. run_streaming_regression generates fixed-size chunks
+and fits from sufficient statistics, so its peak stays at about one chunk.
+Peak memory is measured with tracemalloc (NumPy allocations are traced).
+
+Usage (from the repo root):
+    python benchmarks/bench_streaming_regression.py --sizes 100000 1000000 10000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from after_tax_regression import DEFAULT_CHUNK_SIZE, _train, run_streaming_regression  # noqa: E402
+
+
+def _measure(fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    res = fn()
+    seconds = time.perf_counter() - t0
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(seconds, 3), "peak_mb": round(peak / 1e6, 1),
+            "test_r2": round(res["test_r2"], 5), "test_mae": round(res["test_mae"], 6)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=float, default=[1e5, 1e6, 4e6])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--in-memory-max", type=float, default=4e6,
+                        help="skip the in-memory path above this many rows")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'rows':>12} {'mode':<16} {'seconds':>8} {'peak MB':>9} {'R^2':>8} {'MAE':>9}")
+    for size in args.sizes:
+        n = int(size)
+        modes = {
+            "stream float64": lambda: run_streaming_regression(n, args.chunk_size, dtype=np.float64),
+            "stream float32": lambda: run_streaming_regression(n, args.chunk_size, dtype=np.float32),
+        }
+        if n <= args.in_memory_max:
+            modes = {"in-memory": lambda: _train(n, 42), **modes}
+        for name, fn in modes.items():
+            res = _measure(fn)
+            results.setdefault(str(n), {})[name] = res
+            print(f"{n:>12,} {name:<16} {res['seconds']:>8.2f} {res['peak_mb']:>9.1f} "
+                  f"{res['test_r2']:>8.4f} {res['test_mae']:>9.5f}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"chunk_size": args.chunk_size, "python": sys.version.split()[0]},
+                       "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
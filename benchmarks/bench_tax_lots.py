@@ -0,0 +1,145 @@
+# benchmarks/bench_tax_lots.py
+"""
+LotLedger operation times for books of growing size.
+
+Loads N lots (daily buys at random prices), then times one rebalance's
+worth of operations on that book: a small sale and a 10% sale in each lot
+order (FIFO, HIFO, LOSS_FIRST), a harvest pass and a 1000-lot bulk buy.
+Each operation runs on a fresh copy of the loaded book.
+
+Before timing, a consistency check replays random buys, repeated sales in
+every order and harvests against a brute-force list of lots, and compares
+the open-lot count (`len()`), the lots each sale touched and the realized
+gain.
+
+Usage (from the repo root):
+    python benchmarks/bench_tax_lots.py --sizes 10000 100000 500000
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from tax_lots import LONG_TERM_DAYS, METHODS, LotLedger  # noqa: E402
+
+
+def _book(n: int, seed: int) -> LotLedger:
+    rng = np.random.default_rng(seed)
+    ledger = LotLedger()
+    ledger.buy(rng.uniform(0.5, 2.0, n), rng.lognormal(0.0, 0.25, n), np.arange(n) // 50)
+    return ledger
+
+def _brute_order(lots: List[List[float]], method: str, price: float, day: int) -> List[List[float]]:
+    """Open lots ([shares, cost, day, seq]) in sale order; costs are distinct, so orders are unique."""
+    open_ = [lot for lot in lots if lot[0] > 0]
+    if method == "FIFO":
+        return sorted(open_, key=lambda lot: lot[3])
+    if method == "HIFO":
+        return sorted(open_, key=lambda lot: -lot[1])
+    def key(lot):
+        unit, long_term = price - lot[1], day - lot[2] >= LONG_TERM_DAYS
+        return (0 if unit < 0 and not long_term else 1 if unit < 0 else 2 if long_term else 3, unit)
+    return sorted(open_, key=key)
+
+def check_ledger(rng: random.Random, rounds: int) -> int:
+    """Random buys, sales and harvests on a LotLedger and on a plain list; returns the operations checked."""
+    ledger, lots, seq, checked = LotLedger(capacity=16), [], 0, 0
+    for day in range(rounds):
+        price = rng.uniform(0.5, 2.0)
+        op = rng.random()
+        if op < 0.3 or not lots:
+            n = rng.randint(1, 300)
+            shares = [rng.uniform(0.5, 2.0) for _ in range(n)]
+            costs = [rng.uniform(0.5, 2.0) for _ in range(n)]
+            ledger.buy(shares, costs, day)
+            for sh, c in zip(shares, costs):
+                lots.append([sh, c, day, seq])
+                seq += 1
+            continue
+        if op < 0.85:
+            method = rng.choice(METHODS)
+            shares = rng.uniform(0.0, 0.3) * sum(lot[0] for lot in lots)
+            got = ledger.sell(shares, price, day, method)
+            want_lots, want_gain, left = 0, 0.0, shares
+            for lot in _brute_order(lots, method, price, day):
+                if left <= 0:
+                    break
+                sold = min(left, lot[0])
+                lot[0] -= sold
+                if lot[0] <= 1e-12:
+                    lot[0] = 0.0
+                left -= sold
+                want_lots += 1
+                want_gain += sold * (price - lot[1])
+        else:
+            method = "harvest"
+            got = ledger.harvest(price, day)
+            hit = [lot for lot in lots if lot[0] > 0 and price < lot[1]]
+            want_lots, want_gain = len(hit), sum(lot[0] * (price - lot[1]) for lot in hit)
+            if hit:
+                lots.append([sum(lot[0] for lot in hit), price, day, seq])
+                seq += 1
+            for lot in hit:
+                lot[0] = 0.0
+        lots = [lot for lot in lots if lot[0] > 0]
+        if (got["lots"], len(ledger)) != (want_lots, len(lots)) or abs(got["gain"] - want_gain) > 1e-6:
+            raise AssertionError(f"Day {day} {method}: lots {got['lots']} vs {want_lots}, len {len(ledger)} vs "
+                                 f"{len(lots)}, gain {got['gain']:.6f} vs {want_gain:.6f}")
+        checked += 1
+    return checked
+
+def _time(book: LotLedger, op: Callable[[LotLedger], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        ledger = copy.deepcopy(book)
+        t0 = time.perf_counter()
+        op(ledger)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e3
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10_000, 100_000, 500_000])
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--check-rounds", type=int, default=2000, help="operations in the consistency check")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    print(f"Consistency: {check_ledger(random.Random(args.seed), args.check_rounds)} operations match a brute-force book")
+
+    price, day = 1.0, 20_000
+    results: Dict[str, Dict[str, float]] = {}
+    for n in args.sizes:
+        t0 = time.perf_counter()
+        book = _book(n, args.seed)
+        row = {"load": round((time.perf_counter() - t0) * 1e3, 3)}
+        ops: Dict[str, Callable[[LotLedger], object]] = {}
+        for method in METHODS:
+            ops[f"sell 100 sh {method}"] = lambda l, m=method: l.sell(100.0, price, day, m)
+            ops[f"sell 10% {method}"] = lambda l, m=method: l.sell(0.1 * l.shares, price, day, m)
+        ops["harvest"] = lambda l: l.harvest(price, day)
+        ops["buy 1000 lots"] = lambda l: l.buy(np.ones(1000), np.linspace(0.8, 1.2, 1000), day)
+        row.update({name: round(_time(book, op), 3) for name, op in ops.items()})
+        results[str(n)] = row
+        print(f"{n:,} lots (ms): " + ", ".join(f"{k} {v:.2f}" for k, v in row.items()))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"seed": args.seed, "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# benchmarks/bench_transcript.py
+"""
+Per-session transcript memory: four parallel copies vs one Transcript.
+
+For conversations of each length this measures what a finished run keeps
+around, counting both sides the same way: every byte the build allocated
+and still holds once it returns (tracemalloc, current not peak). The turn
+strings exist before either is built, so neither side counts them.
+- "copies": what the app used to hold: the (speaker, text) list on the run,
+  a session_state chat list of message dicts, the JSON payload's turn dicts
+  and the rendered Markdown string;
+- "transcript": the run's Transcript alone; messages, Markdown lines and
+  JSON turns are built only while a view is consumed.
+The views are reported separately: for each of messages, Markdown and JSON,
+the peak memory while one full pass builds it from the Transcript (what a
+results rerun or a download allocates and then drops) and its best time.
+
+Usage (from the repo root):
+    python benchmarks/bench_transcript.py --turns 8 64 512
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from transcript import USER, Transcript  # noqa: E402
+
+PERSONA = "PM Priya (Power User)"
+# Roughly the size of a prompt and a sanitized six-line reply
+PROMPT = "Evaluate this feature and assumptions. " * 40
+REPLY = "usability: the harvest toggle is hard to find in the settings panel.\n" * 6
+
+
+def _turns(n: int) -> List[tuple]:
+    # Fresh strings per turn, as replies arriving from the model would be
+    return [(USER if i % 2 == 0 else PERSONA, (PROMPT if i % 2 == 0 else REPLY) + str(i)) for i in range(n)]
+
+def _copies(pairs: List[tuple]) -> Any:
+    chat = [{"role": "user" if who == USER else "assistant", "name": None if who == USER else who,
+             "content": txt} for who, txt in pairs]
+    payload = [{"speaker": who, "text": txt} for who, txt in pairs]
+    markdown = "\n".join(f"- **{who}**: {txt}" for who, txt in pairs)
+    return list(pairs), chat, payload, markdown
+
+def _transcript(pairs: List[tuple]) -> Transcript:
+    t = Transcript()
+    for who, txt in pairs:
+        t.append(who, txt)
+    return t
+
+def _kept_kb(fn: Callable[[], Any]) -> float:
+    """What fn's result still holds after it returns."""
+    tracemalloc.start()
+    kept = fn()
+    cur, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return cur / 1024.0
+
+def _peak_kb(fn: Callable[[], Any]) -> float:
+    """The most fn had allocated at once, whether or not its result keeps it."""
+    tracemalloc.start()
+    fn()
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024.0
+
+def _best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", nargs="*", type=int, default=[8, 64, 512])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'':>6} {'kept KB':>25}   {'per view pass: peak KB / ms':>42}")
+    print(f"{'turns':>6} {'copies':>12} {'transcript':>12}   {'messages':>13} {'markdown':>13} {'json':>13}")
+    for n in args.turns:
+        pairs = _turns(n)
+        t = _transcript(pairs)
+        views = {
+            "messages": lambda: list(t.messages()),
+            "markdown": lambda: "\n".join(t.markdown_lines()),
+            "json": t.to_json,
+        }
+        res = {
+            "copies_kb": round(_kept_kb(lambda: _copies(pairs)), 1),
+            "transcript_kb": round(_kept_kb(lambda: _transcript(pairs)), 1),
+        }
+        for name, view in views.items():
+            res[f"{name}_view_kb"] = round(_peak_kb(view), 1)
+            res[f"{name}_ms"] = round(_best_ms(view, args.repeat), 4)
+        results[str(n)] = res
+        cells = " ".join(f"{res[f'{name}_view_kb']:>6.1f}/{res[f'{name}_ms']:<6.3f}" for name in views)
+        print(f"{n:>6,} {res['copies_kb']:>12.1f} {res['transcript_kb']:>12.1f}   {cells}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"python": sys.version.split()[0]}, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# benchmarks/bench_turn_pipeline.py
+"""
+End-to-end benchmark of the non-LLM part of the persona turn pipeline.
+
+Runs entirely offline on the stub backend (app/stub_backend.py) and times:
+agent construction (fresh build and pooled lease), listen, act, extraction
+(pick_text_from_actions) and sanitization (sanitize_reply) per turn, for
+every payload shape, plus a full simulate() call with the turn cache off
+(including how many LLM round trips the conversation used).
+
+Usage (from the repo root):
+    python benchmarks/bench_turn_pipeline.py --runs 50 --turns 8
+    python benchmarks/bench_turn_pipeline.py --json bench_turns.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+os.environ["SIM_BACKEND"] = "stub"
+
+from utils import assumption_summary, load_personas  # noqa: E402
+from replies import pick_text_from_actions, sanitize_reply  # noqa: E402
+from simulation import (  # noqa: E402
+    DEFAULT_ASSUMPTIONS, DEFAULT_FEATURE_BRIEF, FOLLOWUP_PROMPT, SCENARIOS,
+    act_once, build_agent, build_agent_spec, compose_prompts, get_agent_pool, simulate, validate_persona,
+)
+from stub_backend import SHAPES  # noqa: E402
+
+STAGES = ["construct", "lease", "listen", "act", "extract", "sanitize", "simulate"]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    us = sorted(s * 1e6 for s in samples)
+    return {
+        "n": len(us),
+        "median_us": round(statistics.median(us), 2),
+        "p95_us": round(us[min(len(us) - 1, int(0.95 * len(us)))], 2),
+        "max_us": round(us[-1], 2),
+    }
+
+
+def bench_shape(personas, shape: str, runs: int, turns: int, feature_spec: str) -> Dict[str, Dict[str, float]]:
+    os.environ["STUB_SHAPE"] = shape
+    samples: Dict[str, List[float]] = {k: [] for k in STAGES}
+    calls: List[int] = []
+    assumption_text = assumption_summary(DEFAULT_ASSUMPTIONS)
+    clock = time.perf_counter
+    # One spec object per persona, as the persona registry hands out
+    specs = {P["name"]: build_agent_spec(P) for P in personas}
+
+    for r in range(runs):
+        P = personas[r % len(personas)]
+
+        t0 = clock()
+        tp = build_agent(build_agent_spec(P))
+        samples["construct"].append(clock() - t0)
+
+        spec = specs[P["name"]]
+        t0 = clock()
+        get_agent_pool().release(spec, get_agent_pool().acquire(spec, scope="stub"), scope="stub")
+        samples["lease"].append(clock() - t0)
+
+        system_msg, user_prompt = compose_prompts(P, feature_spec, assumption_text, SCENARIOS[0])
+        prev = user_prompt
+        for i in range(turns):
+            prompt, mode = (user_prompt, "initial") if i == 0 else (FOLLOWUP_PROMPT, "followup")
+
+            t0 = clock()
+            tp.listen(system_msg)
+            tp.listen(prompt)
+            samples["listen"].append(clock() - t0)
+
+            t0 = clock()
+            reply = act_once(tp)
+            samples["act"].append(clock() - t0)
+
+            t0 = clock()
+            text = pick_text_from_actions(reply)
+            samples["extract"].append(clock() - t0)
+
+            t0 = clock()
+            prev = sanitize_reply(text, mode=mode, prev_text=prev)
+            samples["sanitize"].append(clock() - t0)
+
+        t0 = clock()
+        run = simulate(P, SCENARIOS[0], DEFAULT_ASSUMPTIONS, feature_spec, turns, use_cache=False)
+        samples["simulate"].append(clock() - t0)
+        calls.append(run["llm_calls"])
+
+    out = {k: _summary(v) for k, v in samples.items()}
+    out["llm_calls_per_conversation"] = {"mean": statistics.mean(calls), "max": max(calls)}
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30, help="conversations per payload shape")
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--shapes", nargs="*", default=sorted(SHAPES), help="payload shapes to cover")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub latency per act() call")
+    parser.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    os.environ["STUB_LATENCY_MS"] = str(args.latency_ms)
+    personas = [validate_persona(p)["normalized"] for p in load_personas("app/personas.json")]
+    try:
+        with open("app/feature_presets.md", "r", encoding="utf-8") as f:
+            feature_spec = f.read()
+    except OSError:
+        feature_spec = DEFAULT_FEATURE_BRIEF
+
+    results = {}
+    print(f"{'shape':<11} {'stage':<10} {'median µs':>11} {'p95 µs':>11} {'max µs':>11}")
+    for shape in args.shapes:
+        results[shape] = bench_shape(personas, shape, args.runs, args.turns, feature_spec)
+        for stage in STAGES:
+            s = results[shape][stage]
+            print(f"{shape:<11} {stage:<10} {s['median_us']:>11.1f} {s['p95_us']:>11.1f} {s['max_us']:>11.1f}")
+        c = results[shape]["llm_calls_per_conversation"]
+        print(f"{shape:<11} llm calls per {args.turns}-turn conversation: mean {c['mean']:.1f}, max {c['max']}")
+
+    if args.json_out:
+        meta = {"runs": args.runs, "turns": args.turns, "latency_ms": args.latency_ms, "python": sys.version.split()[0]}
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())